@@ -183,7 +183,12 @@ class Session(object):
         else:
             return stdout, stderr
 
-    def run_safe(self, icommand, data=None, *args):
+    def run_safe(self, icommand, data=None, *args, **kwargs):
+        """Start an icommand and return its process without waiting for it.
+
+        stdout and stderr are pipes, unless a file is passed as the keyword argument stderr;
+        the caller must keep reading the pipes, or the icommand blocks when a pipe is full.
+        """
         myenv = os.environ.copy()
         myenv['IRODS_ENVIRONMENT_FILE'] = os.path.join(self.session_path, "irods_environment.json")
         myenv['IRODS_AUTHENTICATION_FILE'] = os.path.join(self.session_path, ".irodsA")
@@ -201,7 +206,7 @@ class Session(object):
             argList,
             stdin=stdin,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=kwargs.get('stderr', subprocess.PIPE),
             env=myenv
         )
         return proc
@@ -0,0 +1,340 @@
+"""Native iRODS protocol backend for IrodsStorage.
+
+Every operation that goes through Session.run() in icommands.py forks a new icommand
+process that re-authenticates against iRODS. This module keeps a per-worker pool of
+authenticated python-irodsclient sessions instead, so that the common storage operations
+(exists, size, listdir, saveFile, copyFiles, moveFile, setAVU, ...) are served over an
+already open connection.
+
+The backend is selected with settings.IRODS_STORAGE_BACKEND = 'native'. When the setting is
+not 'native', or python-irodsclient is not installed, IrodsStorage keeps using icommands.
+All errors are surfaced as SessionException so callers do not need to know which backend
+is in use.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from django_irods.icommands import SessionException
+
+try:
+    from irods.session import iRODSSession
+    from irods.exception import CollectionDoesNotExist, DataObjectDoesNotExist
+    from irods.meta import iRODSMeta
+    import irods.keywords as kw
+    NATIVE_IRODS_AVAILABLE = True
+except ImportError:
+    NATIVE_IRODS_AVAILABLE = False
+
+    class CollectionDoesNotExist(Exception):
+        pass
+
+    class DataObjectDoesNotExist(Exception):
+        pass
+
+logger = logging.getLogger(__name__)
+
+# chunk size used when streaming data objects to local files or responses
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def native_backend_enabled():
+    """Return True if IrodsStorage should use the native protocol backend."""
+    return NATIVE_IRODS_AVAILABLE and \
+        getattr(settings, 'IRODS_STORAGE_BACKEND', 'icommands') == 'native'
+
+
+def _as_session_exception(ex):
+    """Convert a python-irodsclient exception into the SessionException raised by icommands."""
+    if isinstance(ex, SessionException):
+        return ex
+    msg = "{}: {}".format(type(ex).__name__, str(ex))
+    return SessionException(getattr(ex, 'code', -1), msg, msg)
+
+
+class PooledConnection(object):
+    """An authenticated iRODS session together with its bookkeeping timestamps."""
+
+    def __init__(self, session):
+        self.session = session
+        self.created = time.time()
+        self.last_used = self.created
+        self.last_checked = self.created
+
+    def close(self):
+        try:
+            self.session.cleanup()
+        except Exception as ex:
+            logger.debug("error closing pooled iRODS session: {}".format(str(ex)))
+
+
+class IrodsConnectionPool(object):
+    """A bounded pool of authenticated iRODS sessions for a single worker process.
+
+    Connections idle for longer than idle_timeout seconds are evicted. A connection that has
+    not been used for health_check_interval seconds is checked with a cheap catalog query
+    before being handed out, and discarded if the check fails.
+    """
+
+    def __init__(self, env, max_size=None, idle_timeout=None, health_check_interval=None,
+                 acquire_timeout=None):
+        self.env = env
+        self.max_size = max_size or getattr(settings, 'IRODS_POOL_MAX_SIZE', 10)
+        # seconds to wait for a connection when all max_size connections are in use
+        self.acquire_timeout = acquire_timeout or \
+            getattr(settings, 'IRODS_POOL_ACQUIRE_TIMEOUT', 30)
+        self.idle_timeout = idle_timeout or getattr(settings, 'IRODS_POOL_IDLE_TIMEOUT', 300)
+        self.health_check_interval = health_check_interval or \
+            getattr(settings, 'IRODS_POOL_HEALTH_CHECK_INTERVAL', 60)
+        self._idle = deque()
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+    def _connect(self):
+        session = iRODSSession(host=self.env.host, port=int(self.env.port),
+                               user=self.env.username, password=self.env.auth,
+                               zone=self.env.zone)
+        return PooledConnection(session)
+
+    def _is_healthy(self, conn):
+        try:
+            conn.session.collections.get(self.env.home_coll)
+            conn.last_checked = time.time()
+            return True
+        except Exception as ex:
+            logger.warning("discarding unhealthy iRODS connection: {}".format(str(ex)))
+            return False
+
+    def _evict_idle(self):
+        """Close idle connections that exceeded idle_timeout. Must hold self._lock."""
+        now = time.time()
+        keep = deque()
+        while self._idle:
+            conn = self._idle.popleft()
+            if now - conn.last_used > self.idle_timeout:
+                conn.close()
+            else:
+                keep.append(conn)
+        self._idle = keep
+
+    def acquire(self):
+        with self._lock:
+            self._evict_idle()
+            deadline = time.time() + self.acquire_timeout
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    msg = "no iRODS connection became available within {} seconds; {} " \
+                          "connections are in use".format(self.acquire_timeout, self._in_use)
+                    raise SessionException(-1, msg, msg)
+                self._available.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+        try:
+            if conn is not None and \
+                    time.time() - conn.last_checked > self.health_check_interval and \
+                    not self._is_healthy(conn):
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception as ex:
+            with self._lock:
+                self._in_use -= 1
+                self._available.notify()
+            raise _as_session_exception(ex)
+        return conn
+
+    def release(self, conn, discard=False):
+        with self._lock:
+            self._in_use -= 1
+            if discard:
+                conn.close()
+            else:
+                conn.last_used = time.time()
+                self._idle.append(conn)
+            self._available.notify()
+
+    def close_all(self):
+        with self._lock:
+            while self._idle:
+                self._idle.popleft().close()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'idle': len(self._idle), 'in_use': self._in_use, 'max_size': self.max_size}
+
+    @contextmanager
+    def connection(self):
+        """Yield an authenticated iRODS session, returning it to the pool afterwards.
+
+        Errors raised while the session is in use are re-raised as SessionException. A
+        connection that raised a network level error is not returned to the pool.
+        """
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn.session
+        except (CollectionDoesNotExist, DataObjectDoesNotExist, SessionException) as ex:
+            raise _as_session_exception(ex)
+        except Exception as ex:
+            discard = True
+            raise _as_session_exception(ex)
+        finally:
+            self.release(conn, discard=discard)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(env):
+    """Return the connection pool of this worker process for the given IRodsEnv.
+
+    Pools are keyed by process id so that forked celery/gunicorn workers never share
+    sockets inherited from their parent.
+    """
+    key = (os.getpid(), env.host, str(env.port), env.username, env.zone)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = IrodsConnectionPool(env)
+            _pools[key] = pool
+        return pool
+
+
+class NativeSession(object):
+    """Storage operations implemented over a pooled native iRODS connection.
+
+    Relative paths are resolved against the home collection of the environment, matching
+    how icommands resolve them against irods_cwd.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.pool = get_pool(env)
+
+    def abspath(self, path):
+        if path.startswith('/'):
+            return path.rstrip('/') or '/'
+        return os.path.join(self.env.cwd or self.env.home_coll, path).rstrip('/')
+
+    def exists(self, path):
+        path = self.abspath(path)
+        with self.pool.connection() as sess:
+            return sess.collections.exists(path) or sess.data_objects.exists(path)
+
+    def size(self, path):
+        with self.pool.connection() as sess:
+            return int(sess.data_objects.get(self.abspath(path)).size)
+
+    def listdir(self, path):
+        """Return (directories, files, sizes) in the same form as IrodsStorage.listdir()."""
+        listing = ([], [], [])
+        with self.pool.connection() as sess:
+            coll = sess.collections.get(self.abspath(path))
+            # file sizes precede the "-1" folder entries, as in the 'ils -l' based listing
+            for obj in coll.data_objects:
+                listing[1].append(obj.name)
+                listing[2].append(str(obj.size))
+            for sub in coll.subcollections:
+                listing[0].append(sub.name)
+                listing[2].append("-1")
+        return listing
+
+    def mkdir(self, path):
+        with self.pool.connection() as sess:
+            sess.collections.create(self.abspath(path), recurse=True)
+
+    def put(self, local_path, path, data_type_str=''):
+        options = {kw.FORCE_FLAG_KW: ''}
+        if data_type_str:
+            options[kw.DATA_TYPE_KW] = data_type_str
+        with self.pool.connection() as sess:
+            sess.data_objects.put(local_path, self.abspath(path), **options)
+
+    def get(self, path, local_path):
+        with self.pool.connection() as sess:
+            obj = sess.data_objects.get(self.abspath(path))
+            with obj.open('r') as src, open(local_path, 'wb') as dest:
+                while True:
+                    chunk = src.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+
+    @contextmanager
+    def open(self, path, mode='r'):
+        """Yield a seekable file object for a data object, e.g., to patch it in place."""
+        with self.pool.connection() as sess:
+            with sess.data_objects.get(self.abspath(path)).open(mode) as data_file:
+                yield data_file
+
+    def read_chunks(self, path, offset=0):
+        """Yield the content of a data object chunk by chunk, starting at *offset*."""
+        with self.open(path, 'r') as data_file:
+            if offset:
+                data_file.seek(offset)
+            while True:
+                chunk = data_file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def read(self, path, length):
+        """Return the first *length* bytes of a data object."""
+        with self.open(path, 'r') as data_file:
+            return data_file.read(length)
+
+    def is_collection(self, path):
+        with self.pool.connection() as sess:
+            return sess.collections.exists(self.abspath(path))
+
+    def copy(self, src_path, dest_path, ires=None):
+        options = {kw.FORCE_FLAG_KW: ''}
+        if ires:
+            options[kw.DEST_RESC_NAME_KW] = ires
+        with self.pool.connection() as sess:
+            sess.data_objects.copy(self.abspath(src_path), self.abspath(dest_path), **options)
+
+    def move(self, src_path, dest_path):
+        src_path = self.abspath(src_path)
+        dest_path = self.abspath(dest_path)
+        with self.pool.connection() as sess:
+            if sess.collections.exists(src_path):
+                sess.collections.move(src_path, dest_path)
+            else:
+                sess.data_objects.move(src_path, dest_path)
+
+    def delete(self, path):
+        path = self.abspath(path)
+        with self.pool.connection() as sess:
+            if sess.collections.exists(path):
+                sess.collections.remove(path, recurse=True, force=True)
+            elif sess.data_objects.exists(path):
+                sess.data_objects.unlink(path, force=True)
+            else:
+                # irm fails on a missing path as well
+                msg = "{} does not exist".format(path)
+                raise SessionException(-1, msg, msg)
+
+    def set_avu(self, path, att_name, att_val, att_unit=None):
+        with self.pool.connection() as sess:
+            coll = sess.collections.get(self.abspath(path))
+            for meta in coll.metadata.get_all(att_name):
+                coll.metadata.remove(meta)
+            coll.metadata.add(iRODSMeta(att_name, att_val, att_unit))
+
+    def get_avu(self, path, att_name):
+        with self.pool.connection() as sess:
+            coll = sess.collections.get(self.abspath(path))
+            metas = coll.metadata.get_all(att_name)
+            return metas[0].value if metas else None
@@ -1,5 +1,5 @@
 import os
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryFile
 from uuid import uuid4
 from urllib import urlencode
 
@@ -11,11 +11,13 @@ from django.core.exceptions import ValidationError
 
 from django_irods import icommands
 from icommands import Session, GLOBAL_SESSION, GLOBAL_ENVIRONMENT, SessionException, IRodsEnv
+from native import NativeSession, native_backend_enabled, READ_CHUNK_SIZE
 
 
 @deconstructible
 class IrodsStorage(Storage):
     def __init__(self, option=None):
+        self.native = None
         if option == 'federated':
             # resource should be saved in federated zone
             self.set_fed_zone_session()
@@ -23,6 +25,10 @@ class IrodsStorage(Storage):
             self.session = GLOBAL_SESSION
             self.environment = GLOBAL_ENVIRONMENT
             icommands.ACTIVE_SESSION = self.session
+        # use pooled native iRODS connections for the common operations when configured;
+        # self.session remains available for icommands that have no native equivalent
+        if native_backend_enabled() and getattr(self, 'environment', None) is not None:
+            self.native = NativeSession(self.environment)
 
     @property
     def getUniqueTmpPath(self):
@@ -57,6 +63,7 @@ class IrodsStorage(Storage):
 
         self.session.run('iinit', None, self.environment.auth)
         icommands.ACTIVE_SESSION = self.session
+        self.native = None
 
     # Set iRODS session to wwwHydroProxy for irods_storage input object for iRODS federated
     # zone direct file operations
@@ -78,6 +85,9 @@ class IrodsStorage(Storage):
         return self._open(name, mode='rb')
 
     def getFile(self, src_name, dest_name):
+        if self.native:
+            self.native.get(src_name, dest_name)
+            return
         self.session.run("iget", None, '-f', src_name, dest_name)
 
     def runBagitRule(self, rule_name, input_path, input_resource):
@@ -148,7 +158,9 @@ class IrodsStorage(Storage):
         """
 
         # SessionException will be raised from run() in icommands.py
-        if attUnit:
+        if self.native:
+            self.native.set_avu(name, attName, attVal, attUnit)
+        elif attUnit:
             self.session.run("imeta", None, 'set', '-C', name, attName, attVal, attUnit)
         else:
             self.session.run("imeta", None, 'set', '-C', name, attName, attVal)
@@ -168,6 +180,8 @@ class IrodsStorage(Storage):
         """
 
         # SessionException will be raised from run() in icommands.py
+        if self.native:
+            return self.native.get_avu(name, attName)
         stdout = self.session.run("imeta", None, 'ls', '-C', name, attName)[0].split("\n")
         ret_att = stdout[1].strip()
         if ret_att == 'None':  # queried attribute does not exist
@@ -190,8 +204,11 @@ class IrodsStorage(Storage):
             if '/' in dest_name:
                 splitstrs = dest_name.rsplit('/', 1)
                 if not self.exists(splitstrs[0]):
-                    self.session.run("imkdir", None, '-p', splitstrs[0])
-            if ires:
+                    self._mkdir(splitstrs[0])
+            if self.native and not self.native.is_collection(src_name):
+                # recursive collection copies are only supported by icp
+                self.native.copy(src_name, dest_name, ires)
+            elif ires:
                 self.session.run("icp", None, '-rf', '-R', ires, src_name, dest_name)
             else:
                 self.session.run("icp", None, '-rf', src_name, dest_name)
@@ -210,8 +227,11 @@ class IrodsStorage(Storage):
             if '/' in dest_name:
                 splitstrs = dest_name.rsplit('/', 1)
                 if not self.exists(splitstrs[0]):
-                    self.session.run("imkdir", None, '-p', splitstrs[0])
-            self.session.run("imv", None, src_name, dest_name)
+                    self._mkdir(splitstrs[0])
+            if self.native:
+                self.native.move(src_name, dest_name)
+            else:
+                self.session.run("imv", None, src_name, dest_name)
         return
 
     def saveFile(self, from_name, to_name, create_directory=False, data_type_str=''):
@@ -226,11 +246,13 @@ class IrodsStorage(Storage):
         """
         if create_directory:
             splitstrs = to_name.rsplit('/', 1)
-            self.session.run("imkdir", None, '-p', splitstrs[0])
+            self._mkdir(splitstrs[0])
             if len(splitstrs) <= 1:
                 return
 
-        if from_name:
+        if from_name and self.native:
+            self.native.put(from_name, to_name, data_type_str)
+        elif from_name:
             try:
                 if data_type_str:
                     self.session.run("iput", None, '-D', data_type_str, '-f', from_name, to_name)
@@ -245,31 +267,48 @@ class IrodsStorage(Storage):
                     self.session.run("iput", None, '-f', from_name, to_name)
         return
 
+    def _mkdir(self, name):
+        if self.native:
+            self.native.mkdir(name)
+        else:
+            self.session.run("imkdir", None, '-p', name)
+
     def _open(self, name, mode='rb'):
         tmp = NamedTemporaryFile()
-        self.session.run("iget", None, '-f', name, tmp.name)
+        self.getFile(name, tmp.name)
         return tmp
 
     def _save(self, name, content):
-        self.session.run("imkdir", None, '-p', name.rsplit('/', 1)[0])
+        self._mkdir(name.rsplit('/', 1)[0])
         with NamedTemporaryFile(delete=False) as f:
             for chunk in content.chunks():
                 f.write(chunk)
             f.flush()
             f.close()
             try:
-                self.session.run("iput", None, '-f', f.name, name)
-            except:
-                # IRODS 4.0.2, sometimes iput fails on the first try. A second try seems to fix it.
-                self.session.run("iput", None, '-f', f.name, name)
-            os.unlink(f.name)
+                if self.native:
+                    self.native.put(f.name, name)
+                    return name
+                try:
+                    self.session.run("iput", None, '-f', f.name, name)
+                except:
+                    # IRODS 4.0.2, sometimes iput fails on the first try. A second try seems to
+                    # fix it.
+                    self.session.run("iput", None, '-f', f.name, name)
+            finally:
+                os.unlink(f.name)
         return name
 
     def delete(self, name):
-        self.session.run("irm", None, "-rf", name)
+        if self.native:
+            self.native.delete(name)
+        else:
+            self.session.run("irm", None, "-rf", name)
 
     def exists(self, name):
         try:
+            if self.native:
+                return self.native.exists(name)
             stdout = self.session.run("ils", None, name)[0]
             return stdout != ""
         except SessionException:
@@ -280,6 +319,8 @@ class IrodsStorage(Storage):
         return self.session.run("ils", None, "-l", path)[0]
 
     def listdir(self, path):
+        if self.native:
+            return self.native.listdir(path)
         stdout = self.ils_l(path).split("\n")
         listing = ([], [], [])
         directory = stdout[0][0:-1]
@@ -308,7 +349,104 @@ class IrodsStorage(Storage):
                     listing[2].append(size)
         return listing
 
+    def checksum(self, name):
+        """
+        force computation of the checksum of an iRODS data object and return it
+        :param name: the data object path
+        :return: the checksum as stored in iCAT, e.g., the hex encoded md5 checksum
+        """
+        # SessionException will be raised from run() in icommands.py
+        stdout = self.session.run("ichksum", None, "-f", name)[0].split("\n")
+        return stdout[0].split()[-1].strip()
+
+    def list_checksums(self, path, recursive=True, name=None):
+        """
+        list all data objects under a collection with a single catalog query
+        :param path: the full iRODS path of the collection
+        :param recursive: if False, only the data objects directly in *path* are listed
+        :param name: if given, only the data object of this name directly in *path* is listed
+        :return: a dict mapping the path of each data object relative to *path* to a tuple of
+        (checksum, size, modify_time). checksum is an empty string if iCAT has none recorded.
+        """
+        path = path.rstrip('/')
+        coll_cond = "COLL_NAME like '{path}%'" if recursive and name is None \
+            else "COLL_NAME = '{path}'"
+        if name is not None:
+            coll_cond += " AND DATA_NAME = '{name}'"
+        query = "SELECT COLL_NAME, DATA_NAME, DATA_CHECKSUM, DATA_SIZE, DATA_MODIFY_TIME " \
+                "WHERE " + coll_cond.format(path=path, name=name) + " AND DATA_REPL_NUM = '0'"
+        try:
+            stdout = self.session.run("iquest", None, "--no-page", "%s/%s\t%s\t%s\t%s",
+                                      query)[0]
+        except SessionException as ex:
+            if 'CAT_NO_ROWS_FOUND' in ex.stdout or 'CAT_NO_ROWS_FOUND' in ex.stderr:
+                return {}
+            raise
+        listing = {}
+        for line in stdout.split("\n"):
+            if not line.startswith(path + '/') or line.count('\t') < 3:
+                continue
+            full_path, checksum, size, modify_time = line.rsplit('\t', 3)
+            listing[full_path[len(path) + 1:]] = (checksum.strip(), int(size),
+                                                  modify_time.strip())
+        return listing
+
+    def read_chunks(self, name, offset=0):
+        """
+        yield the content of an iRODS data object chunk by chunk without a local copy
+        :param name: the data object path
+        :param offset: number of leading bytes to skip
+        """
+        if self.native:
+            for chunk in self.native.read_chunks(name, offset):
+                yield chunk
+            return
+        # iget cannot seek, so leading bytes are read and dropped. stderr goes to a file
+        # rather than a pipe, which iget would block on once full since it is read last
+        with TemporaryFile() as stderr_file:
+            proc = self.session.run_safe('iget', None, name, '-', stderr=stderr_file)
+            try:
+                while True:
+                    chunk = proc.stdout.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if offset >= len(chunk):
+                        offset -= len(chunk)
+                        continue
+                    yield chunk[offset:]
+                    offset = 0
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+                proc.wait()
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+        if proc.returncode:
+            raise SessionException(proc.returncode, '', stderr)
+
+    def read_header(self, name, length):
+        """
+        return the first *length* bytes of an iRODS data object without a local copy
+        :param name: the data object path
+        :param length: number of bytes to read
+        """
+        if self.native:
+            return self.native.read(name, length)
+        header = ''
+        chunks = self.read_chunks(name)
+        try:
+            for chunk in chunks:
+                header += chunk
+                if len(header) >= length:
+                    break
+        finally:
+            # stops the iget of the rest of the data object
+            chunks.close()
+        return header[:length]
+
     def size(self, name):
+        if self.native:
+            return self.native.size(name)
         stdout = self.session.run("ils", None, "-l", name)[0].split()
         return int(stdout[3])
 
@@ -0,0 +1,70 @@
+import time
+
+from django.test import SimpleTestCase
+from mock import Mock, patch
+
+from django_irods.icommands import IRodsEnv, SessionException
+from django_irods.native import IrodsConnectionPool, PooledConnection
+
+
+class TestIrodsConnectionPool(SimpleTestCase):
+    def setUp(self):
+        super(TestIrodsConnectionPool, self).setUp()
+        self.env = IRodsEnv(pk=-1, host='data.local.org', port='1247', def_res='hydroshareReplResc',
+                            home_coll='/hydroshareZone/home/wwwHydroProxy',
+                            cwd='/hydroshareZone/home/wwwHydroProxy', username='wwwHydroProxy',
+                            zone='hydroshareZone', auth='wwwHydroProxy',
+                            irods_default_hash_scheme='MD5')
+        self.pool = IrodsConnectionPool(self.env, max_size=2, idle_timeout=60,
+                                        health_check_interval=30)
+        patcher = patch.object(IrodsConnectionPool, '_connect',
+                               side_effect=lambda: PooledConnection(Mock()))
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_connection_is_reused(self):
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(self.connect.call_count, 1)
+        self.assertEqual(self.pool.stats['idle'], 1)
+        self.assertEqual(self.pool.stats['in_use'], 0)
+
+    def test_idle_connections_are_evicted(self):
+        with self.pool.connection() as first:
+            pass
+        self.pool._idle[0].last_used = time.time() - 120
+        with self.pool.connection() as second:
+            pass
+        self.assertIsNot(first, second)
+        first.cleanup.assert_called_once_with()
+
+    def test_unhealthy_connection_is_replaced(self):
+        with self.pool.connection() as first:
+            pass
+        self.pool._idle[0].last_checked = time.time() - 120
+        first.collections.get.side_effect = Exception('connection reset')
+        with self.pool.connection() as second:
+            pass
+        self.assertIsNot(first, second)
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_errors_raise_session_exception(self):
+        with self.assertRaises(SessionException):
+            with self.pool.connection():
+                raise IOError('broken pipe')
+        # a connection that failed with a network error is not returned to the pool
+        self.assertEqual(self.pool.stats['idle'], 0)
+        self.assertEqual(self.pool.stats['in_use'], 0)
+
+    def test_acquire_times_out_when_pool_is_exhausted(self):
+        self.pool.acquire_timeout = 0.1
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        with self.assertRaises(SessionException):
+            self.pool.acquire()
+        self.pool.release(first)
+        self.pool.release(second)
+        self.assertEqual(self.pool.stats['in_use'], 0)
@@ -0,0 +1,86 @@
+import os
+import zipfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from django_irods.zipstream import ZipMember, ZipStream, ZipStreamError, parse_range
+
+
+class FakeStorage(object):
+    def __init__(self, objects):
+        self.objects = objects
+        self.reads = []
+
+    def read_chunks(self, name, offset=0):
+        self.reads.append((name, offset))
+        content = self.objects[name][offset:]
+        for i in range(0, len(content), 1000):
+            yield content[i:i + 1000]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestZipStream(SimpleTestCase):
+    def setUp(self):
+        super(TestZipStream, self).setUp()
+        cache.clear()
+        self.storage = FakeStorage({
+            '/zone/abc/data/contents/folder/a.txt': 'a' * 5000,
+            '/zone/abc/data/contents/folder/sub/b.bin': os.urandom(12345),
+            '/zone/abc/data/contents/folder/empty.txt': ''})
+        self.members = [ZipMember(path.split('/contents/')[1], path, len(content),
+                                  '1561234567', 'md5')
+                        for path, content in sorted(self.storage.objects.items())]
+
+    def test_archive_content(self):
+        zip_stream = ZipStream(self.storage, self.members)
+        content = ''.join(zip_stream.iter_bytes())
+        self.assertEqual(len(content), zip_stream.size)
+        with zipfile.ZipFile(BytesIO(content)) as zf:
+            self.assertIsNone(zf.testzip())
+            for member in self.members:
+                self.assertEqual(zf.read(member.arcname), self.storage.objects[member.irods_path])
+
+    def test_ranges_match_the_full_archive(self):
+        content = ''.join(ZipStream(self.storage, self.members).iter_bytes())
+        size = len(content)
+        for start, end in [(0, 10), (100, 5200), (5000, size - 1), (size - 22, size - 1)]:
+            zip_stream = ZipStream(self.storage, self.members)
+            self.assertEqual(''.join(zip_stream.iter_bytes(start, end)), content[start:end + 1])
+
+    def test_resumed_download_uses_cached_crcs(self):
+        content = ''.join(ZipStream(self.storage, self.members).iter_bytes())
+        self.storage.reads = []
+        start = len(content) - 100
+        zip_stream = ZipStream(self.storage, self.members)
+        self.assertEqual(''.join(zip_stream.iter_bytes(start)), content[start:])
+        # only the central directory is in range and all crc32 values are cached
+        self.assertEqual(self.storage.reads, [])
+
+    def test_range_without_cached_crc_reads_members(self):
+        content = ''.join(ZipStream(self.storage, self.members).iter_bytes())
+        cache.clear()
+        start = len(content) - 100
+        zip_stream = ZipStream(self.storage, self.members)
+        self.assertEqual(''.join(zip_stream.iter_bytes(start)), content[start:])
+
+    def test_changed_member_aborts_the_stream(self):
+        zip_stream = ZipStream(self.storage, self.members)
+        self.storage.objects['/zone/abc/data/contents/folder/a.txt'] = 'short'
+        with self.assertRaises(ZipStreamError):
+            ''.join(zip_stream.iter_bytes())
+
+    def test_etag_changes_with_members(self):
+        etag = ZipStream(self.storage, self.members).etag
+        self.members[0] = self.members[0]._replace(modify_time='1561234568')
+        self.assertNotEqual(ZipStream(self.storage, self.members).etag, etag)
+
+    def test_parse_range(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertEqual(parse_range('bytes=10-', 100), (10, 99))
+        self.assertEqual(parse_range('bytes=10-1000', 100), (10, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=100-', 100)
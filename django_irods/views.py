@@ -6,7 +6,8 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse, FileResponse, HttpResponseRedirect
+from django.http import HttpResponse, FileResponse, HttpResponseRedirect, \
+    StreamingHttpResponse
 from rest_framework.decorators import api_view
 
 from django_irods import icommands
@@ -16,7 +17,8 @@ from hs_core.signals import pre_download_file, pre_check_bag_flag
 from hs_core.tasks import create_bag_by_irods, create_temp_zip, delete_zip
 from hs_core.views.utils import authorize, ACTION_TO_AUTHORIZE
 from . import models as m
-from .icommands import Session, GLOBAL_SESSION
+from .icommands import Session, GLOBAL_SESSION, SessionException
+from .zipstream import ZipMember, ZipStream, ZipStreamError, parse_range
 from hs_core.models import ResourceFile
 from drf_yasg.utils import swagger_auto_schema
 
@@ -194,6 +196,15 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
 
     resource_cls = check_resource_type(res.resource_type)
 
+    if is_zip_request and use_zip_stream(request, rest_call):
+        try:
+            return stream_zip(request, res, irods_path, split_path_strs[-1] + '.zip',
+                              is_sf_agg_file, is_sf_request, resource_cls)
+        except (SessionException, ZipStreamError) as ex:
+            # e.g., the archive would need ZIP64: build it with create_temp_zip instead
+            logger.warn(u"cannot stream zip of {}, creating it in iRODS: {}".format(
+                path, getattr(ex, 'stderr', ex)))
+
     if is_zip_request:
 
         if use_async:
@@ -402,6 +413,99 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
     return response
 
 
+def use_zip_stream(request, rest_call=False):
+    """Return True if a zip download should be streamed instead of created by create_temp_zip.
+
+    REST clients poll the task created by create_temp_zip, so they have to ask for a streamed
+    zip explicitly with the stream=true query parameter.
+    """
+    if not getattr(settings, 'IRODS_STREAMING_ZIP', False):
+        return False
+    if rest_call:
+        return request.GET.get('stream', 'false').lower() == 'true'
+    return True
+
+
+def _zip_stream_members(res, irods_path, sf_aggregation, sf_zip):
+    """Return the ZipMember list of the archive create_temp_zip would create for irods_path."""
+    if res.resource_type == "CompositeResource":
+        if '/data/contents/' in irods_path:
+            short_path = irods_path.split('/data/contents/')[1]  # strip /data/contents/
+            res.create_aggregation_xml_documents(aggregation_name=short_path)
+        else:  # all metadata included, e.g., /data/*
+            res.create_aggregation_xml_documents()
+
+    istorage = res.get_irods_storage()
+    if not irods_path.startswith('/'):
+        irods_path = os.path.join('/', settings.IRODS_ZONE, 'home', settings.IRODS_USERNAME,
+                                  irods_path)
+    parent, name = os.path.split(irods_path)
+    if sf_zip:
+        # a single file is zipped in a folder of its name, with the aggregation metadata files
+        names = [name]
+        if sf_aggregation:
+            names.extend([name + '_resmap.xml', name + '_meta.xml'])
+        listing = istorage.list_checksums(parent, recursive=False)
+        rel_paths = [n for n in names if n in listing]
+        coll = parent
+    else:
+        listing = istorage.list_checksums(irods_path)
+        rel_paths = sorted(listing)
+        coll = irods_path
+    members = []
+    for rel_path in rel_paths:
+        checksum, size, modify_time = listing[rel_path]
+        members.append(ZipMember(u'/'.join([name, rel_path]), os.path.join(coll, rel_path),
+                                 size, modify_time, checksum))
+    return members
+
+
+def stream_zip(request, res, irods_path, zip_name, sf_aggregation, sf_zip, resource_cls):
+    """Stream a zip archive of irods_path to the client without creating it in iRODS.
+
+    The archive has the same members as one created by create_temp_zip, stored without
+    compression. A single byte range can be requested with the Range header, e.g., to resume
+    an interrupted download.
+
+    :raises SessionException: if the content to zip cannot be listed in iRODS
+    :raises ZipStreamError: if the archive would need ZIP64 extensions
+    """
+    members = _zip_stream_members(res, irods_path, sf_aggregation, sf_zip)
+    zip_stream = ZipStream(res.get_irods_storage(), members)
+    etag = zip_stream.etag
+
+    byte_range = None
+    if request.META.get('HTTP_IF_RANGE', etag) == etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), zip_stream.size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(zip_stream.size)
+            return response
+
+    if byte_range is None:
+        response = StreamingHttpResponse(zip_stream.iter_bytes(), content_type='application/zip')
+        response['Content-Length'] = zip_stream.size
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(zip_stream.iter_bytes(start, end), status=206,
+                                         content_type='application/zip')
+        response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, zip_stream.size)
+        response['Content-Length'] = end - start + 1
+    response['Content-Disposition'] = 'attachment; filename="{name}"'.format(name=zip_name)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    # the response is generated by django, nginx should pass it on instead of buffering it
+    response['X-Accel-Buffering'] = 'no'
+
+    if byte_range is None or byte_range[0] == 0:
+        # only count downloads once, not for every resumed part
+        pre_download_file.send(sender=resource_cls, resource=res,
+                               download_file_name=zip_name, request=request)
+        res.update_download_count()
+    return response
+
+
 @swagger_auto_schema(method='get', auto_schema=None)
 @api_view(['GET'])
 def rest_download(request, path, *args, **kwargs):
@@ -0,0 +1,245 @@
+"""Zip archives of iRODS data objects streamed directly to the client.
+
+Members are stored without compression and their crc32 is written in a data descriptor after
+the member data, so the archive is produced in one pass while the data objects are read from
+iRODS chunk by chunk; nothing is written to a temporary zip file. Because every header is
+derived from the member names, sizes and modification times only, the layout of the archive
+is known before the first byte is sent. This gives an exact Content-Length and allows
+HTTP range requests to be served by producing just the requested slice.
+
+The only bytes that depend on file content are the crc32 values. They are computed while a
+member is streamed and cached under the iRODS checksum, size and modification time of the
+data object, so that a resumed download does not need to read the skipped members again.
+"""
+
+import hashlib
+import logging
+import re
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from django_irods.icommands import SessionException
+
+logger = logging.getLogger(__name__)
+
+ZIP_STREAM_CRC_CACHE_TIMEOUT = getattr(settings, 'ZIP_STREAM_CRC_CACHE_TIMEOUT',
+                                       60 * 60 * 24 * 7)
+
+# archives that would need ZIP64 extensions are not streamed
+ZIP_MAX_SIZE = 0xFFFFFFFF
+ZIP_MAX_MEMBERS = 0xFFFF
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_DATA_DESCRIPTOR = struct.Struct('<IIII')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_OF_CENTRAL_DIR = struct.Struct('<IHHHHIIH')
+
+_ZIP_VERSION = 20
+# bit 3: crc32 is in the data descriptor, bit 11: member names are utf-8
+_ZIP_FLAGS = 0x08 | 0x800
+_FILE_ATTRIBUTES = (0o100644 & 0xFFFF) << 16
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+ZipMember = namedtuple('ZipMember', ['arcname', 'irods_path', 'size', 'modify_time',
+                                     'checksum'])
+
+
+class ZipStreamError(Exception):
+    pass
+
+
+def _dos_date_time(modify_time):
+    """Convert seconds since the epoch as reported by iRODS into zip date and time fields."""
+    try:
+        t = time.gmtime(int(modify_time))
+    except (TypeError, ValueError):
+        t = time.gmtime(0)
+    if t.tm_year < 1980:
+        return (1 << 5) | 1, 0
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return dos_date, dos_time
+
+
+def _crc_cache_key(member):
+    key = u'{}\t{}\t{}\t{}'.format(member.irods_path, member.size, member.modify_time,
+                                   member.checksum)
+    return 'zipstream_crc:' + hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def parse_range(header, total):
+    """Parse a single-range HTTP Range header into an inclusive (start, end) byte range.
+
+    :return: None if the header is absent, malformed or asks for several ranges, in which
+    case the whole archive is sent
+    :raises ValueError: if the range cannot be satisfied
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None or (not match.group(1) and not match.group(2)):
+        return None
+    if not match.group(1):
+        # suffix range: the last n bytes
+        length = int(match.group(2))
+        if length == 0:
+            raise ValueError(header)
+        return max(total - length, 0), total - 1
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else total - 1
+    if start > end or start >= total:
+        raise ValueError(header)
+    return start, min(end, total - 1)
+
+
+class ZipStream(object):
+    """A zip archive of iRODS data objects with a deterministic layout.
+
+    :param istorage: IrodsStorage used to read the members
+    :param members: list of ZipMember in archive order
+    """
+
+    def __init__(self, istorage, members):
+        self.istorage = istorage
+        self.members = list(members)
+        if len(self.members) > ZIP_MAX_MEMBERS:
+            raise ZipStreamError("too many members for a zip without ZIP64 extensions")
+        self._crcs = {}
+        self._headers = []
+        self._offsets = []
+        offset = 0
+        for member in self.members:
+            header = self._local_header(member)
+            self._headers.append(header)
+            self._offsets.append(offset)
+            offset += len(header) + member.size + _DATA_DESCRIPTOR.size
+        self._central_dir_offset = offset
+        self._central_dir_size = sum(_CENTRAL_HEADER.size + len(m.arcname.encode('utf-8'))
+                                     for m in self.members)
+        self.size = offset + self._central_dir_size + _END_OF_CENTRAL_DIR.size
+        if self.size > ZIP_MAX_SIZE:
+            raise ZipStreamError("archive too large for a zip without ZIP64 extensions")
+
+    @property
+    def etag(self):
+        """An entity tag that changes whenever any member changes."""
+        digest = hashlib.md5()
+        for member in self.members:
+            digest.update(u'{}\t{}\t{}\t{}\n'.format(
+                member.arcname, member.size, member.modify_time,
+                member.checksum).encode('utf-8'))
+        return '"{}"'.format(digest.hexdigest())
+
+    def _local_header(self, member):
+        name = member.arcname.encode('utf-8')
+        dos_date, dos_time = _dos_date_time(member.modify_time)
+        # sizes are known up front and are recorded for readers that do not look at the
+        # central directory; the crc32 follows in the data descriptor
+        return _LOCAL_HEADER.pack(0x04034b50, _ZIP_VERSION, _ZIP_FLAGS, 0, dos_time, dos_date,
+                                  0, member.size, member.size, len(name), 0) + name
+
+    def _data_descriptor(self, index):
+        member = self.members[index]
+        return _DATA_DESCRIPTOR.pack(0x08074b50, self._crc(index), member.size, member.size)
+
+    def _central_directory(self):
+        records = []
+        for index, member in enumerate(self.members):
+            name = member.arcname.encode('utf-8')
+            dos_date, dos_time = _dos_date_time(member.modify_time)
+            records.append(_CENTRAL_HEADER.pack(
+                0x02014b50, _ZIP_VERSION, _ZIP_VERSION, _ZIP_FLAGS, 0, dos_time, dos_date,
+                self._crc(index), member.size, member.size, len(name), 0, 0, 0, 0,
+                _FILE_ATTRIBUTES, self._offsets[index]) + name)
+        records.append(_END_OF_CENTRAL_DIR.pack(
+            0x06054b50, 0, 0, len(self.members), len(self.members), self._central_dir_size,
+            self._central_dir_offset, 0))
+        return ''.join(records)
+
+    def _crc(self, index):
+        """Return the crc32 of a member, reading the member if it is not known yet."""
+        if index not in self._crcs:
+            member = self.members[index]
+            if member.size == 0:
+                self._crcs[index] = 0
+                return 0
+            crc = cache.get(_crc_cache_key(member))
+            if crc is None:
+                for _ in self._read_member(index, 0):
+                    pass
+            else:
+                self._crcs[index] = crc
+        return self._crcs[index]
+
+    def _read_member(self, index, start):
+        """Yield the bytes of a member starting at *start*.
+
+        The crc32 is computed as a side effect when the member is read from its beginning.
+        """
+        member = self.members[index]
+        compute_crc = index not in self._crcs and \
+            cache.get(_crc_cache_key(member)) is None
+        offset = 0 if compute_crc else start
+        crc = 0
+        length = offset
+        for chunk in self.istorage.read_chunks(member.irods_path, offset):
+            if compute_crc:
+                crc = zlib.crc32(chunk, crc)
+            if length + len(chunk) > start:
+                yield chunk[max(start - length, 0):]
+            length += len(chunk)
+        if length != member.size:
+            # the headers already sent announced another size, the archive cannot be completed
+            raise ZipStreamError("{} changed while it was streamed".format(member.irods_path))
+        if compute_crc:
+            self._crcs[index] = crc & 0xFFFFFFFF
+            cache.set(_crc_cache_key(member), self._crcs[index], ZIP_STREAM_CRC_CACHE_TIMEOUT)
+
+    def _segments(self):
+        """Yield (offset, length, producer) for each contiguous part of the archive.
+
+        producer(start) yields the bytes of the segment starting at *start* within it.
+        """
+        for index, member in enumerate(self.members):
+            header = self._headers[index]
+            offset = self._offsets[index]
+            yield offset, len(header), lambda start, header=header: [header[start:]]
+            offset += len(header)
+            yield offset, member.size, \
+                lambda start, index=index: self._read_member(index, start)
+            offset += member.size
+            yield offset, _DATA_DESCRIPTOR.size, \
+                lambda start, index=index: [self._data_descriptor(index)[start:]]
+        yield self._central_dir_offset, self.size - self._central_dir_offset, \
+            lambda start: [self._central_directory()[start:]]
+
+    def iter_bytes(self, start=0, end=None):
+        """Yield the archive bytes from *start* up to and including *end*."""
+        if end is None:
+            end = self.size - 1
+        for offset, length, producer in self._segments():
+            if offset + length <= start or length == 0:
+                continue
+            if offset > end:
+                break
+            position = offset + max(start - offset, 0)
+            try:
+                for chunk in producer(position - offset):
+                    if position + len(chunk) > end + 1:
+                        chunk = chunk[:end + 1 - position]
+                    if chunk:
+                        yield chunk
+                    position += len(chunk)
+                    if position > end:
+                        break
+            except SessionException as ex:
+                logger.error("streaming zip failed: {}".format(ex.stderr))
+                raise
+            if position > end:
+                break
@@ -7,8 +7,11 @@ who owns what. Non-sensical options are possible to create.
 This code is not a design pattern for actually interacting with communities.
 """
 
+from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
 from hs_access_control.models.community import Community
+from hs_access_control.models.effective import privilege_changed, \
+        refresh_effective_privileges
 from hs_access_control.models.privilege import PrivilegeCodes, \
         UserGroupPrivilege, UserCommunityPrivilege, GroupCommunityPrivilege
 from hs_access_control.management.utilities import community_from_name_or_id, \
@@ -277,6 +280,7 @@ class Command(BaseCommand):
                     if gcp.allow_view != (not options['prohibit_view']):
                         gcp.allow_view = not options['prohibit_view']
                         gcp.save()
+                        privilege_changed(group=group, community=community)
                     # pass privilege changes through the privilege system to record provenance.
                     if gcp.privilege != privilege or owner != gcp.grantor:
                         GroupCommunityPrivilege.share(group=group, community=community,
@@ -295,6 +299,7 @@ class Command(BaseCommand):
                     if gcp.allow_view != (not options['prohibit_view']):
                         gcp.allow_view = not options['prohibit_view']
                         gcp.save()
+                        privilege_changed(group=group, community=community)
 
             elif action == 'remove':
 
@@ -314,7 +319,11 @@ class Command(BaseCommand):
                 exit(1)
 
             print("removing community '{}' (id={}).".format(community.name, community.id))
+            # members of the community's groups lose access to each other's resources
+            affected_users = list(User.objects.filter(u2ugp__group__g2gcp__community=community)
+                                              .distinct())
             community.delete()
+            refresh_effective_privileges(affected_users)
 
         else:
             print("unknown command '{}'.".format(command))
@@ -0,0 +1,83 @@
+"""
+Check or rebuild the materialized effective privileges of users over resources.
+
+UserResourceEffectivePrivilege is kept up to date by sharing and unsharing, but must be
+built once before ACCESS_CONTROL_EFFECTIVE_PRIVILEGES is enabled, and can be checked
+against the privilege tables at any time.
+* Optional argument --rebuild: recompute the stored privileges instead of checking them.
+* Optional argument --user: only check or rebuild the privileges of this user.
+* Optional argument --log: logs output to system log.
+"""
+
+import logging
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from hs_access_control.models.effective import check_effective_privileges, \
+        refresh_effective_privileges
+from hs_access_control.models.privilege import PrivilegeCodes
+from hs_access_control.management.utilities import user_from_name
+
+
+class Command(BaseCommand):
+    help = "Check or rebuild the materialized effective privileges of users over resources."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',  # True for presence, False for absence
+            dest='rebuild',       # value is options['rebuild']
+            help='recompute stored effective privileges',
+        )
+
+        parser.add_argument(
+            '--user',
+            dest='username',
+            help='username of the only user to check or rebuild',
+        )
+
+        parser.add_argument(
+            '--log',
+            action='store_true',  # True for presence, False for absence
+            dest='log',           # value is options['log']
+            help='log differences to system log',
+        )
+
+    def handle(self, *args, **options):
+        logger = logging.getLogger(__name__)
+
+        if options['username']:
+            user = user_from_name(options['username'])
+            if user is None:
+                exit(1)
+            users = [user]
+        else:
+            users = User.objects.all().order_by('pk').iterator()
+
+        if options['rebuild']:
+            count = 0
+            for user in users:
+                refresh_effective_privileges([user])
+                count += 1
+            msg = "rebuilt effective privileges of {} users".format(count)
+            print(msg)
+            if options['log']:
+                logger.info(msg)
+            return
+
+        differences = check_effective_privileges(users)
+        for user, resource_id, stored, computed in differences:
+            msg = "user '{}' (id={}) resource id={}: stored {}, expected {}".format(
+                user.username, user.id, resource_id,
+                PrivilegeCodes.NAMES[stored], PrivilegeCodes.NAMES[computed])
+            print(msg)
+            if options['log']:
+                logger.error(msg)
+        msg = "{} effective privilege differences found".format(len(differences))
+        print(msg)
+        if options['log']:
+            logger.info(msg)
+        if differences:
+            exit(1)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0004_auto_20150721_1125'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_access_control', '0023_auto_20190131_1523'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserResourceEffectivePrivilege',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('privilege', models.IntegerField(choices=[(1, b'Owner'), (2, b'Change'), (3, b'View')], default=3, editable=False)),
+                ('resource', models.ForeignKey(editable=False, help_text=b'resource to which privilege applies', on_delete=django.db.models.deletion.CASCADE, related_name='r2urep', to='hs_core.BaseResource')),
+                ('user', models.ForeignKey(editable=False, help_text=b'user holding privilege', on_delete=django.db.models.deletion.CASCADE, related_name='u2urep', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='userresourceeffectiveprivilege',
+            unique_together=set([('user', 'resource')]),
+        ),
+    ]
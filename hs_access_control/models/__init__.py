@@ -7,5 +7,7 @@ from user import UserAccess
 from group import GroupAccess, GroupMembershipRequest
 from resource import ResourceAccess
 from community import Community
+from effective import UserResourceEffectivePrivilege, compute_effective_privileges, \
+        refresh_effective_privileges, check_effective_privileges, group_peer_users
 from exceptions import PolymorphismError
 from utilities import access_provenance, access_permissions, coarse_permissions
@@ -0,0 +1,198 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import Q
+
+from hs_core.models import BaseResource
+from hs_access_control.models.privilege import PrivilegeCodes
+
+#############################################
+# Materialized effective privilege of users over resources
+#
+# UserAccess.view_resources and UserAccess.edit_resources combine user, group and
+# community privileges in one four-way join that must be de-duplicated. With
+# ACCESS_CONTROL_EFFECTIVE_PRIVILEGES enabled, these read the combined privilege from
+# UserResourceEffectivePrivilege instead. PrivilegeBase.update keeps that table up to date
+# for the (user, resource) pairs affected by each share, unshare and undo_share, so that
+# every change to the privilege tables goes through refresh_effective_privileges.
+#
+# The table records declared privilege: immutability is applied when reading it, so that
+# changing the immutable flag of a resource does not require an update.
+#############################################
+
+
+def use_effective_privileges():
+    """ whether UserAccess reads resource access lists from UserResourceEffectivePrivilege """
+    return getattr(settings, 'ACCESS_CONTROL_EFFECTIVE_PRIVILEGES', False)
+
+
+def view_resources_q(user):
+    """ condition on BaseResource for resources that user can view """
+    return (
+        # direct access
+        Q(r2urp__user=user) |
+        # access via a group
+        Q(r2grp__group__gaccess__active=True,
+          r2grp__group__g2ugp__user=user) |
+        # access via an unprivileged peer group in a community
+        Q(r2grp__group__gaccess__active=True,
+          r2grp__group__g2gcp__allow_view=True,
+          r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
+          r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=user) |
+        # access via a privileged peer group in a community
+        Q(r2grp__group__gaccess__active=True,
+          r2grp__group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE,
+          r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
+          r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=user))
+
+
+def change_resources_q(user):
+    """ condition on BaseResource for resources that user can change, ignoring immutability """
+    return (
+        # user has direct access
+        Q(r2urp__user=user,
+          r2urp__privilege__lte=PrivilegeCodes.CHANGE) |
+        # user has direct access through being a member of a group
+        Q(r2grp__group__gaccess__active=True,
+          r2grp__group__g2ugp__user=user,
+          r2grp__privilege=PrivilegeCodes.CHANGE) |
+        # user has access by being a member of a privileged group in the same community
+        # Note: CHANGE privilege overrides allow_view flag.
+        Q(r2grp__group__gaccess__active=True,
+          r2grp__privilege=PrivilegeCodes.CHANGE,
+          r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
+          r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=user,
+          r2grp__group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE))
+
+
+class UserResourceEffectivePrivilege(models.Model):
+    """ Effective privilege of a user over a resource, combining all ways of sharing
+
+    This is derived data: it is maintained by refresh_effective_privileges and can be
+    checked and rebuilt with the management command effective_privileges.
+    """
+
+    privilege = models.IntegerField(choices=PrivilegeCodes.CHOICES,
+                                    editable=False,
+                                    default=PrivilegeCodes.VIEW)
+
+    user = models.ForeignKey(User,
+                             null=False,
+                             editable=False,
+                             related_name='u2urep',
+                             help_text='user holding privilege')
+
+    resource = models.ForeignKey(BaseResource,
+                                 null=False,
+                                 editable=False,
+                                 related_name='r2urep',
+                                 help_text='resource to which privilege applies')
+
+    class Meta:
+        unique_together = ('user', 'resource')
+
+
+def compute_effective_privileges(user, resources=None):
+    """
+    Compute the effective privileges of a user from the privilege tables.
+
+    :param user: user for whom to compute privileges.
+    :param resources: optional list of resources or resource ids to restrict the computation.
+    :return: dict of resource id to privilege code, for resources the user can view.
+    """
+    queryset = BaseResource.objects.all()
+    if resources is not None:
+        queryset = queryset.filter(pk__in=[getattr(r, 'pk', r) for r in resources])
+
+    computed = {}
+    for rid in queryset.filter(view_resources_q(user)).values_list('pk', flat=True).distinct():
+        computed[rid] = PrivilegeCodes.VIEW
+    for rid in queryset.filter(change_resources_q(user)).values_list('pk', flat=True).distinct():
+        computed[rid] = PrivilegeCodes.CHANGE
+    for rid in queryset.filter(r2urp__user=user, r2urp__privilege=PrivilegeCodes.OWNER)\
+                       .values_list('pk', flat=True):
+        computed[rid] = PrivilegeCodes.OWNER
+    return computed
+
+
+def stored_effective_privileges(user, resources=None):
+    """ Return the stored effective privileges of a user as a dict of resource id to code """
+    queryset = UserResourceEffectivePrivilege.objects.filter(user=user)
+    if resources is not None:
+        queryset = queryset.filter(resource__in=[getattr(r, 'pk', r) for r in resources])
+    return dict(queryset.values_list('resource_id', 'privilege'))
+
+
+def refresh_effective_privileges(users, resources=None):
+    """
+    Recompute stored effective privileges of users, optionally only over some resources.
+
+    Only rows that differ from the computed privileges are written.
+    """
+    for user in users:
+        computed = compute_effective_privileges(user, resources)
+        stored = stored_effective_privileges(user, resources)
+
+        removed = [rid for rid in stored if rid not in computed]
+        if removed:
+            UserResourceEffectivePrivilege.objects.filter(user=user, resource__in=removed)\
+                                                  .delete()
+        for rid, privilege in computed.items():
+            if rid in stored and stored[rid] != privilege:
+                UserResourceEffectivePrivilege.objects.filter(user=user, resource=rid)\
+                                                      .update(privilege=privilege)
+        UserResourceEffectivePrivilege.objects.bulk_create([
+            UserResourceEffectivePrivilege(user=user, resource_id=rid, privilege=privilege)
+            for rid, privilege in computed.items() if rid not in stored])
+
+
+def check_effective_privileges(users=None):
+    """
+    Compare stored effective privileges with the privilege tables.
+
+    :param users: users to check; all users if None.
+    :return: list of (user, resource id, stored privilege, computed privilege) for every
+        difference, where PrivilegeCodes.NONE stands for a missing privilege.
+    """
+    if users is None:
+        users = User.objects.all().order_by('pk').iterator()
+    differences = []
+    for user in users:
+        computed = compute_effective_privileges(user)
+        stored = stored_effective_privileges(user)
+        for rid in sorted(set(computed) | set(stored)):
+            if computed.get(rid) != stored.get(rid):
+                differences.append((user, rid,
+                                    stored.get(rid, PrivilegeCodes.NONE),
+                                    computed.get(rid, PrivilegeCodes.NONE)))
+    return differences
+
+
+def group_peer_users(group):
+    """ users whose effective privileges depend upon resources shared with group """
+    return User.objects.filter(Q(u2ugp__group=group) |
+                               Q(u2ugp__group__g2gcp__community__c2gcp__group=group))\
+                       .distinct()
+
+
+def privilege_changed(user=None, group=None, resource=None, community=None):
+    """
+    Update effective privileges after a privilege record has been changed.
+
+    This is called by PrivilegeBase.update with the key of the changed record.
+    """
+    if resource is not None:
+        if user is not None:
+            refresh_effective_privileges([user], [resource])
+        elif group is not None:
+            refresh_effective_privileges(group_peer_users(group), [resource])
+    elif group is not None:
+        if user is not None:
+            refresh_effective_privileges([user])
+        elif community is not None:
+            # the group itself may have just left the community
+            users = User.objects.filter(Q(u2ugp__group=group) |
+                                        Q(u2ugp__group__g2gcp__community=community))\
+                                .distinct()
+            refresh_effective_privileges(users)
+    # user-community privilege does not confer privilege over resources
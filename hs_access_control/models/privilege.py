@@ -109,6 +109,9 @@ class PrivilegeBase(models.Model):
         There are no access control rules applied; this routine is unconditional.
         Only use this routine if you wish to completely bypass access control.
         Note also that using this routine directly breaks provenance and disables undo.
+
+        Effective privileges of the users affected by the change are recomputed;
+        see hs_access_control.models.effective.
         """
         grantor = kwargs['grantor']
         privilege = kwargs.get('privilege', None)
@@ -131,6 +134,11 @@ class PrivilegeBase(models.Model):
             cls.objects.filter(**kwargs) \
                .delete()
 
+        # keep effective privileges of affected users in sync; kwargs now holds the key.
+        # prevent import loops
+        from hs_access_control.models.effective import privilege_changed
+        privilege_changed(**kwargs)
+
     @classmethod
     def share(cls, **kwargs):
         """
@@ -10,6 +10,8 @@ from hs_access_control.models.privilege import PrivilegeCodes, \
 from hs_access_control.models.group import GroupAccess, GroupMembershipRequest
 from hs_access_control.models.exceptions import PolymorphismError
 from hs_access_control.models.community import Community
+from hs_access_control.models.effective import use_effective_privileges, view_resources_q, \
+        change_resources_q, group_peer_users, refresh_effective_privileges
 
 #############################################
 # Methods and data for users
@@ -240,7 +242,10 @@ class UserAccess(models.Model):
             # GroupResourcePrivilege.objects.filter(group=this_group).delete()
             # access_group.delete()
 
+            # resources shared with the group are no longer accessible to its peers
+            affected_users = list(group_peer_users(this_group))
             this_group.delete()
+            refresh_effective_privileges(affected_users)
         else:
             raise PermissionDenied("User must own group")
 
@@ -1031,23 +1036,9 @@ class UserAccess(models.Model):
         if not self.user.is_active:
             raise PermissionDenied("Requesting user is not active")
 
-        return BaseResource.objects.filter(
-            # direct access
-            Q(r2urp__user=self.user) |
-            # access via a group
-            Q(r2grp__group__gaccess__active=True,
-              r2grp__group__g2ugp__user=self.user) |
-            # access via an unprivileged peer group in a community
-            Q(r2grp__group__gaccess__active=True,
-              r2grp__group__g2gcp__allow_view=True,
-              r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
-              r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=self.user) |
-            # access via a privileged peer group in a community
-            Q(r2grp__group__gaccess__active=True,
-              r2grp__group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE,
-              r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
-              r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=self.user)
-            ).distinct()
+        if use_effective_privileges():
+            return BaseResource.objects.filter(r2urep__user=self.user)
+        return BaseResource.objects.filter(view_resources_q(self.user)).distinct()
 
     @property
     def owned_resources(self):
@@ -1086,26 +1077,14 @@ class UserAccess(models.Model):
         # 2. it's shared with a group that has edit privilege and contains the user,
         # 3. it's shared with a group that has edit privilege and a community that
         #    contains the user, and the community share preserves edit
-
-        return BaseResource.objects.filter(
-            # user has direct access
-            Q(raccess__immutable=False,
-              r2urp__user=self.user,
-              r2urp__privilege__lte=PrivilegeCodes.CHANGE) |
-            # user has direct access through being a member of a group
-            Q(raccess__immutable=False,
-              r2grp__group__gaccess__active=True,
-              r2grp__group__g2ugp__user=self.user,
-              r2grp__privilege=PrivilegeCodes.CHANGE) |
-            # user has access by being a member of a privileged group in the same community
-            # Note: CHANGE privilege overrides allow_view flag.
-            Q(raccess__immutable=False,
-              r2grp__group__gaccess__active=True,
-              r2grp__privilege=PrivilegeCodes.CHANGE,
-              r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
-              r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=self.user,
-              r2grp__group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE))\
-            .distinct()
+        # See change_resources_q.
+
+        if use_effective_privileges():
+            return BaseResource.objects.filter(raccess__immutable=False,
+                                               r2urep__user=self.user,
+                                               r2urep__privilege__lte=PrivilegeCodes.CHANGE)
+        return BaseResource.objects.filter(change_resources_q(self.user),
+                                           raccess__immutable=False).distinct()
 
     def get_resources_with_explicit_access(self, this_privilege,
                                            via_user=True, via_group=False, via_community=False):
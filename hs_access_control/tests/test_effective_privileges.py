@@ -0,0 +1,158 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import Group
+
+from hs_access_control.models import PrivilegeCodes, UserResourceEffectivePrivilege, \
+        check_effective_privileges, compute_effective_privileges
+from hs_access_control.tests.utilities import global_reset, is_equal_to_as_set
+from hs_core import hydroshare
+from hs_core.hydroshare.users import set_group_active_status
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+@override_settings(ACCESS_CONTROL_EFFECTIVE_PRIVILEGES=True)
+class TestEffectivePrivileges(MockIRODSTestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(TestEffectivePrivileges, self).setUp()
+        global_reset()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.dog = hydroshare.create_account(
+            'dog@gmail.com',
+            username='dog',
+            first_name='a little arfer',
+            last_name='last_name_dog',
+            superuser=False,
+            groups=[]
+        )
+        self.cat = hydroshare.create_account(
+            'cat@gmail.com',
+            username='cat',
+            first_name='not a dog',
+            last_name='last_name_cat',
+            superuser=False,
+            groups=[]
+        )
+        self.bat = hydroshare.create_account(
+            'bat@gmail.com',
+            username='bat',
+            first_name='a little batty',
+            last_name='last_name_bat',
+            superuser=False,
+            groups=[]
+        )
+        self.dogs = self.dog.uaccess.create_group(
+            title='dogs',
+            description="This is the dogs group",
+            purpose="Our purpose to collaborate on barking.")
+        self.cats = self.cat.uaccess.create_group(
+            title='cats',
+            description="This is the cats group",
+            purpose="Our purpose to collaborate on begging.")
+        # dog may share resources with cats
+        self.cat.uaccess.share_group_with_user(self.cats, self.dog, PrivilegeCodes.OWNER)
+
+        self.holes = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.dog,
+            title='all about dog holes',
+            metadata=[],
+        )
+        self.posts = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.cat,
+            title='all about scratching posts',
+            metadata=[],
+        )
+        self.pets = self.dog.uaccess.create_community(
+                'all kinds of pets',
+                'collaboration on how to be a better pet.')
+
+    def assertConsistent(self):
+        self.assertEqual(check_effective_privileges(), [])
+
+    def test_user_sharing(self):
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([self.holes], self.dog.uaccess.view_resources))
+        self.assertTrue(is_equal_to_as_set([self.holes], self.dog.uaccess.edit_resources))
+        self.assertTrue(is_equal_to_as_set([], self.bat.uaccess.view_resources))
+
+        self.dog.uaccess.share_resource_with_user(self.holes, self.bat, PrivilegeCodes.VIEW)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([self.holes], self.bat.uaccess.view_resources))
+        self.assertTrue(is_equal_to_as_set([], self.bat.uaccess.edit_resources))
+
+        self.dog.uaccess.share_resource_with_user(self.holes, self.bat, PrivilegeCodes.CHANGE)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([self.holes], self.bat.uaccess.edit_resources))
+
+        # immutability is applied when reading
+        self.holes.raccess.immutable = True
+        self.holes.raccess.save()
+        self.assertTrue(is_equal_to_as_set([], self.bat.uaccess.edit_resources))
+        self.assertTrue(is_equal_to_as_set([self.holes], self.bat.uaccess.view_resources))
+        self.holes.raccess.immutable = False
+        self.holes.raccess.save()
+
+        self.dog.uaccess.undo_share_resource_with_user(self.holes, self.bat)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([self.holes], self.bat.uaccess.view_resources))
+        self.assertTrue(is_equal_to_as_set([], self.bat.uaccess.edit_resources))
+
+        self.dog.uaccess.unshare_resource_with_user(self.holes, self.bat)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([], self.bat.uaccess.view_resources))
+
+    def test_group_sharing(self):
+        self.dog.uaccess.share_resource_with_group(self.holes, self.dogs, PrivilegeCodes.CHANGE)
+        self.dog.uaccess.share_group_with_user(self.dogs, self.bat, PrivilegeCodes.VIEW)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([self.holes], self.bat.uaccess.edit_resources))
+
+        set_group_active_status(self.dog, self.dogs.id, False)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([], self.bat.uaccess.view_resources))
+        set_group_active_status(self.dog, self.dogs.id, True)
+        self.assertConsistent()
+
+        self.dog.uaccess.unshare_group_with_user(self.dogs, self.bat)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([], self.bat.uaccess.view_resources))
+
+        self.dog.uaccess.share_group_with_user(self.dogs, self.bat, PrivilegeCodes.VIEW)
+        self.dog.uaccess.delete_group(self.dogs)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([], self.bat.uaccess.view_resources))
+
+    def test_community_sharing(self):
+        self.dog.uaccess.share_resource_with_group(self.holes, self.dogs, PrivilegeCodes.CHANGE)
+        self.dog.uaccess.share_community_with_group(self.pets, self.dogs, PrivilegeCodes.VIEW)
+        self.dog.uaccess.share_community_with_group(self.pets, self.cats, PrivilegeCodes.VIEW)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([self.holes, self.posts],
+                                           self.cat.uaccess.view_resources))
+        self.assertTrue(is_equal_to_as_set([self.posts], self.cat.uaccess.edit_resources))
+
+        self.dog.uaccess.share_community_with_group(self.pets, self.cats, PrivilegeCodes.CHANGE)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([self.holes, self.posts],
+                                           self.cat.uaccess.edit_resources))
+
+        self.dog.uaccess.unshare_community_with_group(self.pets, self.dogs)
+        self.assertConsistent()
+        self.assertTrue(is_equal_to_as_set([self.posts], self.cat.uaccess.view_resources))
+
+    def test_checker_reports_and_rebuild_repairs(self):
+        self.dog.uaccess.share_resource_with_user(self.holes, self.bat, PrivilegeCodes.VIEW)
+        UserResourceEffectivePrivilege.objects.filter(user=self.bat).delete()
+        UserResourceEffectivePrivilege.objects.filter(user=self.dog)\
+                                              .update(privilege=PrivilegeCodes.VIEW)
+        self.assertEqual(sorted((u.username, rid, stored, computed)
+                                for u, rid, stored, computed in check_effective_privileges()),
+                         [('bat', self.holes.id, PrivilegeCodes.NONE, PrivilegeCodes.VIEW),
+                          ('dog', self.holes.id, PrivilegeCodes.VIEW, PrivilegeCodes.OWNER)])
+
+        call_command('effective_privileges', rebuild=True)
+        self.assertConsistent()
+        self.assertEqual(compute_effective_privileges(self.dog),
+                         {self.holes.id: PrivilegeCodes.OWNER})
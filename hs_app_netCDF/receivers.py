@@ -35,7 +35,8 @@ def netcdf_post_create_resource(sender, **kwargs):
 
         if isinstance(nc_dataset, netCDF4.Dataset):
             # Extract the metadata from netcdf file
-            res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(temp_file)
+            res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(
+                temp_file, checksum=utils.get_resource_file_checksum(res_file))
             # populate metadata list with extracted metadata
             metadata = []
             add_metadata_to_list(metadata, res_dublin_core_meta, res_type_specific_meta)
@@ -4,7 +4,7 @@ from mezzanine.pages.page_processors import processor_for
 from hs_core import page_processors
 from hs_core.models import BaseResource
 from hs_core.views import add_generic_context
-from hs_core.views.utils import get_my_resources_list
+from hs_core.views.utils import get_my_resources_list, prefetch_listing_metadata
 from .models import CollectionResource
 
 
@@ -15,16 +15,20 @@ def landing_page(request, page):
 
     user = request.user
     if user.is_authenticated():
-        user_all_accessible_resource_list = get_my_resources_list(user)
+        user_all_accessible_resource_list = list(get_my_resources_list(user))
+        # the candidate list shows the titles of the resources
+        prefetch_listing_metadata(user_all_accessible_resource_list)
+        owned_resource_ids = set(user.uaccess.owned_resources.values_list('pk', flat=True))
     else:  # anonymous user
         user_all_accessible_resource_list = list(BaseResource.discoverable_resources.all())
+        owned_resource_ids = set()
 
     # resource is collectable if
     # 1) Shareable=True
     # 2) OR, current user is a owner of it
     user_all_collectable_resource_list = []
     for res in user_all_accessible_resource_list:
-        if res.raccess.shareable or res.raccess.owners.filter(pk=user.pk).exists():
+        if res.raccess.shareable or res.pk in owned_resource_ids:
             user_all_collectable_resource_list.append(res)
 
     # current contained resources list
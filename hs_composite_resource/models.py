@@ -1,5 +1,6 @@
 import os
 
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
 
 from mezzanine.pages.page_processors import processor_for
@@ -101,12 +102,14 @@ class CompositeResource(BaseResource):
                     return res_file.logical_file
         return None
 
-    def get_folder_aggregation_type_to_set(self, dir_path):
+    def get_folder_aggregation_type_to_set(self, dir_path, aggregation_checked=False):
         """Returns an aggregation (file type) type that the specified folder *dir_path* can
         possibly be set to.
 
         :param dir_path: Resource file directory path (full folder path starting with resource id)
         for which the possible aggregation type that can be set needs to be determined
+        :param aggregation_checked: if True, the caller has already verified that *dir_path*
+        does not represent an aggregation
 
         :return If the specified folder is already represents an aggregation or does
         not contain suitable file(s) then returns "" (empty string). If the specified folder
@@ -115,7 +118,7 @@ class CompositeResource(BaseResource):
         class name of that matching aggregation type.
         """
 
-        if self.get_folder_aggregation_object(dir_path) is not None:
+        if not aggregation_checked and self.get_folder_aggregation_object(dir_path) is not None:
             # target folder is already an aggregation
             return None
 
@@ -259,35 +262,62 @@ class CompositeResource(BaseResource):
         :param  name: name (aggregation path) of the aggregation to find
         :return an aggregation object if found
         :raises ObjectDoesNotExist if no matching aggregation is found
+
+        Note: aggregations are looked up by folder and by file path, which takes a few indexed
+        queries instead of loading all aggregations of the resource.
         """
-        for aggregation in self.logical_files:
-            # remove the last slash in aggregation_name if any
-            if aggregation.aggregation_name.rstrip('/') == name:
-                return aggregation
+        if name and not name.endswith('/'):
+            # a fileset aggregation is named by its folder
+            fileset = self.filesetlogicalfile_set.filter(folder__in=[name, name + '/']).first()
+            if fileset is not None:
+                return fileset
+
+            # other multi-file aggregations are named by the folder of their files
+            for aggregation in self._get_aggregations_of_files(
+                    self.files.filter(file_folder=name)):
+                if not aggregation.is_single_file_aggregation and not aggregation.is_fileset:
+                    return aggregation
+
+            # a single file aggregation is named by the path of its file
+            storage_field = 'fed_resource_file' if self.is_federated else 'resource_file'
+            res_files = self.files.filter(**{storage_field: os.path.join(self.file_path, name)})
+            for aggregation in self._get_aggregations_of_files(res_files):
+                if aggregation.is_single_file_aggregation:
+                    return aggregation
 
         raise ObjectDoesNotExist("No matching aggregation was found for name:{}".format(name))
 
+    @staticmethod
+    def _get_aggregations_of_files(res_files):
+        """Yields the distinct aggregations of the resource files *res_files* (a queryset)"""
+        logical_file_keys = res_files.filter(logical_file_object_id__isnull=False).values_list(
+            'logical_file_content_type_id', 'logical_file_object_id').distinct()
+        for content_type_id, object_id in logical_file_keys:
+            logical_file_class = ContentType.objects.get_for_id(content_type_id).model_class()
+            aggregation = logical_file_class.objects.filter(id=object_id).first()
+            if aggregation is not None:
+                yield aggregation
+
     def get_fileset_aggregation_in_path(self, path):
         """Get the first fileset aggregation in the path moving up (towards the root)in the path
         :param  path: directory path in which to search for a fileset aggregation
         :return a fileset aggregation object if found, otherwise None
         """
 
-        def get_fileset(path):
-            try:
-                aggregation = self.get_aggregation_by_name(path)
-                if aggregation.is_fileset:
-                    return aggregation
-            except ObjectDoesNotExist:
-                return None
-
-        while '/' in path:
-            fileset = get_fileset(path)
-            if fileset is not None:
-                return fileset
+        folders = []
+        path = path.rstrip('/')
+        while path:
+            folders.extend([path, path + '/'])
             path = os.path.dirname(path)
-        else:
-            return get_fileset(path)
+        if not folders:
+            return None
+
+        # the filesets of all folders in the path are read with one query; the nearest one has
+        # the longest folder
+        filesets = list(self.filesetlogicalfile_set.filter(folder__in=folders))
+        if not filesets:
+            return None
+        return max(filesets, key=lambda fileset: len(fileset.folder.rstrip('/')))
 
     def recreate_aggregation_xml_docs(self, orig_aggr_name, new_aggr_name):
         """
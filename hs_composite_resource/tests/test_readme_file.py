@@ -3,11 +3,13 @@ import os
 from django.contrib.auth.models import Group
 from django.test import TransactionTestCase
 from django.core.files.uploadedfile import UploadedFile
+from mock import patch
 
-from hs_core.hydroshare.resource import add_resource_files
+from hs_core.hydroshare.resource import add_resource_files, delete_resource_file
 from hs_core import hydroshare
+from hs_core.models import RenderedReadme, ResourceFile
 from hs_core.testing import MockIRODSTestCaseMixin
-from hs_core.views.utils import create_folder
+from hs_core.views.utils import create_folder, move_or_rename_file_or_folder
 
 
 class TestReadmeResourceFile(MockIRODSTestCaseMixin, TransactionTestCase):
@@ -215,6 +217,57 @@ class TestReadmeResourceFile(MockIRODSTestCaseMixin, TransactionTestCase):
         self.assertNotEqual(self.composite_resource.readme_file, None)
         self.assertNotEqual(self.composite_resource.get_readme_file_content(), None)
 
+    def test_rendered_readme_file(self):
+        """Test that a readme file is rendered when it is added, that the rendered content is
+        used without reading the file, and that it is deleted when the file is renamed or
+        deleted"""
+
+        self._create_composite_resource()
+        self._add_files_to_resource([self.readme_md])
+        readme_file = self.composite_resource.readme_file
+        rendered = RenderedReadme.objects.get(resource_file=readme_file)
+        self.assertEqual(rendered.content, '<h2>This is a readme markdown file</h2>')
+
+        with patch.object(ResourceFile, 'read') as read:
+            readme = self.composite_resource.get_readme_file_content()
+            self.assertEqual(read.call_count, 0)
+        self.assertEqual(readme, {'content': '<h2>This is a readme markdown file</h2>',
+                                  'file_name': 'readme.md', 'file_type': 'md'})
+
+        # a renamed readme file is no longer a readme file
+        move_or_rename_file_or_folder(self.user, self.composite_resource.short_id,
+                                      'data/contents/readme.md', 'data/contents/some.md')
+        self.assertEqual(self.composite_resource.readme_file, None)
+        self.assertEqual(RenderedReadme.objects.count(), 0)
+
+        # the rendered content of a deleted readme file is deleted
+        self._add_files_to_resource([self.readme_txt])
+        self.assertEqual(self.composite_resource.get_readme_file_content(),
+                         {'content': 'This is a readme text file', 'file_name': 'readme.txt'})
+        self.assertEqual(RenderedReadme.objects.count(), 1)
+        delete_resource_file(self.composite_resource.short_id, 'readme.txt', self.user)
+        self.assertEqual(RenderedReadme.objects.count(), 0)
+
+    def test_readme_file_is_not_rendered_again_when_not_moved(self):
+        """Test that saving a readme file without moving or renaming it, e.g., when its size is
+        calculated, does not render it again"""
+
+        self._create_composite_resource()
+        self._add_files_to_resource([self.readme_md])
+        readme_file = ResourceFile.objects.get(pk=self.composite_resource.readme_file.pk)
+        with patch.object(RenderedReadme, 'render') as render:
+            readme_file.calculate_size()
+            readme_file.save()
+            self.assertEqual(render.call_count, 0)
+
+            # a readme file that is moved to a folder is no longer a readme file
+            create_folder(self.composite_resource.short_id, 'data/contents/my-new-folder')
+            move_or_rename_file_or_folder(self.user, self.composite_resource.short_id,
+                                          'data/contents/readme.md',
+                                          'data/contents/my-new-folder/readme.md')
+            self.assertEqual(render.call_count, 0)
+        self.assertEqual(RenderedReadme.objects.count(), 0)
+
     def _create_composite_resource(self):
         self.composite_resource = hydroshare.create_resource(
              resource_type='CompositeResource',
@@ -0,0 +1,210 @@
+"""Write-behind view and download counters of resources.
+
+Viewing a landing page or downloading a file used to increment view_count or download_count
+with a full save of the resource, which sends post_save signals, e.g., to update SOLR, and
+loses concurrent increments. Increments now never save the resource:
+
+* by default, a counter is incremented with one UPDATE using F(), which sends no signals;
+* with settings.RESOURCE_COUNTER_BUFFER_ENABLED, increments are added to deltas in the django
+  cache instead. Deltas are written to the database with F() updates, one UPDATE per counter
+  and delta value, at most RESOURCE_COUNTER_FLUSH_INTERVAL seconds after the first increment
+  by a timer thread of the process, when the process exits, and by the
+  flush_resource_counters command;
+* AbstractResource.get_view_count and get_download_count include the buffered deltas;
+* BaseResource.save leaves the counters out, so that saving an instance read before an
+  increment does not overwrite it.
+
+With a cache shared by all processes, e.g., memcached or redis, the deltas of all processes
+are read and written by any process. With the default local memory cache every process
+buffers and writes its own deltas only, and the command finds nothing to write.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('view_count', 'download_count')
+FLUSH_LOCK_KEY = 'resource_counter:flush_lock'
+# seconds after which the lock of a flush that did not finish expires
+FLUSH_LOCK_TIMEOUT = 300
+# number of resources whose deltas are read with one cache call when all are flushed
+FLUSH_BATCH_SIZE = 500
+
+
+def counters_buffered():
+    """Return True if counter increments are buffered in the cache."""
+    return getattr(settings, 'RESOURCE_COUNTER_BUFFER_ENABLED', False)
+
+
+def _delta_key(resource_id, field):
+    return 'resource_counter:{}:{}'.format(field, resource_id)
+
+
+def _add_delta(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # no delta since the cache was cleared; another process may add it first
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def increment_counter(resource, field):
+    """Increment the counter *field* of *resource* by one without saving the resource."""
+    from hs_core.models import BaseResource
+
+    if not counters_buffered():
+        BaseResource.objects.filter(pk=resource.pk).update(**{field: F(field) + 1})
+        # keep the instance in step for display; BaseResource.save never writes the counters
+        setattr(resource, field, getattr(resource, field) + 1)
+        return
+    key = _delta_key(resource.pk, field)
+    _add_delta(key, 1)
+    get_flusher().touched(key)
+
+
+def pending_count(resource, field):
+    """Return the increments of the counter *field* of *resource* not yet written."""
+    if not counters_buffered():
+        return 0
+    return cache.get(_delta_key(resource.pk, field), 0)
+
+
+def flush_counters(keys=None):
+    """
+    Write buffered deltas to the database.
+
+    :param keys: cache keys of the deltas to write, the deltas of all resources if None
+    :return: number of counters updated, or None if another flush is running
+    """
+    from hs_core.models import BaseResource
+
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=FLUSH_LOCK_TIMEOUT):
+        return None
+    try:
+        if keys is not None:
+            return _flush_keys(keys)
+        written = 0
+        pks = list(BaseResource.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), FLUSH_BATCH_SIZE):
+            written += _flush_keys([_delta_key(pk, field)
+                                    for pk in pks[start:start + FLUSH_BATCH_SIZE]
+                                    for field in COUNTER_FIELDS])
+        return written
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def _flush_keys(keys):
+    from hs_core.models import BaseResource
+
+    groups = defaultdict(list)
+    for key, delta in cache.get_many(keys).items():
+        if not delta:
+            continue
+        # increments made from now on remain in the cache for the next flush
+        cache.decr(key, delta)
+        _, field, pk = key.split(':')
+        groups[(field, delta)].append(int(pk))
+
+    written = 0
+    for (field, delta), pks in groups.items():
+        try:
+            BaseResource.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+        except Exception as ex:
+            logger.error("failed to write {} of {} resources: {}".format(field, len(pks),
+                                                                          str(ex)))
+            for pk in pks:
+                _add_delta(_delta_key(pk, field), delta)
+            continue
+        written += len(pks)
+    return written
+
+
+class CounterFlusher(object):
+    """Writes the deltas incremented by a single worker process, by a timer thread."""
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval or \
+            getattr(settings, 'RESOURCE_COUNTER_FLUSH_INTERVAL', 60)
+        self._keys = set()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def touched(self, key):
+        """Remember that the delta *key* was incremented, and schedule a flush."""
+        with self._lock:
+            self._keys.add(key)
+            self._schedule()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # the timer thread has its own database connection
+            connection.close()
+
+    def flush(self):
+        """Write the deltas incremented by this process. Return the number of counters."""
+        with self._lock:
+            keys = list(self._keys)
+            self._keys.clear()
+        if not keys:
+            return 0
+        written = flush_counters(keys)
+        if written is None:
+            # another flush is running; try again later
+            with self._lock:
+                self._keys.update(keys)
+                self._schedule()
+            return 0
+        return written
+
+
+_flushers = {}
+_flushers_lock = threading.Lock()
+
+
+def get_flusher():
+    """Return the counter flusher of this worker process.
+
+    Flushers are keyed by process id so that forked gunicorn workers never inherit the
+    timer of their parent.
+    """
+    pid = os.getpid()
+    with _flushers_lock:
+        flusher = _flushers.get(pid)
+        if flusher is None:
+            flusher = CounterFlusher()
+            _flushers[pid] = flusher
+        return flusher
+
+
+@atexit.register
+def flush_on_exit():
+    flusher = _flushers.get(os.getpid())
+    if flusher is not None and len(flusher):
+        try:
+            flusher.flush()
+        except Exception as ex:
+            logger.error("failed to flush resource counters on exit: {}".format(str(ex)))
@@ -82,3 +82,31 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
                     index.remove_object(newinstance, using=using)
                 except NotHandled:
                     logger.exception("Failure: delete of %s with short_id %s failed.", str(type(instance)), newinstance.short_id)
+
+
+class HydroQueuedSignalProcessor(HydroRealtimeSignalProcessor):
+    """
+    Queue SOLR updates instead of sending them during the request.
+
+    Saving a resource or its access control, and deleting the access control of a resource,
+    only records the resource in the SOLR update queue. A celery task sends the queued
+    resources to SOLR in batches, see hs_core.solr_queue.
+    """
+
+    def handle_save(self, sender, instance, **kwargs):
+        from hs_core.models import BaseResource
+        from hs_access_control.models import ResourceAccess
+        from hs_core.solr_queue import queue_solr_update
+
+        if isinstance(instance, BaseResource):
+            if hasattr(instance, 'raccess') and hasattr(instance, 'metadata'):
+                queue_solr_update(instance.pk)
+        elif isinstance(instance, ResourceAccess):
+            queue_solr_update(instance.resource_id)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        from hs_access_control.models import ResourceAccess
+        from hs_core.solr_queue import queue_solr_update
+
+        if isinstance(instance, ResourceAccess):
+            queue_solr_update(instance.resource_id)
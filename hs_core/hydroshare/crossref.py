@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+HTTP client of the CrossRef deposit and submission download services
+
+Requests go through a transport, which is a requests.Session by default. Any object with the
+get() and post() methods of requests.Session may be passed instead, e.g., a stand-in of
+CrossRef in tests. With settings.CROSSREF_URL the client talks to another CrossRef endpoint,
+e.g., a local stand-in, instead of the CrossRef test or production site.
+
+Connection errors, timeouts and responses with a status code in RETRY_STATUS_CODES are
+retried with exponential backoff. A client, and its session, may be shared by threads.
+"""
+
+import logging
+import time
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# responses with these status codes are retried, as are connection errors and timeouts
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def get_crossref_url():
+    main_url = getattr(settings, 'CROSSREF_URL', '')
+    if main_url:
+        return main_url
+    main_url = 'https://test.crossref.org/'
+    if not settings.USE_CROSSREF_TEST:
+        main_url = 'https://doi.crossref.org/'
+    return main_url
+
+
+class CrossRefClient(object):
+    """Deposits resource metadata and downloads submission results from CrossRef."""
+
+    def __init__(self, transport=None, main_url=None, retries=3, backoff=1.0, timeout=60,
+                 pool_size=10):
+        """
+        :param transport: object with the get() and post() methods of requests.Session. A
+            session with a connection pool of *pool_size* connections is created if None.
+        :param main_url: CrossRef url ending with a slash, get_crossref_url() if None
+        :param retries: number of retries of a failed request
+        :param backoff: seconds to wait before the first retry; the wait doubles each retry
+        :param timeout: seconds to wait for a response
+        """
+        if transport is None:
+            transport = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            transport.mount('https://', adapter)
+            transport.mount('http://', adapter)
+        self.transport = transport
+        self.main_url = main_url if main_url is not None else get_crossref_url()
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def _request(self, method, url, **kwargs):
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = getattr(self.transport, method)(url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                if last_attempt:
+                    raise
+                logger.warning("CrossRef request failed, retrying: {}".format(str(ex)))
+            else:
+                if last_attempt or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                logger.warning("CrossRef responded with {}, retrying".format(
+                    response.status_code))
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def deposit(self, batch_id, deposit_xml):
+        """
+        Deposit the metadata of a resource.
+
+        :param batch_id: short id of the resource, which is the CrossRef batch id
+        :param deposit_xml: CrossRef deposit xml of the resource
+        :return: response of CrossRef
+        """
+        xml_file_name = '{uuid}_deposit_metadata.xml'.format(uuid=batch_id)
+        post_data = {
+            'operation': 'doMDUpload',
+            'login_id': settings.CROSSREF_LOGIN_ID,
+            'login_passwd': settings.CROSSREF_LOGIN_PWD
+        }
+        files = {'file': (xml_file_name, deposit_xml)}
+        post_url = '{MAIN_URL}servlet/deposit'.format(MAIN_URL=self.main_url)
+        return self._request('post', post_url, data=post_data, files=files)
+
+    def submission_result(self, batch_id):
+        """
+        Download the result of the processing of a deposit.
+
+        :param batch_id: short id of the resource, which is the CrossRef batch id
+        :return: response of CrossRef, whose content is the result xml
+        """
+        params = {
+            'usr': settings.CROSSREF_LOGIN_ID,
+            'pwd': settings.CROSSREF_LOGIN_PWD,
+            'doi_batch_id': batch_id,
+            'type': 'result'
+        }
+        get_url = '{MAIN_URL}servlet/submissionDownload'.format(MAIN_URL=self.main_url)
+        return self._request('get', get_url, params=params)
+
+
+def get_crossref_client(transport=None):
+    """Return a CrossRefClient configured by the CROSSREF_* settings."""
+    return CrossRefClient(transport=transport,
+                          retries=getattr(settings, 'CROSSREF_RETRIES', 3),
+                          backoff=getattr(settings, 'CROSSREF_BACKOFF', 1.0),
+                          pool_size=getattr(settings, 'CROSSREF_WORKERS', 8))
@@ -0,0 +1,169 @@
+"""Local cache of the iRODS data objects copied by get_file_from_irods.
+
+Metadata extraction and file updates copy resource files from iRODS into temporary
+directories, often the same unchanged file again and again. With settings.IRODS_FILE_CACHE_DIR,
+copies are also kept in that directory, keyed by the catalog checksum of the data object, and
+later reads of an unchanged object are copied from there instead of from iRODS.
+
+* The checksum, size and modification time of the object are read with one catalog query; no
+  checksum is computed. Objects without a recorded checksum are keyed by path, size and
+  modification time instead.
+* Callers always get a copy of their own, which they may change or delete.
+* The cache holds at most IRODS_FILE_CACHE_SIZE bytes. Least recently used files are evicted
+  first. Objects larger than that are never cached.
+* Hit and miss counts of the process are reported by IrodsFileCache.stats().
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+
+from django_irods.icommands import SessionException
+
+logger = logging.getLogger(__name__)
+
+# incomplete copies older than this many seconds are left over by failed processes
+STALE_COPY_AGE = 60 * 60
+
+
+class IrodsFileCache(object):
+    """A size-bounded, least recently used cache of iRODS data objects in a local directory.
+
+    The directory may be shared by several processes on the same host: files are added by
+    atomic rename, and a file evicted by another process is simply a miss.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def stats(self):
+        """Return hits and misses of this process, and the number and size of cached files."""
+        entries = self._entries()
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'files': len(entries),
+                'size': sum(size for _, size, _ in entries)}
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _key(self, istorage, full_path):
+        """Return the cache key and size of a data object, or None if it is not listed."""
+        parent, name = full_path.rsplit('/', 1)
+        entry = istorage.list_checksums(parent, name=name).get(name, None)
+        if entry is None:
+            return None
+        checksum, size, modify_time = entry
+        if checksum:
+            raw = u'checksum:{}:{}'.format(checksum, size)
+        else:
+            raw = u'path:{}:{}:{}'.format(full_path, size, modify_time)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest(), size
+
+    def get_file(self, istorage, path, full_path, local_path):
+        """
+        Copy a data object to a local file, from the cache if possible.
+
+        :param istorage: IrodsStorage of the data object
+        :param path: path of the data object as used by istorage
+        :param full_path: full iRODS path of the data object, for the catalog query
+        :param local_path: path of the local copy to create
+        """
+        try:
+            key = self._key(istorage, full_path)
+        except SessionException as ex:
+            logger.warning("cannot look up {} for the file cache: {}".format(full_path,
+                                                                             ex.stderr))
+            key = None
+        if key is None or key[1] > self.max_size:
+            self._count(hit=False)
+            istorage.getFile(path, local_path)
+            return
+
+        cached_path = os.path.join(self.cache_dir, key[0])
+        try:
+            shutil.copyfile(cached_path, local_path)
+            # the modification time of a cached file is the time it was last used
+            os.utime(cached_path, None)
+            self._count(hit=True)
+            return
+        except (IOError, OSError):
+            pass  # not cached yet, or evicted meanwhile
+
+        self._count(hit=False)
+        istorage.getFile(path, local_path)
+        self._add(local_path, cached_path)
+
+    def _add(self, local_path, cached_path):
+        copy_path = '{}.{}.tmp'.format(cached_path, uuid4().hex)
+        try:
+            shutil.copyfile(local_path, copy_path)
+            os.rename(copy_path, cached_path)
+        except (IOError, OSError) as ex:
+            logger.warning("cannot add {} to the file cache: {}".format(local_path, str(ex)))
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+            return
+        self._evict()
+
+    def _entries(self):
+        """Return (last use, size, path) of cached files, removing stale incomplete copies."""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if name.endswith('.tmp'):
+                    if now - stat.st_mtime > STALE_COPY_AGE:
+                        os.remove(path)
+                    continue
+            except OSError:
+                continue  # removed by another process
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # removed by another process
+            total -= size
+
+
+_file_cache = None
+_file_cache_lock = threading.Lock()
+
+
+def get_file_cache():
+    """Return the file cache of this process, or None if IRODS_FILE_CACHE_DIR is not set."""
+    global _file_cache
+    cache_dir = getattr(settings, 'IRODS_FILE_CACHE_DIR', None)
+    if not cache_dir:
+        return None
+    with _file_cache_lock:
+        if _file_cache is None or _file_cache.cache_dir != cache_dir:
+            _file_cache = IrodsFileCache(
+                cache_dir, getattr(settings, 'IRODS_FILE_CACHE_SIZE', 10 * 1024 ** 3))
+        return _file_cache
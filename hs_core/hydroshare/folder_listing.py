@@ -0,0 +1,190 @@
+"""Folder listing engine used for browsing resource content files.
+
+A listing combines a single iRODS listdir() of the folder with the ResourceFile rows of that
+folder, which are loaded in one bulk query (logical files are prefetched) and matched to the
+iRODS listing in memory. Folder aggregations of the sub-folders are resolved from one query as
+well instead of a per-folder aggregation lookup.
+
+Listings can be cached per (resource, path) for settings.FOLDER_LISTING_CACHE_TIMEOUT seconds.
+All cached listings of a resource are invalidated at once by invalidate_folder_listing(), which
+the file add/move/rename/delete and aggregation create/remove code paths call. Invalidation is
+only seen by other processes if the django cache is shared by all processes, e.g., memcached or
+redis, so listings are not cached unless the timeout is set; with the default per-process local
+memory cache, other gunicorn workers and celery would serve stale listings.
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import os
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from hs_core.hydroshare.utils import get_file_mime_type
+from hs_core.models import ResourceFile
+
+
+def _listing_cache_timeout():
+    """Return the seconds folder listings are cached for, 0 if they are not cached."""
+    return getattr(settings, 'FOLDER_LISTING_CACHE_TIMEOUT', 0)
+
+
+def _version_key(resource):
+    return 'folder_listing_version:{}'.format(resource.short_id)
+
+
+def _listing_cache_key(resource, store_path):
+    version = cache.get(_version_key(resource))
+    if version is None:
+        version = uuid4().hex
+        cache.set(_version_key(resource), version, None)
+    path_hash = hashlib.md5(store_path.encode('utf-8')).hexdigest()
+    return 'folder_listing:{}:{}:{}'.format(resource.short_id, version, path_hash)
+
+
+def invalidate_folder_listing(resource):
+    """Discard all cached folder listings of *resource*.
+
+    A fresh version token is recorded for the resource, so listings cached under the previous
+    token are never read again and simply expire.
+    """
+    if not _listing_cache_timeout():
+        return
+    cache.set(_version_key(resource), uuid4().hex, None)
+
+
+def _folder_aggregations(resource, folders):
+    """Return a dict mapping each folder in *folders* (paths relative to data/contents) that
+    represents a multi-file or fileset aggregation to that aggregation object."""
+    # avoid import loop
+    from hs_file_types.models import FileSetLogicalFile
+
+    aggregations = {}
+    if not folders:
+        return aggregations
+    for fileset in FileSetLogicalFile.objects.filter(resource=resource, folder__in=folders):
+        aggregations[fileset.folder] = fileset
+    # a multi-file aggregation is named after the folder of its files
+    res_files = ResourceFile.objects.filter(object_id=resource.id, file_folder__in=folders,
+                                            logical_file_object_id__isnull=False) \
+        .prefetch_related('logical_file_content_object')
+    for res_file in res_files:
+        aggregation = res_file.logical_file
+        if aggregation is None or aggregation.is_single_file_aggregation or \
+                aggregation.is_fileset:
+            continue
+        aggregations.setdefault(res_file.file_folder, aggregation)
+    return aggregations
+
+
+def _build_folder_listing(resource, store_path, store):
+    is_composite = resource.resource_type == "CompositeResource"
+    # folder path relative to 'data/contents/' needed for the UI
+    folder_path = store_path[len("data/contents/"):]
+
+    dir_names = [dname.decode('utf-8') for dname in store[0]]
+    aggregations = {}
+    if is_composite:
+        aggregations = _folder_aggregations(
+            resource, [os.path.join(folder_path, d_pk) for d_pk in dir_names])
+
+    dirs = []
+    for d_pk in dir_names:
+        d_store_path = os.path.join(store_path, d_pk)
+        d_short_path = os.path.join(folder_path, d_pk)
+        main_file = ''
+        folder_aggregation_type = ''
+        folder_aggregation_name = ''
+        folder_aggregation_id = ''
+        folder_aggregation_type_to_set = ''
+        if is_composite:
+            aggregation_object = aggregations.get(d_short_path, None)
+            if aggregation_object is not None:
+                folder_aggregation_type = aggregation_object.get_aggregation_class_name()
+                folder_aggregation_name = aggregation_object.get_aggregation_display_name()
+                folder_aggregation_id = aggregation_object.id
+                if not aggregation_object.is_fileset:
+                    main_file = aggregation_object.get_main_file.file_name
+            else:
+                # find if any aggregation type that can be created from this folder
+                dir_path = resource.get_public_path(d_store_path)
+                folder_aggregation_type_to_set = resource.get_folder_aggregation_type_to_set(
+                    dir_path, aggregation_checked=True) or ""
+        dirs.append({'name': d_pk,
+                     'url': resource.get_url_of_path(d_store_path),
+                     'main_file': main_file,
+                     'folder_aggregation_type': folder_aggregation_type,
+                     'folder_aggregation_name': folder_aggregation_name,
+                     'folder_aggregation_id': folder_aggregation_id,
+                     'folder_aggregation_type_to_set': folder_aggregation_type_to_set,
+                     'folder_short_path': d_short_path})
+
+    # load all the ResourceFile rows of this folder with one query
+    file_field = 'fed_resource_file' if resource.is_federated else 'resource_file'
+    file_names = [fname.decode('utf-8') for fname in store[1]]
+    irods_paths = [resource.get_irods_path(os.path.join(store_path, fname))
+                   for fname in file_names]
+    res_files = ResourceFile.objects.filter(**{'object_id': resource.id,
+                                               file_field + '__in': irods_paths})
+    if is_composite:
+        res_files = res_files.prefetch_related('logical_file_content_object')
+    res_files_by_path = {}
+    for res_file in res_files:
+        res_files_by_path.setdefault(getattr(res_file, file_field).name, res_file)
+
+    files = []
+    for index, fname in enumerate(file_names):
+        f = res_files_by_path.get(irods_paths[index], None)
+        if not f:
+            # skip metadata files
+            continue
+        mtype = get_file_mime_type(fname)
+        idx = mtype.find('/')
+        if idx >= 0:
+            mtype = mtype[idx + 1:]
+
+        f_ref_url = ''
+        logical_file_type = ''
+        logical_file_id = ''
+        aggregation_name = ''
+        is_single_file_aggregation = ''
+        if is_composite and f.has_logical_file:
+            logical_file_type = f.logical_file_type_name
+            logical_file_id = f.logical_file.id
+            aggregation_name = f.aggregation_display_name
+            is_single_file_aggregation = f.logical_file.is_single_file_aggregation
+            if 'url' in f.logical_file.extra_data:
+                f_ref_url = f.logical_file.extra_data['url']
+
+        files.append({'name': fname, 'size': store[2][index], 'type': mtype,
+                      'pk': f.pk, 'url': f.url,
+                      'reference_url': f_ref_url,
+                      'aggregation_name': aggregation_name,
+                      'logical_type': logical_file_type,
+                      'logical_file_id': logical_file_id,
+                      'is_single_file_aggregation': is_single_file_aggregation})
+
+    return {'files': files, 'folders': dirs}
+
+
+def get_folder_listing(resource, store_path):
+    """Return a dict with 'files' and 'folders' describing the content of *store_path*.
+
+    :param resource: the resource whose folder is listed
+    :param store_path: folder path relative to the resource root, starting with data/contents
+    :raises SessionException: if the iRODS listing of the folder fails
+    """
+    timeout = _listing_cache_timeout()
+    if timeout:
+        key = _listing_cache_key(resource, store_path)
+        listing = cache.get(key)
+        if listing is not None:
+            return listing
+    istorage = resource.get_irods_storage()
+    store = istorage.listdir(resource.get_irods_path(store_path))
+    listing = _build_folder_listing(resource, store_path, store)
+    if timeout:
+        cache.set(key, listing, timeout)
+    return listing
@@ -1,15 +1,27 @@
 import os
 import shutil
 import errno
+import hashlib
+import logging
+import struct
 import tempfile
 import mimetypes
 import zipfile
+from contextlib import contextmanager
 
+from django.db import connection
 from foresite import utils, Aggregation, AggregatedResource, RdfLibSerializer
 from rdflib import Namespace, URIRef
 
 import bagit
-from hs_core.models import Bags, ResourceFile
+from hs_core.models import Bags, BagManifestEntry, ResourceFile
+
+logger = logging.getLogger(__name__)
+
+# bag tag files written at the bag root by create_bag_incrementally()
+BAG_TAG_FILES = ('bagit.txt', 'manifest-md5.txt', 'tagmanifest-md5.txt')
+# first key of the PostgreSQL advisory locks held while a bag is built, see bag_build_lock()
+BAG_BUILD_LOCK_CLASS = 0x68736267
 
 
 class HsBagitException(Exception):
@@ -208,6 +220,254 @@ def create_bag_files(resource):
     return istorage
 
 
+def update_bag_manifest(resource, istorage, bag_root):
+    """
+    bring the BagManifestEntry records of a resource up to date with the payload in iRODS.
+
+    All data objects under the bag data directory are listed with one catalog query. Checksums
+    are only recomputed for files whose size or modification time differ from the recorded
+    entry, or for which iCAT has no md5 checksum. Each entry is saved as soon as it is computed
+    so that an interrupted run resumes where it stopped.
+
+    Parameters:
+    :param resource: the resource to update bag manifest entries for
+    :param istorage: IrodsStorage object of the resource
+    :param bag_root: full iRODS path of the bag root collection, i.e., the resource collection
+    :return: list of BagManifestEntry objects sorted by path
+    """
+    listing = istorage.list_checksums(os.path.join(bag_root, 'data'))
+    entries = {e.path: e for e in BagManifestEntry.objects.filter(resource=resource)}
+    stale = []
+    for rel_path, (checksum, size, modify_time) in listing.iteritems():
+        path = os.path.join('data', rel_path)
+        entry = entries.get(path, None)
+        if entry is not None and entry.size == size and entry.modify_time == modify_time:
+            continue
+        # recompute checksums that are missing, not md5 (sha2 prefixed) or might be stale
+        if entry is not None or not checksum or checksum.startswith('sha2:'):
+            checksum = istorage.checksum(os.path.join(bag_root, path))
+        if entry is None:
+            entry = BagManifestEntry(resource=resource, path=path)
+            entries[path] = entry
+        entry.checksum = checksum
+        entry.size = size
+        entry.modify_time = modify_time
+        entry.zipped = False
+        entry.save()
+
+    for path, entry in entries.items():
+        if path[len('data/'):] not in listing:
+            stale.append(entry.pk)
+            del entries[path]
+    if stale:
+        BagManifestEntry.objects.filter(pk__in=stale).delete()
+    return sorted(entries.values(), key=lambda e: e.path)
+
+
+def write_bag_tag_files(istorage, bag_root, entries, temp_path):
+    """
+    write bagit.txt, manifest-md5.txt and tagmanifest-md5.txt for a bag to iRODS.
+
+    This produces the same files as the iRODS bagit rule, but from BagManifestEntry records
+    rather than from a full payload scan.
+
+    :param istorage: IrodsStorage object of the resource
+    :param bag_root: full iRODS path of the bag root collection
+    :param entries: BagManifestEntry objects of the bag payload
+    :param temp_path: local directory in which the tag files are written before upload
+    :return: dict mapping tag file name to the local path of the written file
+    """
+    contents = {
+        'bagit.txt': "BagIt-Version: 0.96\nTag-File-Character-Encoding: UTF-8\n",
+        'manifest-md5.txt': u''.join(u"{}    {}\n".format(e.checksum, e.path)
+                                     for e in entries).encode('utf-8'),
+    }
+    readme_checksum = istorage.checksum(os.path.join(bag_root, 'readme.txt'))
+    contents['tagmanifest-md5.txt'] = \
+        "{}    bagit.txt\n{}    manifest-md5.txt\n{}    readme.txt\n".format(
+            hashlib.md5(contents['bagit.txt']).hexdigest(),
+            hashlib.md5(contents['manifest-md5.txt']).hexdigest(),
+            readme_checksum)
+
+    local_files = {}
+    for name in BAG_TAG_FILES:
+        local_path = os.path.join(temp_path, name)
+        with open(local_path, 'wb') as out:
+            out.write(contents[name])
+        istorage.saveFile(local_path, os.path.join(bag_root, name), False)
+        local_files[name] = local_path
+    return local_files
+
+
+class _TailWriter(object):
+    """
+    a file-like object that writes the tail of a zip file, from offset *base* on, to a local
+    file, reporting the positions of the zip file to zipfile.ZipFile.
+    """
+
+    def __init__(self, local_file, base):
+        self.local_file = local_file
+        self.base = base
+
+    def tell(self):
+        return self.base + self.local_file.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            offset -= self.base
+        self.local_file.seek(offset, whence)
+
+    def write(self, data):
+        self.local_file.write(data)
+
+    def flush(self):
+        self.local_file.flush()
+
+
+def patch_bag_zip(istorage, bag_zip_path, root_name, updates, keep):
+    """
+    patch an existing bag zip file in place without rewriting unchanged members.
+
+    Stale members are dropped from the zip central directory and the updated members are
+    appended after the last member that is kept, followed by a new central directory. Bytes of
+    the dropped members stay in the file as unreferenced space. This requires random access to
+    the zip data object, i.e., the native iRODS backend.
+
+    The new tail of the zip is built in a local temporary file first, so that the zip is left
+    untouched if it cannot be patched.
+
+    :param istorage: IrodsStorage object of the resource
+    :param bag_zip_path: iRODS path of the bag zip file to patch
+    :param root_name: name of the top-level directory in the zip, i.e., the resource id
+    :param updates: dict mapping member paths relative to the bag root to local file paths
+    :param keep: set of member paths relative to the bag root that remain in the bag
+    :return: True if the zip was patched, False if it cannot be patched in place
+    """
+    if istorage.native is None:
+        return False
+    with istorage.native.open(bag_zip_path, 'r+') as zip_file:
+        zip_file.seek(0, os.SEEK_END)
+        original_end = zip_file.tell()
+        zip_file.seek(0)
+        zf = zipfile.ZipFile(zip_file, 'r', allowZip64=True)
+        prefix = root_name + '/'
+        if not any(info.filename.startswith(prefix) for info in zf.filelist):
+            # not laid out as a bag of this resource
+            return False
+        # the updated members are written where the old central directory starts
+        start_dir = zf.start_dir
+        kept = []
+        for info in zf.filelist:
+            member = info.filename[len(prefix):] if info.filename.startswith(prefix) else None
+            if member is None or member in updates or \
+                    (member not in keep and not member.endswith('/')):
+                continue
+            kept.append(info)
+
+        with tempfile.TemporaryFile() as tail:
+            new_zf = zipfile.ZipFile(_TailWriter(tail, start_dir), 'w', zipfile.ZIP_DEFLATED,
+                                     allowZip64=True)
+            new_zf.filelist = kept
+            new_zf.NameToInfo = {info.filename: info for info in kept}
+            for member, local_path in sorted(updates.items()):
+                new_zf.write(local_path, prefix + member)
+            new_zf.close()
+            end = start_dir + tail.tell()
+            gap = original_end - end
+            if gap > 0:
+                # the new archive is shorter than the old one; the remaining tail is zeroed and
+                # absorbed as the zip comment so that the new end of central directory record
+                # is the one found by zip readers
+                if gap > 0xFFFF:
+                    raise HsBagitException("bag zip cannot be patched in place; a full "
+                                           "rebuild is required")
+                tail.write('\0' * gap)
+                tail.seek(end - start_dir - 2)
+                tail.write(struct.pack('<H', gap))
+
+            # nothing has been written to the zip up to here
+            tail.seek(0)
+            zip_file.seek(start_dir)
+            shutil.copyfileobj(tail, zip_file)
+    return True
+
+
+@contextmanager
+def bag_build_lock(resource):
+    """
+    hold the lock of building the bag of a resource, waiting for other workers that build it.
+
+    This is a PostgreSQL session level advisory lock keyed by the resource, so it is shared by
+    all worker processes and released by the database if a worker dies. The lock is reentrant
+    within a database connection.
+
+    :param resource: the resource whose bag is built
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s, %s)", [BAG_BUILD_LOCK_CLASS, resource.pk])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s, %s)",
+                           [BAG_BUILD_LOCK_CLASS, resource.pk])
+
+
+def create_bag_incrementally(resource, istorage, bag_root, bag_zip_path):
+    """
+    create or update a resource bag, processing only payload files that changed since the
+    bag was last built.
+
+    The payload manifest is maintained in BagManifestEntry records (see
+    update_bag_manifest()), the tag files are regenerated from these records, and the existing
+    bag zip is patched in place with only the changed members if possible. Otherwise the bag
+    collection is zipped in full with ibun. The 'bag_patch_in_progress' AVU marks a zip that is
+    being patched; if a worker dies while patching, the next run rebuilds the zip in full. The
+    bag is built holding bag_build_lock(), so concurrent tasks build it one after the other.
+
+    :param resource: the resource to create the bag for
+    :param istorage: IrodsStorage object of the resource
+    :param bag_root: full iRODS path of the bag root collection
+    :param bag_zip_path: iRODS path of the bag zip file
+    :return: None; SessionException is raised if an iRODS operation fails
+    """
+    with bag_build_lock(resource):
+        _create_bag_incrementally(resource, istorage, bag_root, bag_zip_path)
+
+
+def _create_bag_incrementally(resource, istorage, bag_root, bag_zip_path):
+    entries = update_bag_manifest(resource, istorage, bag_root)
+    temp_path = istorage.getUniqueTmpPath
+    os.makedirs(temp_path)
+    try:
+        tag_files = write_bag_tag_files(istorage, bag_root, entries, temp_path)
+        interrupted = istorage.getAVU(bag_root, 'bag_patch_in_progress') == 'true'
+        patched = False
+        if not interrupted and istorage.exists(bag_zip_path):
+            updates = dict(tag_files)
+            for entry in entries:
+                if not entry.zipped:
+                    local_path = os.path.join(temp_path, 'payload', entry.path)
+                    if not os.path.exists(os.path.dirname(local_path)):
+                        os.makedirs(os.path.dirname(local_path))
+                    istorage.getFile(os.path.join(bag_root, entry.path), local_path)
+                    updates[entry.path] = local_path
+            keep = set(e.path for e in entries) | set(BAG_TAG_FILES) | {'readme.txt'}
+            istorage.setAVU(bag_root, 'bag_patch_in_progress', 'true')
+            try:
+                patched = patch_bag_zip(istorage, bag_zip_path, resource.short_id, updates, keep)
+            except (HsBagitException, zipfile.BadZipfile) as ex:
+                logger.warning("falling back to a full bag rebuild for {}: {}".format(
+                    resource.short_id, str(ex)))
+        if not patched:
+            istorage.setAVU(bag_root, 'bag_patch_in_progress', 'true')
+            istorage.zipup(bag_root, bag_zip_path)
+        BagManifestEntry.objects.filter(resource=resource, zipped=False).update(zipped=True)
+        istorage.setAVU(bag_root, 'bag_patch_in_progress', 'false')
+    finally:
+        shutil.rmtree(temp_path)
+
+
 def create_bag(resource):
     """
     Modified to implement the new bagit workflow. The previous workflow was to create a bag from
@@ -2,7 +2,6 @@ import os
 import zipfile
 import shutil
 import logging
-import requests
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
@@ -17,8 +16,11 @@ from hs_core.hydroshare import hs_bagit
 from hs_core.models import ResourceFile
 from hs_core import signals
 from hs_core.hydroshare import utils
+from hs_core.hydroshare.crossref import get_crossref_client, get_crossref_url  # noqa
+from hs_core.hydroshare.folder_listing import invalidate_folder_listing
 from hs_access_control.models import ResourceAccess, UserResourcePrivilege, PrivilegeCodes
 from hs_labels.models import ResourceLabels
+from theme.models import QuotaUsageDelta
 from django_irods.icommands import SessionException
 
 
@@ -62,6 +64,27 @@ def update_quota_usage(res=None, user=None):
     return
 
 
+def record_quota_usage(size, res=None, user=None):
+    """
+    Record a change of quota usage in the quota ledger (QuotaUsageDelta) so that it is taken into
+    account right away rather than after the usage is next read from iRODS.
+    :param size: change of usage in bytes, negative for deleted files
+    :param res: a resource object; the change is recorded for the quota holder of the resource
+    :param user: a user object; the change is recorded for this user if res is None
+    :return:
+    """
+    if not size:
+        return
+    if res:
+        user = res.get_quota_holder()
+        if user is None:
+            # no quota holder for this resource, this should not happen, but check just in case
+            logger.error('no quota holder is found for resource' + res.short_id)
+            return
+    if user:
+        QuotaUsageDelta.objects.create(user=user, zone='hydroshare', size=size)
+
+
 def res_has_web_reference(res):
     """
     Check whether a resource includes web reference url file.
@@ -261,7 +284,7 @@ def replicate_resource_bag_to_user_zone(user, res_id):
         fsize = istorage.size(src_file)
         utils.validate_user_quota(user, fsize)
         istorage.copyFiles(src_file, tgt_file)
-        update_quota_usage(user=user)
+        record_quota_usage(fsize, user=user)
     else:
         raise ValidationError("Resource {} does not exist in iRODS".format(res.short_id))
 
@@ -647,7 +670,7 @@ def copy_resource(ori_res, new_res, user=None):
     hs_bagit.create_bag(new_res)
     # need to update quota usage for new_res quota holder
     if user:
-        update_quota_usage(user=user)
+        record_quota_usage(new_res.size, user=user)
     return new_res
 
 
@@ -701,7 +724,7 @@ def create_new_version_resource(ori_res, new_res, user):
     ori_res.raccess.immutable = True
     ori_res.raccess.save()
     # need to update quota usage for the user
-    update_quota_usage(user=user)
+    record_quota_usage(new_res.size, user=user)
     return new_res
 
 
@@ -779,7 +802,7 @@ def add_resource_files(pk, *files, **kwargs):
         if resource.resource_type == "CompositeResource" and auto_aggregate:
             utils.check_aggregations(resource, new_folders, ret)
         # some file(s) added, need to update quota usage
-        update_quota_usage(res=resource)
+        record_quota_usage(sum(f.size for f in ret), res=resource)
     return ret
 
 
@@ -883,7 +906,7 @@ def delete_resource(pk):
             obsolete_res.raccess.save()
 
     # need to update quota usage when a resource is deleted
-    update_quota_usage(res=res)
+    record_quota_usage(-res.size, res=res)
 
     res.delete()
     return pk
@@ -913,9 +936,11 @@ def delete_resource_file_only(resource, f):
     Returns: unqualified relative path to file that has been deleted
     """
     short_path = f.short_path
+    size = f.size
     f.delete()
+    invalidate_folder_listing(resource)
     # need to update quota usage when a file is deleted
-    update_quota_usage(res=resource)
+    record_quota_usage(-size, res=resource)
     return short_path
 
 
@@ -1054,36 +1079,21 @@ def get_activated_doi(doi):
         return doi
 
 
-def get_crossref_url():
-    main_url = 'https://test.crossref.org/'
-    if not settings.USE_CROSSREF_TEST:
-        main_url = 'https://doi.crossref.org/'
-    return main_url
-
-
-def deposit_res_metadata_with_crossref(res):
+def deposit_res_metadata_with_crossref(res, client=None):
     """
     Deposit resource metadata with CrossRef DOI registration agency.
     Args:
         res: the resource object with its metadata to be deposited for publication
+        client: CrossRefClient to deposit with, a client configured by settings if None
 
     Returns:
         response returned for the metadata deposition request from CrossRef
 
     """
-    xml_file_name = '{uuid}_deposit_metadata.xml'.format(uuid=res.short_id)
-    # using HTTP to POST deposit xml file to crossref
-    post_data = {
-        'operation': 'doMDUpload',
-        'login_id': settings.CROSSREF_LOGIN_ID,
-        'login_passwd': settings.CROSSREF_LOGIN_PWD
-    }
-    files = {'file': (xml_file_name, res.get_crossref_deposit_xml())}
+    if client is None:
+        client = get_crossref_client()
     # exceptions will be raised if POST request fails
-    main_url = get_crossref_url()
-    post_url = '{MAIN_URL}servlet/deposit'.format(MAIN_URL=main_url)
-    response = requests.post(post_url, data=post_data, files=files)
-    return response
+    return client.deposit(res.short_id, res.get_crossref_deposit_xml())
 
 
 def publish_resource(user, pk):
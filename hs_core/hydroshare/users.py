@@ -3,7 +3,7 @@ import logging
 
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist, ValidationError
 from django.contrib.auth.models import User, Group
-from django.contrib.gis.geos import Polygon, Point
+from django.contrib.gis.geos import Polygon
 from django.core.files import File
 from django.core.files.uploadedfile import UploadedFile
 from django.core import exceptions
@@ -225,10 +225,13 @@ def set_group_active_status(user, group_id, status):
     :param status: True or False
     :return:
     """
+    from hs_access_control.models import group_peer_users, refresh_effective_privileges
+
     group = group_from_id(group_id)
     if user.uaccess.can_change_group_flags(group):
         group.gaccess.active = status
         group.gaccess.save()
+        refresh_effective_privileges(group_peer_users(group))
     else:
         raise PermissionDenied()
 
@@ -352,33 +355,12 @@ def get_resource_list(creator=None, group=None, user=None, owner=None, from_date
         if not north or not west or not south or not east: \
             raise ValueError("coverage queries must have north, west, south, and east params")
 
-        coverages = set()
         search_polygon = Polygon.from_bbox((east,south,west,north))
+        search_polygon.srid = 4326
 
-        for coverage in Coverage.objects.filter(type="box"):
-            coverage_polygon = Polygon.from_bbox((
-                coverage.value.get('eastlimit', None),
-                coverage.value.get('southlimit', None),
-                coverage.value.get('westlimit', None),
-                coverage.value.get('northlimit', None)
-            ))
-
-            if search_polygon.intersects(coverage_polygon):
-                coverages.add(coverage.id)
-
-        for coverage in Coverage.objects.filter(type="point"):
-            try:
-                coverage_shape = Point(
-                    coverage.value.get('east', None),
-                    coverage.value.get('north', None),
-                )
-
-                if search_polygon.intersects(coverage_shape):
-                    coverages.add(coverage.id)
-            except Exception as e:
-                log.error("Coverage value invalid for coverage id %d" % coverage.id)
-
-        coverage_hits = (Coverage.objects.filter(id__in=coverages))
+        # one indexed query on the geometry maintained by Coverage.save()
+        coverage_hits = Coverage.objects.filter(type__in=('box', 'point'),
+                                                geometry__intersects=search_polygon)
         q.append(Q(object_id__in=coverage_hits.values_list('object_id', flat=True)))
 
     if contributor:
@@ -443,8 +425,8 @@ def get_resource_list(creator=None, group=None, user=None, owner=None, from_date
 
     # TODO The below is legacy pagination... need to find out if anything is using it and delete
     qcnt = 0
-    if flt:
-        qcnt = len(flt)
+    if start is not None or count is not None:
+        qcnt = flt.count()
 
     if start is not None and count is not None:
         if qcnt > start:
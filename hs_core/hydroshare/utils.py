@@ -25,8 +25,9 @@ from mezzanine.conf import settings
 
 from hs_core.signals import pre_create_resource, post_create_resource, pre_add_files_to_resource, \
     post_add_files_to_resource
-from hs_core.models import AbstractResource, BaseResource, ResourceFile
+from hs_core.models import AbstractResource, BaseResource, RenderedReadme, ResourceFile
 from hs_core.hydroshare.hs_bagit import create_bag_files
+from hs_core.hydroshare.file_cache import get_file_cache
 
 from django_irods.icommands import SessionException
 from django_irods.storage import IrodsStorage
@@ -261,7 +262,8 @@ def get_file_from_irods(res_file, temp_dir=None):
     Copy the file (res_file) from iRODS (local or federated zone)
     over to django (temp directory) which is
     necessary for manipulating the file (e.g. metadata extraction).
-    Note: The caller is responsible for cleaning the temp directory
+    Note: The caller is responsible for cleaning the temp directory. With
+    settings.IRODS_FILE_CACHE_DIR, unchanged files are copied from a local cache (see file_cache).
 
     :param  res_file: an instance of ResourceFile
     :param  temp_dir: (optional) existing temp directory to which the file will be copied from
@@ -287,7 +289,12 @@ def get_file_from_irods(res_file, temp_dir=None):
         os.makedirs(tmpdir)
 
     tmpfile = os.path.join(tmpdir, file_name)
-    istorage.getFile(res_file_path, tmpfile)
+    file_cache = get_file_cache()
+    if file_cache is not None:
+        file_cache.get_file(istorage, res_file_path, get_full_irods_path(res, res_file_path),
+                            tmpfile)
+    else:
+        istorage.getFile(res_file_path, tmpfile)
     copied_file = tmpfile
     return copied_file
 
@@ -302,12 +309,20 @@ def replace_resource_file_on_irods(new_file, original_resource_file, user):
     :param user: user who is replacing the resource file.
     :return:
     """
+    from .resource import record_quota_usage
+
     ori_res = original_resource_file.resource
     istorage = ori_res.get_irods_storage()
     ori_storage_path = original_resource_file.storage_path
+    ori_size = original_resource_file.size
 
     # Note: this doesn't update metadata at all.
     istorage.saveFile(new_file, ori_storage_path, True)
+    original_resource_file.calculate_size()
+    record_quota_usage(original_resource_file.size - ori_size, res=ori_res)
+    if original_resource_file.is_readme:
+        # the file is not moved, so saving it does not render the new content
+        RenderedReadme.render_or_defer(original_resource_file)
 
     # do this so that the bag will be regenerated prior to download of the bag
     resource_modified(ori_res, by_user=user, overwrite_bag=False)
@@ -350,6 +365,66 @@ def get_resource_file_by_id(resource, file_id):
     return resource.files.filter(id=file_id).first()
 
 
+def get_full_irods_path(resource, path):
+    """
+    Return the full iRODS path of *path*, a path of the resource such as resource.file_path.
+
+    Paths of resources that are not federated are relative to the iRODS home collection,
+    which catalog queries do not accept.
+    """
+    if resource.is_federated:
+        return path
+    return os.path.join('/', settings.IRODS_ZONE, 'home', settings.IRODS_USERNAME, path)
+
+
+def get_resource_file_checksum(res_file):
+    """
+    Return the checksum of a resource file as recorded in iCAT, or an empty string if there is
+    none. The checksum is read with one catalog query; it is not computed.
+    """
+    resource = res_file.resource
+    full_path = get_full_irods_path(resource, res_file.storage_path)
+    parent, name = full_path.rsplit('/', 1)
+    try:
+        entry = resource.get_irods_storage().list_checksums(parent, name=name).get(name)
+    except SessionException as ex:
+        logger.warning("cannot read the checksum of {}: {}".format(full_path, ex.stderr))
+        return ''
+    return entry[0] if entry else ''
+
+
+def fill_missing_file_sizes(resource, files=None):
+    """
+    Record the size of resource files whose size has not been calculated yet.
+
+    Instead of one 'ils -l' per file as done by ResourceFile.size, the sizes of all files are
+    read from one recursive catalog query of the resource content folder.
+    :param resource: the resource of the files
+    :param files: ResourceFile objects of the resource to fill, which are updated in place;
+    all files of the resource without a recorded size if None
+    :return: number of files whose size was filled
+    """
+    if files is None:
+        files = resource.files.filter(_size__lt=0)
+    missing = [f for f in files if f._size < 0]
+    if not missing:
+        return 0
+    istorage = resource.get_irods_storage()
+    listing = istorage.list_checksums(get_full_irods_path(resource, resource.file_path))
+    for f in missing:
+        # the resource is known, so short_path does not look it up per file
+        f.content_object = resource
+        entry = listing.get(f.short_path, None)
+        if entry is None:
+            # as ResourceFile.calculate_size() does for missing files
+            logger.warn("file {} not found".format(f.storage_path))
+            f._size = 0
+        else:
+            f._size = entry[1]
+        ResourceFile.objects.filter(pk=f.pk).update(_size=f._size)
+    return len(missing)
+
+
 def copy_resource_files_and_AVUs(src_res_id, dest_res_id):
     """
     Copy resource files and AVUs from source resource to target resource including both
@@ -468,6 +543,8 @@ def resource_modified(resource, by_user=None, overwrite_bag=True):
     This indicates that some content of the bag has been edited.
 
     """
+    # avoid import loop
+    from hs_core.hydroshare.folder_listing import invalidate_folder_listing
 
     resource.last_changed_by = by_user
 
@@ -482,6 +559,8 @@ def resource_modified(resource, by_user=None, overwrite_bag=True):
     if overwrite_bag:
         create_bag_files(resource)
 
+    invalidate_folder_listing(resource)
+
     # set bag_modified-true AVU pair for the modified resource in iRODS to indicate
     # the resource is modified for on-demand bagging.
     set_dirty_bag_flag(resource)
@@ -895,6 +974,8 @@ def add_file_to_resource(resource, f, folder=None, source_name='',
     exists in the file path
     :return: The identifier of the ResourceFile added.
     """
+    # avoid import loop
+    from hs_core.hydroshare.folder_listing import invalidate_folder_listing
 
     # validate parameters
     if check_target_folder and resource.resource_type != 'CompositeResource':
@@ -941,6 +1022,7 @@ def add_file_to_resource(resource, f, folder=None, source_name='',
     if file_format_type not in [mime.value for mime in resource.metadata.formats.all()]:
         resource.metadata.create_element('format', value=file_format_type)
     ret.calculate_size()
+    invalidate_folder_listing(resource)
 
     return ret
 
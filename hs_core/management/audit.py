@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parallel audit of the synchronization between iRODS and Django
+
+check_irods_files() checks a resource with one iRODS call per file. The audit instead reads
+the content tree of a resource with one recursive catalog query and compares it in memory
+with the ResourceFile rows and aggregation xml files of the resource. Resources are audited
+by a pool of worker processes, and findings are written as JSON lines, one per resource:
+
+    {"resource_id": "...", "resource_type": "...", "errors": [{"type": "...", "path": "..."}]}
+
+Error types are:
+
+* missing_root: the resource collection does not exist in iRODS
+* missing_in_irods: a ResourceFile has no data object in iRODS
+* missing_aggregation_xml: an aggregation metadata or map file does not exist in iRODS
+* missing_in_django: a data object in data/contents has no ResourceFile
+* ispublic_mismatch: the isPublic AVU does not agree with ResourceAccess.public
+* audit_failed: the resource could not be audited
+
+The output file is also the checkpoint of a run: resources already recorded in it are
+skipped, so that an interrupted run resumes when it is started again with the same file.
+The audit only reads. repair_resource --audit repairs the resources with errors.
+"""
+
+import json
+import logging
+import os
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.db import connections
+
+from django_irods.icommands import SessionException
+from hs_core.hydroshare.utils import get_full_irods_path, get_resource_by_shortkey
+from hs_core.models import BaseResource
+
+logger = logging.getLogger(__name__)
+
+
+def _error(error_type, path=None, detail=None):
+    error = {'type': error_type}
+    if path is not None:
+        error['path'] = path
+    if detail is not None:
+        error['detail'] = detail
+    return error
+
+
+def audit_resource(short_id):
+    """
+    Compare the iRODS content of a resource with Django.
+
+    :param short_id: short id of the resource
+    :return: dict with resource_id, resource_type and the list of errors. Paths of errors are
+        relative to the resource collection, i.e., they start with data/contents/.
+    """
+    resource = get_resource_by_shortkey(short_id, or_404=False)
+    result = {'resource_id': short_id, 'resource_type': resource.resource_type, 'errors': []}
+    errors = result['errors']
+
+    if resource.is_federated and not settings.REMOTE_USE_IRODS:
+        result['skipped'] = 'federated resource in unfederated mode'
+        return result
+
+    istorage = resource.get_irods_storage()
+    # one catalog query for all data objects in data/contents and its subfolders
+    listing = istorage.list_checksums(get_full_irods_path(resource, resource.file_path))
+    if not listing and not istorage.exists(resource.root_path):
+        errors.append(_error('missing_root', resource.root_path))
+        return result
+    in_irods = set(listing)
+
+    files = list(resource.files.all().prefetch_related('logical_file_content_object'))
+    in_django = set()
+    logical_files = {}
+    for f in files:
+        # the resource is known, so short_path does not look it up per file
+        f.content_object = resource
+        in_django.add(f.short_path)
+        if f.logical_file is not None:
+            logical_files[(f.logical_file_content_type_id, f.logical_file_object_id)] = \
+                f.logical_file
+
+    aggregation_xml = set()
+    for lf in logical_files.values():
+        for xml_path in (lf.metadata_short_file_path, lf.map_short_file_path):
+            aggregation_xml.add(xml_path)
+            if xml_path not in in_irods:
+                errors.append(_error('missing_aggregation_xml',
+                                     os.path.join('data', 'contents', xml_path)))
+
+    for path in sorted(in_django - in_irods):
+        errors.append(_error('missing_in_irods', os.path.join('data', 'contents', path)))
+    for path in sorted(in_irods - in_django - aggregation_xml):
+        errors.append(_error('missing_in_django', os.path.join('data', 'contents', path)))
+
+    try:
+        irods_public = str(resource.getAVU('isPublic')).lower() == 'true'
+        if irods_public != resource.raccess.public:
+            errors.append(_error('ispublic_mismatch',
+                                 detail='public in {}, private in {}'.format(
+                                     'iRODS' if irods_public else 'Django',
+                                     'Django' if irods_public else 'iRODS')))
+    except SessionException as ex:
+        errors.append(_error('ispublic_mismatch',
+                             detail='cannot read isPublic: {}'.format(ex.stderr)))
+    return result
+
+
+def _init_worker():
+    # connections inherited from the parent process must not be shared
+    connections.close_all()
+
+
+def _audit_worker(short_id):
+    try:
+        return audit_resource(short_id)
+    except Exception as ex:
+        return {'resource_id': short_id, 'resource_type': None,
+                'errors': [_error('audit_failed', detail=str(ex))]}
+
+
+def resource_ids_to_audit(shard=0, shards=1):
+    """
+    Return short ids of the resources in one shard of all resources.
+
+    Resources are assigned to shards by id, so that several hosts can audit one zone.
+    """
+    return [short_id for pk, short_id in
+            BaseResource.objects.order_by('pk').values_list('pk', 'short_id')
+            if pk % shards == shard]
+
+
+def read_audit(path):
+    """ Return the results recorded in an audit output file as a dict by resource id """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path) as audit_file:
+        for line in audit_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # the last line of an interrupted run may be incomplete
+                continue
+            results[result['resource_id']] = result
+    return results
+
+
+def run_audit(resource_ids, output, workers=4, echo_errors=True, log_errors=False):
+    """
+    Audit resources in parallel, appending one JSON line per resource to *output*.
+
+    :param resource_ids: short ids of the resources to audit
+    :param output: path of the output file; resources already recorded there are skipped
+    :param workers: number of worker processes
+    :param echo_errors: whether to print errors on stdout
+    :param log_errors: whether to log errors to Django log
+    :return: tuple of the number of resources audited and the number with errors
+    """
+    done = read_audit(output)
+    todo = [rid for rid in resource_ids if rid not in done]
+    if echo_errors and done:
+        print("resuming audit: {} resources already audited".format(len(done)))
+
+    audited = 0
+    with_errors = 0
+    # close connections of the parent before forking the workers
+    connections.close_all()
+    pool = Pool(processes=workers, initializer=_init_worker)
+    try:
+        with open(output, 'a+') as audit_file:
+            # an interrupted run may have left an incomplete last line; end it, so that the
+            # first new result is not appended to it
+            audit_file.seek(0, os.SEEK_END)
+            if audit_file.tell() > 0:
+                audit_file.seek(-1, os.SEEK_END)
+                if audit_file.read(1) != '\n':
+                    audit_file.seek(0, os.SEEK_END)
+                    audit_file.write('\n')
+            for result in pool.imap_unordered(_audit_worker, todo, chunksize=10):
+                audit_file.write(json.dumps(result) + '\n')
+                # each recorded line is a checkpoint
+                audit_file.flush()
+                audited += 1
+                if result['errors']:
+                    with_errors += 1
+                for error in result['errors']:
+                    msg = "audit: resource {} {} {} {}".format(
+                        result['resource_id'], error['type'], error.get('path', ''),
+                        error.get('detail', ''))
+                    if echo_errors:
+                        print(msg)
+                    if log_errors:
+                        logger.error(msg)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return audited, with_errors
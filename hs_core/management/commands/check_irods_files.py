@@ -11,10 +11,17 @@ This checks that:
 
 * By default, prints errors on stdout.
 * Optional argument --log instead logs output to system log.
+* Optional argument --audit FILE: check 1 and 2 with the parallel audit of
+  hs_core/management/audit.py and append JSON lines to FILE. A run that is interrupted resumes
+  when started again with the same FILE. The audit does not repair anything; pass FILE to
+  repair_resource --audit to repair the resources with errors.
+* Optional argument --workers N: number of audit processes (default 4).
+* Optional argument --shard I/N: only audit the I-th of N shards of all resources.
 """
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from hs_core.models import BaseResource
+from hs_core.management.audit import resource_ids_to_audit, run_audit
 from hs_core.management.utils import check_irods_files, check_for_dangling_irods
 
 
@@ -60,9 +67,46 @@ class Command(BaseCommand):
             dest='unreferenced',
             help='check for unreferenced iRODS directories',
         )
+        parser.add_argument(
+            '--audit',
+            dest='audit',  # value is options['audit']
+            help='audit in parallel and write JSON lines to this file',
+        )
+        parser.add_argument(
+            '--workers',
+            dest='workers',
+            type=int,
+            default=4,
+            help='number of audit processes',
+        )
+        parser.add_argument(
+            '--shard',
+            dest='shard',
+            default='0/1',
+            help='audit only shard I of N shards, given as I/N',
+        )
 
     def handle(self, *args, **options):
-        if options['unreferenced']:
+        if options['audit']:
+            try:
+                shard, shards = [int(n) for n in options['shard'].split('/')]
+                assert 0 <= shard < shards
+            except (ValueError, AssertionError):
+                raise CommandError("--shard must be I/N with 0 <= I < N")
+            if options['clean_irods'] or options['clean_django'] or options['sync_ispublic']:
+                raise CommandError("--audit does not repair; use repair_resource --audit")
+            if len(options['resource_ids']) > 0:
+                resource_ids = options['resource_ids']
+            else:
+                resource_ids = resource_ids_to_audit(shard, shards)
+            print("AUDITING {} RESOURCES INTO {}".format(len(resource_ids), options['audit']))
+            audited, with_errors = run_audit(resource_ids, options['audit'],
+                                             workers=options['workers'],
+                                             echo_errors=not options['log'],
+                                             log_errors=options['log'])
+            print("audited {} resources, {} with errors".format(audited, with_errors))
+
+        elif options['unreferenced']:
             print("LOOKING FOR IRODS RESOURCES NOT IN DJANGO")
             check_for_dangling_irods(echo_errors=not options['log'],
                                      log_errors=options['log'],
@@ -0,0 +1,22 @@
+"""Write the buffered view and download counts of all resources to the database now.
+This flushes the deltas in the django cache, so it reaches the counts buffered by other
+processes only if the cache is shared, e.g., memcached or redis.
+"""
+
+from django.core.management.base import BaseCommand
+
+from hs_core.counters import counters_buffered, flush_counters
+
+
+class Command(BaseCommand):
+    help = "Write the view and download counts buffered in the cache to the database"
+
+    def handle(self, *args, **options):
+        if not counters_buffered():
+            print("RESOURCE_COUNTER_BUFFER_ENABLED is not set, nothing is buffered")
+            return
+        written = flush_counters()
+        if written is None:
+            print("another flush is running, try again later")
+        else:
+            print("wrote {} resource counters".format(written))
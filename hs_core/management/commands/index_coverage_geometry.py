@@ -0,0 +1,43 @@
+"""Fill the indexed geometry of box and point coverages from their values.
+
+Coverage.save() maintains the geometry used by spatial queries of get_resource_list;
+this fills it for coverages saved before it existed, or changed by queryset updates.
+* By default, only coverages without a geometry are filled.
+* Optional argument --all: recompute the geometry of every box and point coverage.
+"""
+
+from django.core.management.base import BaseCommand
+
+from hs_core.models import Coverage
+
+
+class Command(BaseCommand):
+    help = "Fill the indexed geometry of box and point coverages."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--all',
+            action='store_true',  # True for presence, False for absence
+            dest='all',           # value is options['all']
+            help='recompute geometry of all coverages',
+        )
+
+    def handle(self, *args, **options):
+        coverages = Coverage.objects.filter(type__in=('box', 'point'))
+        if not options['all']:
+            coverages = coverages.filter(geometry__isnull=True)
+
+        filled = 0
+        invalid = 0
+        for cov in coverages.only('id', 'type', '_value').iterator():
+            geometry = Coverage.geometry_from_value(cov.type, cov._value)
+            if geometry is None:
+                invalid += 1
+                print("coverage id {} has no valid coordinates: {}".format(cov.id, cov._value))
+            else:
+                filled += 1
+            # update() does not send signals or touch the resource
+            Coverage.objects.filter(id=cov.id).update(geometry=geometry)
+        print("filled geometry of {} coverages, {} without valid coordinates"
+              .format(filled, invalid))
@@ -11,11 +11,14 @@ This checks that:
 
 * By default, prints errors on stdout.
 * Optional argument --log instead logs output to system log.
+* Optional argument --audit FILE: only repair resources with errors in FILE, as written by
+  check_irods_files --audit.
 """
 
 from django.core.management.base import BaseCommand
 from hs_core.models import BaseResource
 from hs_core.hydroshare.utils import get_resource_by_shortkey
+from hs_core.management.audit import read_audit
 from hs_core.management.utils import repair_resource
 
 import logging
@@ -37,21 +40,36 @@ class Command(BaseCommand):
             help='log errors to system log',
         )
 
+        parser.add_argument(
+            '--audit',
+            dest='audit',  # value is options['audit']
+            help='repair resources with errors in this audit file',
+        )
+
     def handle(self, *args, **options):
 
         logger = logging.getLogger(__name__)
         log_errors = options['log']
         echo_errors = not options['log']
 
-        if len(options['resource_ids']) > 0:  # an array of resource short_id to check.
-            for rid in options['resource_ids']:
+        resource_ids = options['resource_ids']
+        if options['audit']:
+            resource_ids = [rid for rid, result in sorted(read_audit(options['audit']).items())
+                            if result['errors'] and
+                            (not options['resource_ids'] or rid in options['resource_ids'])]
+            print("REPAIRING {} RESOURCES WITH AUDIT ERRORS".format(len(resource_ids)))
+            if not resource_ids:
+                return
+
+        if len(resource_ids) > 0:  # an array of resource short_id to check.
+            for rid in resource_ids:
                 try:
-                    resource = get_resource_by_shortkey(rid)
-                except BaseResource.NotFoundException:
+                    resource = get_resource_by_shortkey(rid, or_404=False)
+                except BaseResource.DoesNotExist:
                     msg = "resource {} not found".format(rid)
                     print(msg)
                     continue
-                _, count = repair_resource(resource,
+                _, count = repair_resource(resource, logger,
                                            echo_errors=echo_errors,
                                            log_errors=log_errors,
                                            return_errors=False)
@@ -74,7 +92,7 @@ class Command(BaseCommand):
                     print(msg)
                     continue
 
-                _, count = repair_resource(resource,
+                _, count = repair_resource(resource, logger,
                                            echo_errors=echo_errors,
                                            log_errors=log_errors,
                                            return_errors=False)
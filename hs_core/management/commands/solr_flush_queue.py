@@ -0,0 +1,29 @@
+"""Send all queued SOLR updates to SOLR now.
+* By default, prints the queue length and lag and then flushes the queue.
+* Optional argument --status: only print the queue length and lag.
+"""
+
+from django.core.management.base import BaseCommand
+
+from hs_core.models import SolrQueueEntry
+from hs_core.solr_queue import process_solr_queue, solr_queue_lag
+
+
+class Command(BaseCommand):
+    help = "Flush the queue of SOLR updates written by HydroQueuedSignalProcessor"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--status',
+            action='store_true',  # True for presence, False for absence
+            dest='status',        # value is options['status']
+            help='only report the length and lag of the queue',
+        )
+
+    def handle(self, *args, **options):
+        print("{} resources queued, queue lag is {:.1f}s".format(
+            SolrQueueEntry.objects.count(), solr_queue_lag()))
+        if not options['status']:
+            sent = process_solr_queue()
+            print("sent {} resources to SOLR".format(sent))
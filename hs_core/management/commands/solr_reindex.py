@@ -0,0 +1,76 @@
+"""Re-index all public and discoverable resources in SOLR in batches.
+
+Each batch is loaded with BaseResourceIndex.index_queryset(), which prefetches the metadata
+of the whole batch, and is sent to SOLR in one update. Indexing throughput in documents per
+second is printed after every batch and for the whole run.
+* Optional argument --batch-size: number of resources per batch (default 500).
+* Optional argument --log: logs output to system log.
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from haystack import connections
+
+from hs_core.models import BaseResource
+
+
+class Command(BaseCommand):
+    help = "Re-index public and discoverable resources in SOLR in batches"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            type=int,
+            default=500,
+            help='number of resources indexed per SOLR update',
+        )
+
+        parser.add_argument(
+            '--using',
+            dest='using',
+            default='default',
+            help='haystack connection to update',
+        )
+
+        parser.add_argument(
+            '--log',
+            action='store_true',  # True for presence, False for absence
+            dest='log',           # value is options['log']
+            help='log throughput to system log',
+        )
+
+    def handle(self, *args, **options):
+        logger = logging.getLogger(__name__)
+        using = options['using']
+        backend = connections[using].get_backend()
+        index = connections[using].get_unified_index().get_index(BaseResource)
+        queryset = index.index_queryset(using=using).order_by('pk')
+
+        total = 0
+        last_pk = 0
+        run_start = time.time()
+        while True:
+            batch_start = time.time()
+            batch = list(queryset.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            backend.update(index, batch)
+            elapsed = time.time() - batch_start
+            total += len(batch)
+            last_pk = batch[-1].pk
+            msg = "indexed {} resources in {:.1f}s ({:.1f} docs/sec), {} so far".format(
+                len(batch), elapsed, len(batch) / max(elapsed, 1e-6), total)
+            print(msg)
+            if options['log']:
+                logger.info(msg)
+
+        elapsed = time.time() - run_start
+        msg = "indexed {} resources in {:.1f}s ({:.1f} docs/sec)".format(
+            total, elapsed, total / max(elapsed, 1e-6))
+        print(msg)
+        if options['log']:
+            logger.info(msg)
@@ -451,11 +451,12 @@ def check_for_dangling_irods(echo_errors=True, log_errors=False, return_errors=F
     toplevel = istorage.listdir('.')  # list the resources themselves
     logger = logging.getLogger(__name__)
 
+    # one query for all resources rather than one per directory
+    in_django = set(BaseResource.objects.values_list('short_id', flat=True))
+
     errors = []
     for id in toplevel[0]:  # directories
-        try:
-            get_resource_by_shortkey(id, or_404=False)
-        except BaseResource.DoesNotExist:
+        if id not in in_django:
             msg = "resource {} does not exist in Django".format(id)
             if echo_errors:
                 print(msg)
@@ -542,6 +543,7 @@ def repair_resource(resource, logger, stop_on_error=False,
         print("... affected resource {} has type {}, title '{}'"
               .format(resource.short_id, resource.resource_type,
                       resource.title.encode('ascii', 'replace')))
+    return errors, ecount + count
 
 
 class CheckResource(object):
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0043_auto_20190621_0308'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BagManifestEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=4096)),
+                ('checksum', models.CharField(max_length=64)),
+                ('size', models.BigIntegerField(default=-1)),
+                ('modify_time', models.CharField(max_length=32)),
+                ('zipped', models.BooleanField(default=False)),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bag_entries', to='hs_core.BaseResource')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='bagmanifestentry',
+            index_together=set([('resource', 'path')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0045_solrqueueentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coverage',
+            name='geometry',
+            field=django.contrib.gis.db.models.fields.GeometryField(blank=True, editable=False, null=True, srid=4326),
+        ),
+    ]
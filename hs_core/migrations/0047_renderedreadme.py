@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0046_coverage_geometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedReadme',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checksum', models.CharField(blank=True, max_length=100)),
+                ('content', models.TextField(blank=True)),
+                ('resource_file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rendered_readme', to='hs_core.ResourceFile')),
+            ],
+        ),
+    ]
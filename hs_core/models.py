@@ -12,6 +12,8 @@ from markdown import markdown
 
 from django_irods.icommands import SessionException
 
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.geos import Point, Polygon
 from django.contrib.postgres.fields import HStoreField
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.fields import GenericRelation
@@ -25,6 +27,7 @@ from django.dispatch import receiver
 from django.utils.timezone import now
 from django_irods.storage import IrodsStorage
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files import File
 from django.core.exceptions import ObjectDoesNotExist, ValidationError, \
     SuspiciousFileOperation, PermissionDenied
@@ -41,6 +44,7 @@ from mezzanine.pages.managers import PageManager
 
 from dominate.tags import div, legend, table, tbody, tr, th, td, h4
 
+from hs_core.counters import COUNTER_FIELDS, increment_counter, pending_count
 from hs_core.irods import ResourceIRODSMixin, ResourceFileIRODSMixin
 
 import unicodedata
@@ -1178,11 +1182,43 @@ class Coverage(AbstractMetaDataElement):
     """
     _value = models.CharField(max_length=1024)
 
+    # box or point of the coverage, for indexed spatial queries; maintained by save()
+    geometry = GeometryField(srid=4326, null=True, blank=True, editable=False)
+
     @property
     def value(self):
         """Return json representation of coverage values."""
         return json.loads(self._value)
 
+    @staticmethod
+    def geometry_from_value(coverage_type, value):
+        """Return the polygon of a box or the point of a point coverage value.
+
+        Coordinates are used as given, regardless of projection. Returns None for period
+        coverages and for values without valid coordinates.
+        """
+        try:
+            if isinstance(value, basestring):
+                value = json.loads(value)
+            if coverage_type == 'box':
+                geometry = Polygon.from_bbox((float(value['eastlimit']),
+                                              float(value['southlimit']),
+                                              float(value['westlimit']),
+                                              float(value['northlimit'])))
+            elif coverage_type == 'point':
+                geometry = Point(float(value['east']), float(value['north']))
+            else:
+                return None
+        except (KeyError, TypeError, ValueError):
+            return None
+        geometry.srid = 4326
+        return geometry
+
+    def save(self, *args, **kwargs):
+        """Update the geometry from the value whenever the coverage is saved."""
+        self.geometry = self.geometry_from_value(self.type, self._value)
+        super(Coverage, self).save(*args, **kwargs)
+
     @classmethod
     def create(cls, **kwargs):
         """Define custom create method for Coverage model.
@@ -1738,12 +1774,18 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
     view_count = models.PositiveIntegerField(default=0)
 
     def update_view_count(self, request):
-        self.view_count += 1
-        self.save()
+        increment_counter(self, 'view_count')
 
     def update_download_count(self):
-        self.download_count += 1
-        self.save()
+        increment_counter(self, 'download_count')
+
+    def get_view_count(self):
+        """Return view_count including the views not yet written to the database."""
+        return self.view_count + pending_count(self, 'view_count')
+
+    def get_download_count(self):
+        """Return download_count including the downloads not yet written to the database."""
+        return self.download_count + pending_count(self, 'download_count')
 
     # definition of resource logic
     @property
@@ -1972,7 +2014,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
         setter is the requesting user to transfer quota holder and setter must also be an owner
         """
         from hs_core.hydroshare.utils import validate_user_quota
-        from hs_core.hydroshare.resource import update_quota_usage
+        from hs_core.hydroshare.resource import record_quota_usage
 
         if __debug__:
             assert(isinstance(setter, User))
@@ -1983,7 +2025,9 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
 
         # QuotaException will be raised if new_holder does not have enough quota to hold this
         # new resource, in which case, set_quota_holder to the new user fails
-        validate_user_quota(new_holder, self.size)
+        size = self.size
+        validate_user_quota(new_holder, size)
+        old_holder = self.get_quota_holder()
         attname = "quotaUserName"
 
         if setter.username != new_holder.username:
@@ -1995,7 +2039,10 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
                 # holder will be reduced as a result of setting quota holder to a different user
                 self.removeAVU(attname, oldqu)
         self.setAVU(attname, new_holder.username)
-        update_quota_usage(res=self, user=setter)
+        # move the usage of this resource from the old to the new quota holder
+        if old_holder != new_holder:
+            record_quota_usage(-size, user=old_holder)
+            record_quota_usage(size, user=new_holder)
 
     def get_quota_holder(self):
         """Get quota holder of the resource.
@@ -2327,7 +2374,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
         'readme.txt' or 'readme.md' (filename is case insensitive). If no such file then None
         is returned. If both files exist then resource file for readme.md is returned"""
 
-        res_files_at_root = self.files.filter(file_folder=None)
+        res_files_at_root = self.files.filter(file_folder=None).select_related('rendered_readme')
         readme_txt_file = None
         readme_md_file = None
         for res_file in res_files_at_root:
@@ -2349,17 +2396,18 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
 
         Note: The user uploaded readme file if originally not encoded as utf-8, then any non-ascii
         characters in the file will be escaped when we return the file content.
+
+        The content is rendered when the file is added or replaced and read from the database.
+        Readme files that were added before that are rendered on first use.
         """
         readme_file = self.readme_file
-        if readme_file is not None:
-            readme_file_content = readme_file.read().decode('utf-8', 'ignore')
-            if readme_file.extension.lower() == '.md':
-                markdown_file_content = markdown(readme_file_content)
-                return {'content': markdown_file_content,
-                        'file_name': readme_file.file_name, 'file_type': 'md'}
-            else:
-                return {'content': readme_file_content, 'file_name': readme_file.file_name}
-        return readme_file
+        if readme_file is None:
+            return None
+        try:
+            rendered = readme_file.rendered_readme
+        except RenderedReadme.DoesNotExist:
+            rendered = RenderedReadme.render(readme_file)
+        return rendered.as_dict()
 
     @property
     def logical_files(self):
@@ -2616,6 +2664,25 @@ class ResourceFile(ResourceFileIRODSMixin):
                                                     'logical_file_object_id')
     _size = models.BigIntegerField(default=-1)
 
+    # fields that locate the file; see location_changed
+    LOCATION_FIELDS = ('file_folder', 'resource_file', 'fed_resource_file')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the location of the file as read from the database."""
+        instance = super(ResourceFile, cls).from_db(db, field_names, values)
+        instance._saved_location = instance._location()
+        return instance
+
+    def _location(self):
+        # the values as set, so that neither deferred fields nor the resource are read
+        values = [self.__dict__.get(name) for name in self.LOCATION_FIELDS]
+        return tuple(getattr(value, 'name', value) for value in values)
+
+    def location_changed(self):
+        """Return True if the file was moved or renamed since it was read or last saved."""
+        return self._location() != getattr(self, '_saved_location', None)
+
     def __str__(self):
         """Return resource filename or federated resource filename for string representation."""
         if self.resource.resource_federation_path:
@@ -2809,7 +2876,10 @@ class ResourceFile(ResourceFileIRODSMixin):
                 logger = logging.getLogger(__name__)
                 logger.warn("file {} not found".format(self.storage_path))
                 self._size = 0
-        self.save()
+        if self.pk is None:
+            self.save()
+        else:
+            self.save(update_fields=['_size'])
 
     # ResourceFile API handles file operations
     def set_storage_path(self, path, test_exists=True):
@@ -3151,6 +3221,85 @@ class ResourceFile(ResourceFileIRODSMixin):
         else:
             return self.public_path
 
+    @property
+    def is_readme(self):
+        """Return True if this is a readme.md or readme.txt file at the root of the resource."""
+        return not self.file_folder and self.file_name.lower() in README_FILE_NAMES
+
+
+# names of the files that are rendered as the readme of a resource, in lower case
+README_FILE_NAMES = ('readme.md', 'readme.txt')
+
+
+class RenderedReadme(models.Model):
+    """Represent the rendered content of a readme file of a resource.
+
+    The content is rendered when the file is added or replaced, so that landing pages neither
+    read the file from iRODS nor render markdown. The row is deleted with the file, and when the
+    file is renamed or moved so that it is no longer a readme file. Rendered content is also
+    cached by the iCAT checksum of the file, which avoids reading and rendering the readme files
+    of copies and versions of a resource.
+    """
+
+    resource_file = models.OneToOneField(ResourceFile, on_delete=models.CASCADE,
+                                         related_name='rendered_readme')
+    # iCAT checksum of the file content that was rendered, empty if iCAT had none
+    checksum = models.CharField(max_length=100, blank=True)
+    content = models.TextField(blank=True)
+
+    @staticmethod
+    def _cache_key(checksum, extension):
+        return 'rendered_readme:{}:{}'.format(checksum, extension.lower())
+
+    @classmethod
+    def render(cls, res_file):
+        """Render the content of a readme file, unless its checksum shows that it is unchanged.
+
+        :param res_file: a readme ResourceFile
+        :return: the RenderedReadme of the file
+        """
+        from hs_core.hydroshare.utils import get_resource_file_checksum
+
+        checksum = get_resource_file_checksum(res_file)
+        rendered = cls.objects.filter(resource_file=res_file).first()
+        if rendered is not None and checksum and rendered.checksum == checksum:
+            return rendered
+
+        cache_key = cls._cache_key(checksum, res_file.extension)
+        content = cache.get(cache_key) if checksum else None
+        if content is None:
+            # if the user uploaded file is not encoded as utf-8, non-ascii characters are dropped
+            content = res_file.read().decode('utf-8', 'ignore')
+            if res_file.extension.lower() == '.md':
+                content = markdown(content)
+            if checksum:
+                cache.set(cache_key, content,
+                          getattr(settings, 'RENDERED_README_CACHE_TIMEOUT', 86400))
+
+        if rendered is None:
+            rendered = cls(resource_file=res_file)
+        rendered.checksum = checksum
+        rendered.content = content
+        rendered.save()
+        return rendered
+
+    @classmethod
+    def render_or_defer(cls, res_file):
+        """Render a readme file; if that fails, its content is rendered on first use instead."""
+        try:
+            cls.render(res_file)
+        except Exception as ex:
+            logger = logging.getLogger(__name__)
+            logger.warning("failed to render readme file {}: {}".format(res_file.storage_path,
+                                                                        str(ex)))
+
+    def as_dict(self):
+        """Return the content in the form returned by AbstractResource.get_readme_file_content."""
+        readme = {'content': self.content, 'file_name': self.resource_file.file_name}
+        if self.resource_file.extension.lower() == '.md':
+            readme['file_type'] = 'md'
+        return readme
+
 
 class Bags(models.Model):
     """Represent data bags format as django model."""
@@ -3171,6 +3320,44 @@ class Bags(models.Model):
         return self.content_object.get_content_model()
 
 
+class BagManifestEntry(models.Model):
+    """Represent the bag state of one payload file of a resource.
+
+    Each entry records the md5 checksum of a data object under {res_id}/data together with
+    the iRODS size and modification time the checksum was computed for, and whether the
+    resource bag zip already contains this version of the file. This allows bags to be
+    rebuilt incrementally, and interrupted builds to resume, see hs_bagit.create_bag_incrementally.
+    """
+
+    resource = models.ForeignKey('BaseResource', related_name='bag_entries')
+    # path relative to the bag root, e.g., data/contents/foo.txt
+    path = models.CharField(max_length=4096)
+    checksum = models.CharField(max_length=64)
+    size = models.BigIntegerField(default=-1)
+    modify_time = models.CharField(max_length=32)
+    zipped = models.BooleanField(default=False)
+
+    class Meta:
+        index_together = [['resource', 'path']]
+
+
+class SolrQueueEntry(models.Model):
+    """Represent a resource whose SOLR record has to be refreshed.
+
+    Entries are written by HydroQueuedSignalProcessor and consumed in batches by
+    hs_core.solr_queue.process_solr_queue. There is one entry per resource, so repeated changes
+    of a resource before the queue is processed result in a single SOLR update. resource_id is
+    not a foreign key because the entry must outlive a deleted resource until its record is
+    removed from SOLR.
+    """
+
+    resource_id = models.IntegerField(unique=True)
+    # time of the oldest change that has not been sent to SOLR
+    queued = models.DateTimeField(default=now, db_index=True)
+    # time of the latest change
+    updated = models.DateTimeField(default=now)
+
+
 class PublicResourceManager(models.Manager):
     """Extend Django model Manager to allow for public resource access."""
 
@@ -3221,6 +3408,25 @@ class BaseResource(Page, AbstractResource):
         verbose_name = 'Generic'
         db_table = 'hs_core_genericresource'
 
+    def save(self, *args, **kwargs):
+        """
+        Save the resource, leaving out view_count and download_count unless they are named in
+        update_fields.
+
+        Counters are incremented in the database without saving the resource, see
+        hs_core.counters, so the values held by this instance may be stale; writing them back
+        would overwrite the increments made since the instance was read.
+        """
+        if not self._state.adding and not kwargs.get('force_insert') and \
+                kwargs.get('update_fields') is None:
+            # fields not loaded (see QuerySet.only) are not saved either, as by Model.save
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and
+                                       field.name not in COUNTER_FIELDS and
+                                       field.attname not in deferred]
+        super(BaseResource, self).save(*args, **kwargs)
+
     def can_add(self, request):
         """Pass through to abstract resource can_add function."""
         return AbstractResource.can_add(self, request)
@@ -4392,3 +4598,22 @@ def resource_creation_signal_handler(sender, instance, created, **kwargs):
 def resource_update_signal_handler(sender, instance, created, **kwargs):
     """Do nothing (noop)."""
     pass
+
+
+@receiver(post_save, sender=ResourceFile)
+def resource_file_saved_handler(sender, instance, created, update_fields=None, **kwargs):
+    """Render a readme file when it is added, renamed or moved, and delete the rendered content
+    of a file that was renamed or moved so that it is no longer a readme file.
+
+    Saves that do not change the location of a file, e.g., of its size, render nothing; the
+    content of a replaced readme file is rendered by replace_resource_file_on_irods.
+    """
+    if update_fields is not None and \
+            not set(update_fields).intersection(ResourceFile.LOCATION_FIELDS):
+        return
+    if created or instance.location_changed():
+        if instance.is_readme:
+            RenderedReadme.render_or_defer(instance)
+        elif not created:
+            RenderedReadme.objects.filter(resource_file=instance).delete()
+    instance._saved_location = instance._location()
@@ -1,8 +1,11 @@
 """Page processors for hs_core app."""
 
+from collections import namedtuple
+
 from dateutil import parser
 from django.conf import settings
 from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from mezzanine.pages.page_processors import processor_for
 
@@ -16,6 +19,18 @@ from hs_core.views.utils import show_relations_section, \
 from hs_tools_resource.app_launch_helper import resource_level_tool_urls
 import json
 
+# seconds rendered readme files are cached for; entries are keyed by the modification time of
+# the resource, so they do not outlive a change of the resource
+LANDING_PAGE_CACHE_TIMEOUT = getattr(settings, 'LANDING_PAGE_CACHE_TIMEOUT', 60 * 60)
+# seconds tool lists are cached for; changes of tool resources do not change the modification
+# time of the resources they apply to
+LANDING_PAGE_TOOLS_CACHE_TIMEOUT = getattr(settings, 'LANDING_PAGE_TOOLS_CACHE_TIMEOUT', 5 * 60)
+
+LandingPageSnapshot = namedtuple('LandingPageSnapshot', [
+    'discoverable', 'resource_is_mine', 'metadata_status', 'belongs_to_collections',
+    'relevant_tools', 'tool_homepage_url', 'bag_url', 'show_content_files', 'allow_copy',
+    'quota_holder', 'readme', 'has_web_ref', 'keywords'])
+
 
 @processor_for(GenericResource)
 def landing_page(request, page):
@@ -57,27 +72,10 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
             raise PermissionDenied()
         return redirect_to_login(request.path)
 
-    discoverable = content_model.raccess.discoverable
-    validation_error = None
-    resource_is_mine = False
-    if user.is_authenticated():
-        resource_is_mine = content_model.rlabels.is_mine(user)
-
-    metadata_status = _get_metadata_status(content_model)
-
-    belongs_to_collections = content_model.collections.all()
-
-    relevant_tools = None
-    tool_homepage_url = None
-    if not resource_edit:  # In view mode
-        landing_page_res_obj = content_model
-        landing_page_res_type_str = landing_page_res_obj.resource_type
-        if landing_page_res_type_str.lower() == "toolresource":
-            if landing_page_res_obj.metadata.app_home_page_url:
-                tool_homepage_url = content_model.metadata.app_home_page_url.value
-        else:
-            relevant_tools = resource_level_tool_urls(landing_page_res_obj, request)
+    snapshot = get_landing_page_snapshot(content_model, user, resource_edit=resource_edit,
+                                         request=request)
 
+    validation_error = None
     just_created = False
     just_copied = False
     create_resource_error = None
@@ -101,26 +99,6 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
         if 'just_published' in request.session:
             del request.session['just_published']
 
-    bag_url = content_model.bag_url
-
-    if user.is_authenticated():
-        show_content_files = user.uaccess.can_view_resource(content_model)
-    else:
-        # if anonymous user getting access to a private resource (since resource is discoverable),
-        # then don't show content files
-        show_content_files = content_model.raccess.public
-
-    allow_copy = can_user_copy_resource(content_model, user)
-
-    qholder = content_model.get_quota_holder()
-
-    readme = content_model.get_readme_file_content()
-    if readme is None:
-        readme = ''
-    has_web_ref = res_has_web_reference(content_model)
-
-    keywords = json.dumps([sub.value for sub in content_model.metadata.subjects.all()])
-
     # user requested the resource in READONLY mode
     if not resource_edit:
         content_model.update_view_count(request)
@@ -177,37 +155,37 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
                    'metadata_form': None,
                    'citation': content_model.get_citation(),
                    'title': title,
-                   'readme': readme,
+                   'readme': snapshot.readme,
                    'abstract': abstract,
                    'creators': content_model.metadata.creators.all(),
                    'contributors': content_model.metadata.contributors.all(),
                    'temporal_coverage': temporal_coverage_data_dict,
                    'spatial_coverage': spatial_coverage_data_dict,
-                   'keywords': keywords,
+                   'keywords': snapshot.keywords,
                    'language': language,
                    'rights': content_model.metadata.rights,
                    'sources': content_model.metadata.sources.all(),
                    'relations': content_model.metadata.relations.all(),
                    'show_relations_section': show_relations_section(content_model),
                    'fundingagencies': content_model.metadata.funding_agencies.all(),
-                   'metadata_status': metadata_status,
+                   'metadata_status': snapshot.metadata_status,
                    'missing_metadata_elements': missing_metadata_elements,
                    'validation_error': validation_error if validation_error else None,
                    'resource_creation_error': create_resource_error,
-                   'relevant_tools': relevant_tools,
-                   'tool_homepage_url': tool_homepage_url,
+                   'relevant_tools': snapshot.relevant_tools,
+                   'tool_homepage_url': snapshot.tool_homepage_url,
                    'file_type_error': file_type_error,
                    'just_created': just_created,
                    'just_copied': just_copied,
                    'just_published': just_published,
-                   'bag_url': bag_url,
-                   'show_content_files': show_content_files,
-                   'discoverable': discoverable,
-                   'resource_is_mine': resource_is_mine,
-                   'allow_resource_copy': allow_copy,
-                   'quota_holder': qholder,
-                   'belongs_to_collections': belongs_to_collections,
-                   'show_web_reference_note': has_web_ref,
+                   'bag_url': snapshot.bag_url,
+                   'show_content_files': snapshot.show_content_files,
+                   'discoverable': snapshot.discoverable,
+                   'resource_is_mine': snapshot.resource_is_mine,
+                   'allow_resource_copy': snapshot.allow_copy,
+                   'quota_holder': snapshot.quota_holder,
+                   'belongs_to_collections': snapshot.belongs_to_collections,
+                   'show_web_reference_note': snapshot.has_web_ref,
                    'current_user': user,
                    'maps_key': maps_key
         }
@@ -284,33 +262,33 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
                'metadata_form': metadata_form,
                'creators': content_model.metadata.creators.all(),
                'title': content_model.metadata.title,
-               'readme': readme,
+               'readme': snapshot.readme,
                'contributors': content_model.metadata.contributors.all(),
                'relations': content_model.metadata.relations.all(),
                'sources': content_model.metadata.sources.all(),
                'fundingagencies': content_model.metadata.funding_agencies.all(),
                'temporal_coverage': temporal_coverage_data_dict,
                'spatial_coverage': spatial_coverage_data_dict,
-               'keywords': keywords,
-               'metadata_status': metadata_status,
+               'keywords': snapshot.keywords,
+               'metadata_status': snapshot.metadata_status,
                'missing_metadata_elements': content_model.metadata.get_required_missing_elements(),
                'citation': content_model.get_citation(),
                'rights': content_model.metadata.rights,
-               'bag_url': bag_url,
+               'bag_url': snapshot.bag_url,
                'current_user': user,
-               'show_content_files': show_content_files,
+               'show_content_files': snapshot.show_content_files,
                'validation_error': validation_error if validation_error else None,
-               'discoverable': discoverable,
-               'resource_is_mine': resource_is_mine,
-               'quota_holder': qholder,
+               'discoverable': snapshot.discoverable,
+               'resource_is_mine': snapshot.resource_is_mine,
+               'quota_holder': snapshot.quota_holder,
                'just_created': just_created,
                'relation_source_types': tuple((type_value, type_display)
                                               for type_value, type_display in Relation.SOURCE_TYPES
                                               if type_value != 'isReplacedBy' and
                                               type_value != 'isVersionOf' and
                                               type_value != 'hasPart'),
-               'show_web_reference_note': has_web_ref,
-               'belongs_to_collections': belongs_to_collections,
+               'show_web_reference_note': snapshot.has_web_ref,
+               'belongs_to_collections': snapshot.belongs_to_collections,
                'maps_key': maps_key
     }
 
@@ -363,3 +341,79 @@ def _get_metadata_status(resource):
         metadata_status = METADATA_STATUS_INSUFFICIENT
 
     return metadata_status
+
+
+def get_landing_page_snapshot(content_model, user, resource_edit=False, request=None):
+    """Return the data of a resource shown on its landing page that is the same for all resource
+    types, as an immutable LandingPageSnapshot. The snapshot is computed once per request.
+
+    Rendered readme files, and the tool lists of anonymous users, are also cached across requests
+    by the modification time of the resource, so that anonymous views of public resources do
+    not read from iRODS.
+    """
+    if request is not None:
+        snapshots = getattr(request, '_landing_page_snapshots', None)
+        if snapshots is None:
+            snapshots = request._landing_page_snapshots = {}
+        snapshot_key = (content_model.short_id, resource_edit)
+        if snapshot_key in snapshots:
+            return snapshots[snapshot_key]
+
+    raccess = content_model.raccess
+    authenticated = user.is_authenticated()
+
+    relevant_tools = None
+    tool_homepage_url = None
+    if not resource_edit:  # In view mode
+        if content_model.resource_type.lower() == "toolresource":
+            if content_model.metadata.app_home_page_url:
+                tool_homepage_url = content_model.metadata.app_home_page_url.value
+        elif authenticated or request is None:
+            relevant_tools = resource_level_tool_urls(content_model, request)
+        else:
+            relevant_tools = _get_cached(
+                content_model, 'tools:{}'.format(raccess.sharing_status),
+                lambda: resource_level_tool_urls(content_model, request),
+                LANDING_PAGE_TOOLS_CACHE_TIMEOUT)
+
+    if authenticated:
+        show_content_files = user.uaccess.can_view_resource(content_model)
+    else:
+        # if anonymous user getting access to a private resource (since resource is discoverable),
+        # then don't show content files
+        show_content_files = raccess.public
+
+    snapshot = LandingPageSnapshot(
+        discoverable=raccess.discoverable,
+        resource_is_mine=content_model.rlabels.is_mine(user) if authenticated else False,
+        metadata_status=_get_metadata_status(content_model),
+        belongs_to_collections=list(content_model.collections.all()),
+        relevant_tools=relevant_tools,
+        tool_homepage_url=tool_homepage_url,
+        bag_url=content_model.bag_url,
+        show_content_files=show_content_files,
+        allow_copy=can_user_copy_resource(content_model, user),
+        # the quota holder (an iRODS AVU) is only shown to users who can manage access
+        quota_holder=content_model.get_quota_holder() if authenticated else None,
+        readme=_get_cached(content_model, 'readme',
+                           lambda: content_model.get_readme_file_content() or '',
+                           LANDING_PAGE_CACHE_TIMEOUT),
+        has_web_ref=res_has_web_reference(content_model),
+        keywords=json.dumps([sub.value for sub in content_model.metadata.subjects.all()]))
+
+    if request is not None:
+        snapshots[snapshot_key] = snapshot
+    return snapshot
+
+
+def _get_cached(resource, name, compute, timeout):
+    """Return the value *name* of *resource* from the cache, computing and caching it if it is
+    not cached for the current modification time of the resource"""
+    key = 'landing_page:{}:{}:{}'.format(resource.short_id, name,
+                                         str(resource.updated).replace(' ', 'T'))
+    # values are wrapped in a tuple so that None is cached as well
+    cached = cache.get(key)
+    if cached is None:
+        cached = (compute(),)
+        cache.set(key, cached, timeout)
+    return cached[0]
@@ -1,12 +1,15 @@
 """Define search indexes for hs_core module."""
 
+from collections import defaultdict
+
 from haystack import indexes
 from hs_core.models import BaseResource
+from hs_access_control.models import PrivilegeCodes, UserResourcePrivilege
 from hs_geographic_feature_resource.models import GeographicFeatureMetaData
 from hs_app_netCDF.models import NetcdfMetaData
 from ref_ts.models import RefTSMetadata
 from hs_app_timeseries.models import TimeSeriesMetaData
-from django.db.models import Q
+from django.db.models import Q, QuerySet, prefetch_related_objects
 from datetime import datetime
 from nameparser import HumanName
 import probablepeople
@@ -63,6 +66,129 @@ def normalize_name(name):
     return normalized.strip()
 
 
+# metadata elements every metadata class inherits from CoreMetaData
+CORE_METADATA_LOOKUPS = ('_title', '_description', '_language', '_publisher', 'creators',
+                         'contributors', 'subjects', 'coverages', 'formats', 'identifiers',
+                         'sources', 'relations')
+
+# metadata elements of specific resource types that are used for indexing
+TYPE_METADATA_LOOKUPS = {
+    GeographicFeatureMetaData: ('geometryinformations', 'fieldinformations'),
+    NetcdfMetaData: ('variables',),
+    RefTSMetadata: ('variables', 'sites', 'methods', 'quality_levels', 'datasources'),
+    TimeSeriesMetaData: ('_variables', '_sites', '_methods', '_time_series_results'),
+}
+
+
+def _first(elements):
+    """Return the element with the lowest pk, like first() of an unordered QuerySet.
+
+    Unlike first(), this uses prefetched elements instead of running a query.
+    """
+    elements = list(elements)
+    if not elements:
+        return None
+    return min(elements, key=lambda element: element.pk)
+
+
+class IndexSnapshot(object):
+    """Metadata of a resource as used by the prepare_* methods of BaseResourceIndex.
+
+    The snapshot is built once per resource, so that methods using the same elements, e.g.,
+    the first creator or the owners, do not query them again. For resources loaded by
+    BaseResourceIndex.index_queryset() all elements come from prefetched relations.
+    """
+
+    def __init__(self, obj, owners=None):
+        self.content_model = obj.get_content_model()
+        self.metadata = getattr(obj, 'metadata', None)
+        if owners is None:
+            owners = list(obj.raccess.owners) if hasattr(obj, 'raccess') else []
+        self.owners = owners
+        self.comments = list(obj.comments.all())
+
+        metadata = self.metadata
+        if metadata is None:
+            self.title = self.description = self.language = self.publisher = None
+            self.creators = self.contributors = self.subjects = self.coverages = []
+            self.formats = self.identifiers = self.sources = self.relations = []
+            return
+        self.title = _first(metadata._title.all())
+        self.description = _first(metadata._description.all())
+        self.language = _first(metadata._language.all())
+        self.publisher = _first(metadata._publisher.all())
+        self.creators = list(metadata.creators.all())
+        self.contributors = list(metadata.contributors.all())
+        self.subjects = list(metadata.subjects.all())
+        self.coverages = list(metadata.coverages.all())
+        self.formats = list(metadata.formats.all())
+        self.identifiers = list(metadata.identifiers.all())
+        self.sources = list(metadata.sources.all())
+        self.relations = list(metadata.relations.all())
+
+    @property
+    def first_creator(self):
+        for creator in self.creators:
+            if creator.order == 1:
+                return creator
+        return None
+
+
+def get_index_snapshot(obj):
+    """Return the IndexSnapshot of a resource, building it on first use."""
+    snapshot = getattr(obj, 'index_snapshot', None)
+    if snapshot is None:
+        snapshot = IndexSnapshot(obj)
+        obj.index_snapshot = snapshot
+    return snapshot
+
+
+def prepare_index_snapshots(resources):
+    """Build the IndexSnapshot of each resource in a chunk with a fixed number of queries.
+
+    Metadata objects are of different classes, so their elements are prefetched per class.
+    """
+    resources = list(resources)
+    if not resources:
+        return
+    prefetch_related_objects(resources, 'content_object')
+    metadata_by_class = defaultdict(list)
+    for res in resources:
+        if res.content_object is not None:
+            metadata_by_class[type(res.content_object)].append(res.content_object)
+    for metadata_class, metadata_objects in metadata_by_class.items():
+        lookups = CORE_METADATA_LOOKUPS + TYPE_METADATA_LOOKUPS.get(metadata_class, ())
+        prefetch_related_objects(metadata_objects, *lookups)
+
+    composite_resources = [res for res in resources if res.resource_type == 'CompositeResource']
+    if composite_resources:
+        # for the content types of the aggregations
+        prefetch_related_objects(composite_resources, 'files__logical_file_content_object')
+
+    owners = defaultdict(list)
+    privileges = UserResourcePrivilege.objects.filter(resource__in=resources,
+                                                      privilege=PrivilegeCodes.OWNER,
+                                                      user__is_active=True) \
+        .select_related('user')
+    for privilege in privileges:
+        owners[privilege.resource_id].append(privilege.user)
+
+    for res in resources:
+        res.index_snapshot = IndexSnapshot(res, owners=owners[res.id])
+
+
+class ResourceIndexQuerySet(QuerySet):
+    """QuerySet of BaseResource that builds index snapshots for every chunk it fetches.
+
+    update_index slices the index queryset into batches; each batch is evaluated separately
+    and gets its snapshots built in one pass.
+    """
+
+    def _prefetch_related_objects(self):
+        super(ResourceIndexQuerySet, self)._prefetch_related_objects()
+        prepare_index_snapshots(self._result_cache)
+
+
 class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     """Define base class for resource indexes."""
 
@@ -152,9 +278,19 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         return BaseResource
 
     def index_queryset(self, using=None):
-        """Return queryset including discoverable and public resources."""
-        return self.get_model().objects.filter(Q(raccess__discoverable=True) |
-                                               Q(raccess__public=True))
+        """Return queryset including discoverable and public resources.
+
+        Metadata needed by the prepare_* methods is loaded in bulk for each fetched chunk.
+        """
+        return ResourceIndexQuerySet(self.get_model(), using=using) \
+            .filter(Q(raccess__discoverable=True) | Q(raccess__public=True)) \
+            .select_related('raccess') \
+            .prefetch_related('content_object')
+
+    def prepare(self, obj):
+        """Build the snapshot used by the prepare_* methods and the text template first."""
+        get_index_snapshot(obj)
+        return super(BaseResourceIndex, self).prepare(obj)
 
     def prepare_created(self, obj):
         return obj.created.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -164,16 +300,17 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_title(self, obj):
         """Return metadata title if exists, otherwise return 'none'."""
-        if hasattr(obj, 'metadata') and obj.metadata.title.value is not None:
-            return obj.metadata.title.value.lstrip()
+        title = get_index_snapshot(obj).title
+        if title is not None and title.value is not None:
+            return title.value.lstrip()
         else:
             return 'none'
 
     def prepare_abstract(self, obj):
         """Return metadata abstract if exists, otherwise return None."""
-        if hasattr(obj, 'metadata') and obj.metadata.description is not None and \
-                obj.metadata.description.abstract is not None:
-            return obj.metadata.description.abstract.lstrip()
+        description = get_index_snapshot(obj).description
+        if description is not None and description.abstract is not None:
+            return description.abstract.lstrip()
         else:
             return None
 
@@ -183,8 +320,8 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
         This must be represented as a single-value field to enable sorting.
         """
-        if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
+        first_creator = get_index_snapshot(obj).first_creator
+        if first_creator is not None:
             if first_creator.name:
                 return first_creator.name.lstrip()
             elif first_creator.organization:
@@ -201,8 +338,8 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
         This must be represented as a single-value field to enable sorting.
         """
-        if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
+        first_creator = get_index_snapshot(obj).first_creator
+        if first_creator is not None:
             if first_creator.name:
                 normalized = normalize_name(first_creator.name)
                 return normalized
@@ -219,8 +356,8 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
         This field is stored but not indexed, to avoid hitting the Django database during response.
         """
-        if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
+        first_creator = get_index_snapshot(obj).first_creator
+        if first_creator is not None:
             if first_creator.description is not None:
                 return first_creator.description
             else:
@@ -234,12 +371,8 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
         This field can have multiple values
         """
-        if hasattr(obj, 'metadata'):
-            return [normalize_name(creator.name)
-                    for creator in obj.metadata.creators.all()
-                    .exclude(name__isnull=True).exclude(name='')]
-        else:
-            return []
+        snapshot = get_index_snapshot(obj)
+        return [normalize_name(creator.name) for creator in snapshot.creators if creator.name]
 
     def prepare_contributor(self, obj):
         """
@@ -247,13 +380,10 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
         This field can have multiple values. Contributors include creators.
         """
-        if hasattr(obj, 'metadata'):
-            output1 = [normalize_name(contributor.name)
-                       for contributor in obj.metadata.contributors.all()
-                       .exclude(name__isnull=True).exclude(name='')]
-            return list(set(output1))  # eliminate duplicates
-        else:
-            return []
+        snapshot = get_index_snapshot(obj)
+        output1 = [normalize_name(contributor.name)
+                   for contributor in snapshot.contributors if contributor.name]
+        return list(set(output1))  # eliminate duplicates
 
     def prepare_subject(self, obj):
         """
@@ -261,43 +391,34 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
         This field can have multiple values.
         """
-        if hasattr(obj, 'metadata'):
-            return [subject.value.strip() for subject in obj.metadata.subjects.all()
-                    .exclude(value__isnull=True)]
-        else:
-            return []
+        snapshot = get_index_snapshot(obj)
+        return [subject.value.strip() for subject in snapshot.subjects
+                if subject.value is not None]
 
     def prepare_organization(self, obj):
         """
         Return metadata organization if it exists, otherwise return empty array.
         """
         organizations = []
-        if hasattr(obj, 'metadata'):
-            for creator in obj.metadata.creators.all():
-                if(creator.organization is not None):
-                    organizations.append(creator.organization.strip())
+        for creator in get_index_snapshot(obj).creators:
+            if(creator.organization is not None):
+                organizations.append(creator.organization.strip())
         return organizations
 
     def prepare_publisher(self, obj):
         """
         Return metadata publisher if it exists; otherwise return empty array.
         """
-        if hasattr(obj, 'metadata'):
-            publisher = obj.metadata.publisher
-            if publisher is not None:
-                return unicode(publisher).lstrip()
-            else:
-                return None
+        publisher = get_index_snapshot(obj).publisher
+        if publisher is not None:
+            return unicode(publisher).lstrip()
         else:
             return None
 
     def prepare_creator_email(self, obj):
         """Return metadata emails if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [creator.email.strip() for creator in obj.metadata.creators.all()
-                    .exclude(email__isnull=True).exclude(email='')]
-        else:
-            return []
+        snapshot = get_index_snapshot(obj)
+        return [creator.email.strip() for creator in snapshot.creators if creator.email]
 
     def prepare_availability(self, obj):
         """
@@ -321,18 +442,13 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_replaced(self, obj):
         """Return True if 'isReplacedBy' attribute exists, otherwise return False."""
-        if hasattr(obj, 'metadata'):
-            return obj.metadata.relations.all().filter(type='isReplacedBy').exists()
-        else:
-            return False
+        return any(relation.type == 'isReplacedBy'
+                   for relation in get_index_snapshot(obj).relations)
 
     def prepare_coverage(self, obj):
         """Return resource coverage if exists, otherwise return empty array."""
         # TODO: reject empty coverages
-        if hasattr(obj, 'metadata'):
-            return [coverage._value.strip() for coverage in obj.metadata.coverages.all()]
-        else:
-            return []
+        return [coverage._value.strip() for coverage in get_index_snapshot(obj).coverages]
 
     def prepare_coverage_type(self, obj):
         """
@@ -340,10 +456,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
         This field can have multiple values.
         """
-        if hasattr(obj, 'metadata'):
-            return [coverage.type.strip() for coverage in obj.metadata.coverages.all()]
-        else:
-            return []
+        return [coverage.type.strip() for coverage in get_index_snapshot(obj).coverages]
 
     # TODO: THIS IS SIMPLY THE WRONG WAY TO DO THINGS.
     # Should use geopy Point and Haystack LocationField throughout,
@@ -353,8 +466,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     # TODO: If there are multiple coverage objects with the same type, only first is returned.
     def prepare_east(self, obj):
         """Return resource coverage east bound if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        snapshot = get_index_snapshot(obj)
+        if snapshot.metadata is not None:
+            for coverage in snapshot.coverages:
                 if coverage.type == 'point':
                     return float(coverage.value["east"])
                 # TODO: this returns the box center, not the extent
@@ -368,8 +482,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     # TODO: If there are multiple coverage objects with the same type, only first is returned.
     def prepare_north(self, obj):
         """Return resource coverage north bound if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        snapshot = get_index_snapshot(obj)
+        if snapshot.metadata is not None:
+            for coverage in snapshot.coverages:
                 if coverage.type == 'point':
                     return float(coverage.value["north"])
                 # TODO: This returns the box center, not the extent
@@ -382,9 +497,10 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     # TODO: If there are multiple coverage objects with the same type, only first is returned.
     def prepare_northlimit(self, obj):
         """Return resource coverage north limit if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
+        snapshot = get_index_snapshot(obj)
+        if snapshot.metadata is not None:
             # TODO: does not index properly if there are multiple coverages of the same type.
-            for coverage in obj.metadata.coverages.all():
+            for coverage in snapshot.coverages:
                 if coverage.type == 'box':
                     return coverage.value["northlimit"]
         else:
@@ -393,9 +509,10 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     # TODO: If there are multiple coverage objects with the same type, only first is returned.
     def prepare_eastlimit(self, obj):
         """Return resource coverage east limit if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
+        snapshot = get_index_snapshot(obj)
+        if snapshot.metadata is not None:
             # TODO: does not index properly if there are multiple coverages of the same type.
-            for coverage in obj.metadata.coverages.all():
+            for coverage in snapshot.coverages:
                 if coverage.type == 'box':
                     return coverage.value["eastlimit"]
         else:
@@ -404,9 +521,10 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     # TODO: If there are multiple coverage objects with the same type, only first is returned.
     def prepare_southlimit(self, obj):
         """Return resource coverage south limit if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
+        snapshot = get_index_snapshot(obj)
+        if snapshot.metadata is not None:
             # TODO: does not index properly if there are multiple coverages of the same type.
-            for coverage in obj.metadata.coverages.all():
+            for coverage in snapshot.coverages:
                 if coverage.type == 'box':
                     return coverage.value["southlimit"]
         else:
@@ -415,9 +533,10 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     # TODO: If there are multiple coverage objects with the same type, only first is returned.
     def prepare_westlimit(self, obj):
         """Return resource coverage west limit if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
+        snapshot = get_index_snapshot(obj)
+        if snapshot.metadata is not None:
             # TODO: does not index properly if there are multiple coverages of the same type.
-            for coverage in obj.metadata.coverages.all():
+            for coverage in snapshot.coverages:
                 if coverage.type == 'box':
                     return coverage.value["westlimit"]
         else:
@@ -428,8 +547,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     # TODO: If there are multiple coverage objects with the same type, only first is returned.
     def prepare_start_date(self, obj):
         """Return resource coverage start date if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        snapshot = get_index_snapshot(obj)
+        if snapshot.metadata is not None:
+            for coverage in snapshot.coverages:
                 if coverage.type == 'period':
                     clean_date = coverage.value["start"][:10]
                     if "/" in clean_date:
@@ -455,8 +575,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     # TODO: If there are multiple coverage objects with the same type, only first is returned.
     def prepare_end_date(self, obj):
         """Return resource coverage end date if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        snapshot = get_index_snapshot(obj)
+        if snapshot.metadata is not None:
+            for coverage in snapshot.coverages:
                 if coverage.type == 'period' and 'end' in coverage.value:
                     clean_date = coverage.value["end"][:10]
                     if "/" in clean_date:
@@ -510,46 +631,36 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_format(self, obj):
         """Return metadata formats if metadata exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [format.value.strip() for format in obj.metadata.formats.all()]
-        else:
-            return []
+        return [format.value.strip() for format in get_index_snapshot(obj).formats]
 
     def prepare_identifier(self, obj):
         """Return metadata identifiers if metadata exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [identifier.name.strip() for identifier in obj.metadata.identifiers.all()]
-        else:
-            return []
+        return [identifier.name.strip() for identifier in get_index_snapshot(obj).identifiers]
 
     def prepare_language(self, obj):
         """Return resource language if exists, otherwise return None."""
-        if hasattr(obj, 'metadata'):
-            return obj.metadata.language.code.strip()
+        language = get_index_snapshot(obj).language
+        if language is not None:
+            return language.code.strip()
         else:
             return None
 
     def prepare_source(self, obj):
         """Return resource sources if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [source.derived_from.strip() for source in obj.metadata.sources.all()]
-        else:
-            return []
+        return [source.derived_from.strip() for source in get_index_snapshot(obj).sources]
 
     def prepare_relation(self, obj):
         """Return resource relations if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [relation.value.strip() for relation in obj.metadata.relations.all()]
-        else:
-            return []
+        return [relation.value.strip() for relation in get_index_snapshot(obj).relations]
 
     def prepare_resource_type(self, obj):
         """Resource type is verbose_name attribute of obj argument."""
-        return obj.verbose_name
+        return get_index_snapshot(obj).content_model._meta.verbose_name
 
     def prepare_content_type(self, obj):
-        if obj.verbose_name != 'Composite Resource':
-            return [obj.discovery_content_type]
+        content_model = get_index_snapshot(obj).content_model
+        if content_model._meta.verbose_name != 'Composite Resource':
+            return [content_model.discovery_content_type]
         else:
             output = []
             for f in obj.logical_files:
@@ -558,7 +669,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_comment(self, obj):
         """Return list of all comments on resource."""
-        return [comment.comment.strip() for comment in obj.comments.all()]
+        return [comment.comment.strip() for comment in get_index_snapshot(obj).comments]
 
     def prepare_comments_count(self, obj):
         """Return count of resource comments."""
@@ -566,49 +677,35 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_owner_login(self, obj):
         """Return list of usernames that have ownership access to resource."""
-        if hasattr(obj, 'raccess'):
-            return [owner.username for owner in obj.raccess.owners.all()]
-        else:
-            return []
+        return [owner.username for owner in get_index_snapshot(obj).owners]
 
     # TODO: should utilize name from user profile rather than from User field
     def prepare_owner(self, obj):
         """Return list of names of resource owners."""
         names = []
-        if hasattr(obj, 'raccess'):
-            for owner in obj.raccess.owners.all():
-                name = normalize_name(owner.first_name.capitalize() +
-                                      ' ' + owner.last_name.capitalize())
-                names.append(name)
+        for owner in get_index_snapshot(obj).owners:
+            name = normalize_name(owner.first_name.capitalize() +
+                                  ' ' + owner.last_name.capitalize())
+            names.append(name)
         return names
 
     # TODO: should utilize name from user profile rather than from User field
     def prepare_person(self, obj):
         """Return list of normalized names of resource contributors and owners."""
+        snapshot = get_index_snapshot(obj)
         output0 = []
-        output1 = []
-        output2 = []
-        if hasattr(obj, 'raccess'):
-            for owner in obj.raccess.owners.all():
-                name = normalize_name(owner.first_name.capitalize() +
-                                      ' ' + owner.last_name.capitalize())
-                output0.append(name)
-
-        if hasattr(obj, 'metadata'):
-            output1 = [normalize_name(creator.name)
-                       for creator in obj.metadata.creators.all()
-                       .exclude(name__isnull=True).exclude(name='')]
-            output2 = [normalize_name(contributor.name)
-                       for contributor in obj.metadata.contributors.all()
-                       .exclude(name__isnull=True).exclude(name='')]
+        for owner in snapshot.owners:
+            name = normalize_name(owner.first_name.capitalize() +
+                                  ' ' + owner.last_name.capitalize())
+            output0.append(name)
+        output1 = [normalize_name(creator.name) for creator in snapshot.creators if creator.name]
+        output2 = [normalize_name(contributor.name)
+                   for contributor in snapshot.contributors if contributor.name]
         return list(set(output0 + output1 + output2))  # eliminate duplicates
 
     def prepare_owners_count(self, obj):
         """Return count of resource owners if 'raccess' attribute exists, othrerwise return 0."""
-        if hasattr(obj, 'raccess'):
-            return obj.raccess.owners.all().count()
-        else:
-            return 0
+        return len(get_index_snapshot(obj).owners)
 
     # # TODO: We might need these later for social discovery
     # def prepare_viewer_login(self, obj):
@@ -664,7 +761,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                geometry_info = obj.metadata.geometryinformation
+                geometry_info = _first(obj.metadata.geometryinformations.all())
                 if geometry_info is not None:
                     return geometry_info.geometryType
                 else:
@@ -680,7 +777,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = _first(obj.metadata.fieldinformations.all())
                 if field_info is not None and field_info.fieldName is not None:
                     return field_info.fieldName.strip()
                 else:
@@ -696,7 +793,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = _first(obj.metadata.fieldinformations.all())
                 if field_info is not None and field_info.fieldType is not None:
                     return field_info.fieldType.strip()
                 else:
@@ -712,7 +809,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = _first(obj.metadata.fieldinformations.all())
                 if field_info is not None and field_info.fieldTypeCode is not None:
                     return field_info.fieldTypeCode.strip()
                 else:
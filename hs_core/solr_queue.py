@@ -0,0 +1,110 @@
+"""Queue of SOLR updates for HydroQueuedSignalProcessor.
+
+Saving a resource or its access control only records the resource id in SolrQueueEntry. A
+celery task sends the queued resources to SOLR in batches, SOLR_QUEUE_MERGE_WINDOW seconds
+after a resource was first queued, so that all changes made to a resource within that window
+result in one SOLR update. Public and discoverable resources are added to the index, all
+other queued resources (private or deleted ones) are removed from it.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from haystack import connection_router, connections
+from haystack.utils import get_model_ct
+
+from hs_core.models import BaseResource, SolrQueueEntry
+
+logger = logging.getLogger(__name__)
+
+SOLR_QUEUE_MERGE_WINDOW = getattr(settings, 'SOLR_QUEUE_MERGE_WINDOW', 5)  # seconds
+SOLR_QUEUE_BATCH_SIZE = getattr(settings, 'SOLR_QUEUE_BATCH_SIZE', 200)
+# log a warning when the oldest queued update is older than this many seconds
+SOLR_QUEUE_LAG_WARNING = getattr(settings, 'SOLR_QUEUE_LAG_WARNING', 300)
+
+
+def queue_solr_update(resource_id):
+    """Record that the SOLR record of a resource needs to be refreshed.
+
+    Only the first change of a resource schedules the celery task that processes the queue;
+    later changes before that task runs are merged into the same entry.
+    """
+    # avoid import loop
+    from hs_core.tasks import process_solr_queue_task
+
+    time_now = timezone.now()
+    if SolrQueueEntry.objects.filter(resource_id=resource_id).update(updated=time_now):
+        return
+    try:
+        with transaction.atomic():
+            SolrQueueEntry.objects.create(resource_id=resource_id, queued=time_now,
+                                          updated=time_now)
+    except IntegrityError:
+        # queued by a concurrent request in the meantime
+        SolrQueueEntry.objects.filter(resource_id=resource_id).update(updated=time_now)
+        return
+    transaction.on_commit(
+        lambda: process_solr_queue_task.apply_async(countdown=SOLR_QUEUE_MERGE_WINDOW))
+
+
+def solr_queue_lag():
+    """Return the age in seconds of the oldest queued SOLR update, or 0 if nothing is queued."""
+    oldest = SolrQueueEntry.objects.aggregate(oldest=Min('queued'))['oldest']
+    if oldest is None:
+        return 0.0
+    return max((timezone.now() - oldest).total_seconds(), 0.0)
+
+
+def _send_batch(resource_ids):
+    """Add the indexable resources among resource_ids to SOLR and remove all others."""
+    for using in connection_router.for_write():
+        backend = connections[using].get_backend()
+        index = connections[using].get_unified_index().get_index(BaseResource)
+        # index_queryset only contains public and discoverable resources
+        resources = list(index.index_queryset(using=using).filter(pk__in=resource_ids))
+        indexed_ids = set(res.pk for res in resources)
+        removed_ids = [pk for pk in resource_ids if pk not in indexed_ids]
+        for count, pk in enumerate(removed_ids, start=1):
+            # commit once per batch: with the update below, or with the last removal
+            commit = not resources and count == len(removed_ids)
+            backend.remove(u'{}.{}'.format(get_model_ct(BaseResource), pk), commit=commit)
+        if resources:
+            backend.update(index, resources)
+
+
+def process_solr_queue(batch_size=SOLR_QUEUE_BATCH_SIZE):
+    """Send all queued resources to SOLR in batches.
+
+    Entries are removed once their batch has been sent, unless their resource changed again
+    in the meantime, i.e., their updated time is not the one read with the batch; those stay
+    queued for the next run. If SOLR fails, the remaining entries stay queued as well.
+
+    :return: number of resources sent to SOLR
+    """
+    lag = solr_queue_lag()
+    if lag > SOLR_QUEUE_LAG_WARNING:
+        logger.warning("SOLR update queue lag is {:.0f}s".format(lag))
+
+    sent = 0
+    last_pk = 0
+    while True:
+        # entries are read by key, so that each entry is sent at most once per run
+        entries = list(SolrQueueEntry.objects.filter(pk__gt=last_pk)
+                       .order_by('pk')[:batch_size])
+        if not entries:
+            break
+        last_pk = entries[-1].pk
+        resource_ids = [entry.resource_id for entry in entries]
+        _send_batch(resource_ids)
+        sent_entries = Q()
+        for entry in entries:
+            sent_entries |= Q(pk=entry.pk, updated=entry.updated)
+        SolrQueueEntry.objects.filter(sent_entries).delete()
+        sent += len(entries)
+
+    if sent:
+        logger.info("sent {} queued resources to SOLR, queue lag was {:.1f}s".format(sent, lag))
+    return sent
@@ -10,6 +10,7 @@ import logging
 import json
 
 from datetime import datetime, timedelta, date
+from multiprocessing.pool import ThreadPool
 from xml.etree import ElementTree
 
 import requests
@@ -18,18 +19,22 @@ from celery.schedules import crontab
 from celery.task import periodic_task
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import status
 
 from hs_core.hydroshare import utils
-from hs_core.hydroshare.hs_bagit import create_bag_files
-from hs_core.hydroshare.resource import get_activated_doi, get_resource_doi, \
-    get_crossref_url, deposit_res_metadata_with_crossref
+from hs_core.hydroshare.hs_bagit import create_bag_files, create_bag_incrementally, \
+    bag_build_lock
+from hs_core.hydroshare.crossref import get_crossref_client
+from hs_core.hydroshare.resource import get_activated_doi, get_resource_doi
 from django_irods.storage import IrodsStorage
-from theme.models import UserQuota, QuotaMessage, UserProfile, User
+from theme.models import UserQuota, QuotaMessage, UserProfile, User, QuotaUsageDelta
 
 from django_irods.icommands import SessionException
 
-from hs_core.models import BaseResource
+from hs_core.models import BaseResource, Date
 from theme.utils import get_quota_message
 
 # Pass 'django' into getLogger instead of __name__
@@ -38,6 +43,9 @@ from theme.utils import get_quota_message
 # by celery, despite our catch-all handler).
 logger = logging.getLogger('django')
 
+# seconds iRODS quota update micro-services take to reflect file changes in quota usage AVUs
+QUOTA_USAGE_SETTLE_TIME = getattr(settings, 'QUOTA_USAGE_SETTLE_TIME', 60)
+
 
 # Currently there are two different cleanups scheduled.
 # One is 20 minutes after creation, the other is nightly.
@@ -135,72 +143,108 @@ def manage_task_nightly():
     # The nightly running task do DOI activation check
 
     # Check DOI activation on failed and pending resources and send email.
+    msg_lst = reconcile_published_dois()
+
+    if msg_lst:
+        email_msg = '\n'.join(msg_lst)
+        subject = 'Notification of pending DOI deposition/activation of published resources'
+        # send email for people monitoring and follow-up as needed
+        send_mail(subject, email_msg, settings.DEFAULT_FROM_EMAIL, [settings.DEFAULT_SUPPORT_EMAIL])
+
+
+def reconcile_published_dois(client=None, workers=None):
+    """
+    Retry the metadata deposition of published resources whose deposition with CrossRef failed,
+    and activate the DOIs of published resources whose deposition CrossRef has processed.
+
+    The published dates and deposit xml are read from the database up front; the CrossRef
+    requests are then made by a pool of *workers* threads sharing the connections of *client*,
+    and resources are updated in this thread as the results come in.
+
+    :param client: CrossRefClient, a client configured by the CROSSREF_* settings if None
+    :param workers: number of threads making CrossRef requests, settings.CROSSREF_WORKERS if
+        None
+    :return: list of messages for the admins about resources that need follow-up
+    """
+    if client is None:
+        client = get_crossref_client()
+    if workers is None:
+        workers = getattr(settings, 'CROSSREF_WORKERS', 8)
+
+    resources = list(BaseResource.objects.filter(raccess__published=True).filter(
+        Q(doi__contains='failure') | Q(doi__contains='pending')).order_by('id'))
+    # published dates of all resources with one query
+    pub_dates = {}
+    for pub_date in Date.objects.filter(type='published',
+                                        object_id__in=[res.object_id for res in resources]):
+        pub_dates[(pub_date.content_type_id, pub_date.object_id)] = pub_date.start_date
+
     msg_lst = []
-    # retrieve all published resources with failed metadata deposition with CrossRef if any and
-    # retry metadata deposition
-    failed_resources = BaseResource.objects.filter(raccess__published=True, doi__contains='failure')
-    for res in failed_resources:
-        if res.metadata.dates.all().filter(type='published'):
-            pub_date = res.metadata.dates.all().filter(type='published')[0]
-            pub_date = pub_date.start_date.strftime('%m/%d/%Y')
-            act_doi = get_activated_doi(res.doi)
-            response = deposit_res_metadata_with_crossref(res)
-            if response.status_code == status.HTTP_200_OK:
-                # retry of metadata deposition succeeds, change resource flag from failure
-                # to pending
-                res.doi = get_resource_doi(act_doi, 'pending')
-                res.save()
-            else:
-                # retry of metadata deposition failed again, notify admin
-                msg_lst.append("Metadata deposition with CrossRef for the published resource "
-                               "DOI {res_doi} failed again after retry with first metadata "
-                               "deposition requested since {pub_date}.".format(res_doi=act_doi,
-                                                                               pub_date=pub_date))
-                logger.debug(response.content)
-        else:
+    jobs = []
+    # retry of failed depositions is reported before pending activations
+    for res in sorted(resources, key=lambda r: 'failure' not in r.doi):
+        pub_date = pub_dates.get((res.content_type_id, res.object_id), None)
+        if pub_date is None:
             msg_lst.append("{res_id} does not have published date in its metadata.".format(
                 res_id=res.short_id))
+            continue
+        deposit_xml = res.get_crossref_deposit_xml() if 'failure' in res.doi else None
+        jobs.append((res, pub_date.strftime('%m/%d/%Y'), deposit_xml))
+    if not jobs:
+        return msg_lst
+
+    def crossref_request(job):
+        res, _, deposit_xml = job
+        try:
+            if deposit_xml is not None:
+                return client.deposit(res.short_id, deposit_xml), None
+            return client.submission_result(res.short_id), None
+        except requests.RequestException as ex:
+            return None, str(ex)
 
-    pending_resources = BaseResource.objects.filter(raccess__published=True,
-                                                    doi__contains='pending')
-    for res in pending_resources:
-        if res.metadata.dates.all().filter(type='published'):
-            pub_date = res.metadata.dates.all().filter(type='published')[0]
-            pub_date = pub_date.start_date.strftime('%m/%d/%Y')
+    pool = ThreadPool(min(workers, len(jobs)))
+    try:
+        for (res, pub_date, deposit_xml), (response, error) in \
+                zip(jobs, pool.imap(crossref_request, jobs)):
             act_doi = get_activated_doi(res.doi)
-            main_url = get_crossref_url()
-            req_str = '{MAIN_URL}servlet/submissionDownload?usr={USERNAME}&pwd=' \
-                      '{PASSWORD}&doi_batch_id={DOI_BATCH_ID}&type={TYPE}'
-            response = requests.get(req_str.format(MAIN_URL=main_url,
-                                                   USERNAME=settings.CROSSREF_LOGIN_ID,
-                                                   PASSWORD=settings.CROSSREF_LOGIN_PWD,
-                                                   DOI_BATCH_ID=res.short_id,
-                                                   TYPE='result'))
-            root = ElementTree.fromstring(response.content)
-            rec_cnt_elem = root.find('.//record_count')
-            failure_cnt_elem = root.find('.//failure_count')
-            success = False
-            if rec_cnt_elem is not None and failure_cnt_elem is not None:
-                rec_cnt = int(rec_cnt_elem.text)
-                failure_cnt = int(failure_cnt_elem.text)
-                if rec_cnt > 0 and failure_cnt == 0:
-                    res.doi = act_doi
+            if deposit_xml is not None:
+                if response is not None and response.status_code == status.HTTP_200_OK:
+                    # retry of metadata deposition succeeds, change resource flag from failure
+                    # to pending
+                    res.doi = get_resource_doi(act_doi, 'pending')
                     res.save()
-                    success = True
-            if not success:
-                msg_lst.append("Published resource DOI {res_doi} is not yet activated with request "
-                               "data deposited since {pub_date}.".format(res_doi=act_doi,
-                                                                         pub_date=pub_date))
-                logger.debug(response.content)
-        else:
-            msg_lst.append("{res_id} does not have published date in its metadata.".format(
-                res_id=res.short_id))
+                else:
+                    # retry of metadata deposition failed again, notify admin
+                    msg_lst.append("Metadata deposition with CrossRef for the published "
+                                   "resource DOI {res_doi} failed again after retry with first "
+                                   "metadata deposition requested since {pub_date}.".format(
+                                       res_doi=act_doi, pub_date=pub_date))
+                    logger.debug(response.content if response is not None else error)
+            elif response is not None and _crossref_deposit_succeeded(response):
+                res.doi = act_doi
+                res.save()
+            else:
+                msg_lst.append("Published resource DOI {res_doi} is not yet activated with "
+                               "request data deposited since {pub_date}.".format(
+                                   res_doi=act_doi, pub_date=pub_date))
+                logger.debug(response.content if response is not None else error)
+    finally:
+        pool.close()
+        pool.join()
+    return msg_lst
 
-    if msg_lst:
-        email_msg = '\n'.join(msg_lst)
-        subject = 'Notification of pending DOI deposition/activation of published resources'
-        # send email for people monitoring and follow-up as needed
-        send_mail(subject, email_msg, settings.DEFAULT_FROM_EMAIL, [settings.DEFAULT_SUPPORT_EMAIL])
+
+def _crossref_deposit_succeeded(response):
+    """Return True if a CrossRef submission result reports records and no failures."""
+    try:
+        root = ElementTree.fromstring(response.content)
+    except ElementTree.ParseError:
+        return False
+    rec_cnt_elem = root.find('.//record_count')
+    failure_cnt_elem = root.find('.//failure_count')
+    if rec_cnt_elem is not None and failure_cnt_elem is not None:
+        return int(rec_cnt_elem.text) > 0 and int(failure_cnt_elem.text) == 0
+    return False
 
 
 @periodic_task(ignore_result=True, run_every=crontab(minute=15, hour=0, day_of_week=1,
@@ -445,27 +489,41 @@ def create_bag_by_irods(resource_id):
                                      'docs/bagit/readme.txt')
             istorage.saveFile(from_file_name, bagit_readme_file, True)
 
-        # call iRODS bagit rule here
-        bagit_rule_file = getattr(settings, 'IRODS_BAGIT_RULE',
-                                  'hydroshare/irods/ruleGenerateBagIt_HS.r')
+        # one bag build at a time per resource, so that concurrent tasks never patch or zip
+        # the same bag zip; this also covers the full rebuild after an incremental one failed
+        with bag_build_lock(res):
+            if getattr(settings, 'IRODS_INCREMENTAL_BAGGING', False):
+                try:
+                    # only changed payload files are checksummed and, if possible, patched into
+                    # the existing zip; interrupted builds resume on the next call
+                    create_bag_incrementally(res, istorage, irods_bagit_input_path, bag_full_name)
+                    istorage.setAVU(irods_bagit_input_path, 'bag_modified', "false")
+                    return True
+                except SessionException as ex:
+                    logger.error("incremental bag creation failed for {}, rebuilding the full bag: "
+                                 "{}".format(resource_id, ex.stderr))
+
+            # call iRODS bagit rule here
+            bagit_rule_file = getattr(settings, 'IRODS_BAGIT_RULE',
+                                      'hydroshare/irods/ruleGenerateBagIt_HS.r')
 
-        try:
-            # call iRODS run and ibun command to create and zip the bag, ignore SessionException
-            # for now as a workaround which could be raised from potential race conditions when
-            # multiple ibun commands try to create the same zip file or the very same resource
-            # gets deleted by another request when being downloaded
-            istorage.runBagitRule(bagit_rule_file, bagit_input_path, bagit_input_resource)
-            istorage.zipup(irods_bagit_input_path, bag_full_name)
-            istorage.setAVU(irods_bagit_input_path, 'bag_modified', "false")
-            return True
-        except SessionException as ex:
-            # if an exception occurs, delete incomplete files potentially being generated by
-            # iRODS bagit rule and zipping operations
-            for fname in bagit_files:
-                if istorage.exists(fname):
-                    istorage.delete(fname)
-            logger.error(ex.stderr)
-            return False
+            try:
+                # call iRODS run and ibun command to create and zip the bag, ignore SessionException
+                # for now as a workaround which could be raised from potential race conditions when
+                # multiple ibun commands try to create the same zip file or the very same resource
+                # gets deleted by another request when being downloaded
+                istorage.runBagitRule(bagit_rule_file, bagit_input_path, bagit_input_resource)
+                istorage.zipup(irods_bagit_input_path, bag_full_name)
+                istorage.setAVU(irods_bagit_input_path, 'bag_modified', "false")
+                return True
+            except SessionException as ex:
+                # if an exception occurs, delete incomplete files potentially being generated by
+                # iRODS bagit rule and zipping operations
+                for fname in bagit_files:
+                    if istorage.exists(fname):
+                        istorage.delete(fname)
+                logger.error(ex.stderr)
+                return False
     else:
         logger.error('Resource does not exist.')
         return False
@@ -480,12 +538,16 @@ def update_quota_usage_task(username):
     iRODS data zone and user zone independently, so the aggregation of usage in both zones need
     to be accounted for in this function to update Django DB as an aggregated usage for hydroshare
     internal zone.
+    Usage changes recorded in the quota ledger (QuotaUsageDelta) more than
+    QUOTA_USAGE_SETTLE_TIME seconds ago are included in the usage read from iRODS and are
+    removed from the ledger.
     :param
     username: the name of the user that needs to update quota usage for.
     :return: True if quota usage update succeeds;
              False if there is an exception raised or quota cannot be updated. See log for details.
     """
     hs_internal_zone = "hydroshare"
+    settled = timezone.now() - timedelta(seconds=QUOTA_USAGE_SETTLE_TIME)
     uq = UserQuota.objects.filter(user__username=username, zone=hs_internal_zone).first()
     if uq is None:
         # the quota row does not exist in Django
@@ -537,11 +599,24 @@ def update_quota_usage_task(username):
     else:
         used_val = uqDataZoneSize + uqUserZoneSize
 
-    uq.update_used_value(used_val)
+    with transaction.atomic():
+        uq.update_used_value(used_val)
+        QuotaUsageDelta.objects.filter(user=uq.user, zone=hs_internal_zone,
+                                       timestamp__lte=settled).delete()
 
     return True
 
 
+@periodic_task(ignore_result=True, run_every=crontab(minute='*/15'))
+def reconcile_quota_usage():
+    """Read quota usage from iRODS for the users with usage changes in the quota ledger."""
+    settled = timezone.now() - timedelta(seconds=QUOTA_USAGE_SETTLE_TIME)
+    usernames = QuotaUsageDelta.objects.filter(timestamp__lte=settled) \
+        .values_list('user__username', flat=True).distinct()
+    for username in usernames:
+        update_quota_usage_task(username)
+
+
 @shared_task
 def update_web_services(services_url, api_token, timeout, publish_urls, res_id):
     """Update web services hosted by GeoServer and HydroServer.
@@ -591,3 +666,20 @@ def update_web_services(services_url, api_token, timeout, publish_urls, res_id):
     except (requests.exceptions.RequestException, ValueError) as e:
         logger.error(e)
         return e
+
+
+@shared_task
+def process_solr_queue_task():
+    """Send the resources queued by HydroQueuedSignalProcessor to SOLR."""
+    from hs_core.solr_queue import process_solr_queue
+    return process_solr_queue()
+
+
+# the queue is only written by HydroQueuedSignalProcessor, so it is only polled when that
+# signal processor is in use
+if getattr(settings, 'HAYSTACK_SIGNAL_PROCESSOR', '').endswith('.HydroQueuedSignalProcessor'):
+    @periodic_task(ignore_result=True, run_every=crontab(minute='*'))
+    def process_solr_queue_periodically():
+        """Pick up queued SOLR updates whose task was lost or that were left behind by a failure."""
+        from hs_core.solr_queue import process_solr_queue
+        process_solr_queue()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+
+from django.test import SimpleTestCase
+from mock import Mock
+
+from hs_core.hydroshare.hs_bagit import HsBagitException, patch_bag_zip
+
+
+class TestPatchBagZip(SimpleTestCase):
+    def setUp(self):
+        super(TestPatchBagZip, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.zip_path = os.path.join(self.temp_dir, 'abc.zip')
+        with zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('abc/bagit.txt', 'BagIt-Version: 0.96\n')
+            zf.writestr('abc/manifest-md5.txt', 'old manifest\n' * 100)
+            zf.writestr('abc/data/contents/kept.txt', 'kept')
+            zf.writestr('abc/data/contents/changed.txt', 'old content')
+            zf.writestr('abc/data/contents/removed.txt', 'removed ' * 1000)
+
+        @contextmanager
+        def open_local(path, mode):
+            with open(self.zip_path, mode + 'b') as f:
+                yield f
+
+        self.istorage = Mock()
+        self.istorage.native.open = open_local
+
+    def tearDown(self):
+        super(TestPatchBagZip, self).tearDown()
+        shutil.rmtree(self.temp_dir)
+
+    def _local_file(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_patch_replaces_and_removes_members(self):
+        updates = {'data/contents/changed.txt': self._local_file('changed.txt', 'new content'),
+                   'manifest-md5.txt': self._local_file('manifest-md5.txt', 'new manifest\n')}
+        keep = {'bagit.txt', 'manifest-md5.txt', 'data/contents/kept.txt',
+                'data/contents/changed.txt'}
+        self.assertTrue(patch_bag_zip(self.istorage, 'bags/abc.zip', 'abc', updates, keep))
+
+        with zipfile.ZipFile(self.zip_path) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(sorted(zf.namelist()),
+                             ['abc/bagit.txt', 'abc/data/contents/changed.txt',
+                              'abc/data/contents/kept.txt', 'abc/manifest-md5.txt'])
+            self.assertEqual(zf.read('abc/data/contents/changed.txt'), 'new content')
+            self.assertEqual(zf.read('abc/manifest-md5.txt'), 'new manifest\n')
+            self.assertEqual(zf.read('abc/data/contents/kept.txt'), 'kept')
+
+    def test_patch_that_shrinks_the_zip(self):
+        with zipfile.ZipFile(self.zip_path, 'a', zipfile.ZIP_DEFLATED) as zf:
+            for i in range(200):
+                zf.writestr('abc/data/contents/removed_{}.txt'.format(i), 'x')
+        size = os.path.getsize(self.zip_path)
+        self.assertTrue(patch_bag_zip(self.istorage, 'bags/abc.zip', 'abc', {}, {'bagit.txt'}))
+        self.assertEqual(os.path.getsize(self.zip_path), size)
+        with zipfile.ZipFile(self.zip_path) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), ['abc/bagit.txt'])
+
+    def test_zip_is_untouched_if_it_cannot_be_patched(self):
+        with zipfile.ZipFile(self.zip_path, 'a', zipfile.ZIP_DEFLATED) as zf:
+            for i in range(3000):
+                zf.writestr('abc/data/contents/removed_file_{}.txt'.format(i), 'x')
+        with open(self.zip_path, 'rb') as f:
+            original = f.read()
+        updates = {'data/contents/changed.txt': self._local_file('changed.txt', 'new content')}
+        with self.assertRaises(HsBagitException):
+            patch_bag_zip(self.istorage, 'bags/abc.zip', 'abc', updates,
+                          {'bagit.txt', 'data/contents/changed.txt'})
+        with open(self.zip_path, 'rb') as f:
+            self.assertEqual(f.read(), original)
+
+    def test_zip_of_another_layout_is_not_patched(self):
+        self.assertFalse(patch_bag_zip(self.istorage, 'bags/abc.zip', 'xyz', {}, set()))
+        with zipfile.ZipFile(self.zip_path) as zf:
+            self.assertEqual(len(zf.namelist()), 5)
+
+    def test_no_native_backend(self):
+        self.istorage.native = None
+        self.assertFalse(patch_bag_zip(self.istorage, 'bags/abc.zip', 'abc', {}, set()))
@@ -1,3 +1,4 @@
+import json
 import os
 
 from django.test import TransactionTestCase
@@ -6,6 +7,7 @@ from django.core.exceptions import ValidationError
 
 from hs_core import hydroshare
 from hs_core.testing import MockIRODSTestCaseMixin, TestCaseCommonUtilities
+from hs_core.management.audit import audit_resource, read_audit
 from hs_core.management.utils import check_irods_files
 
 from hs_core.models import ResourceFile
@@ -187,3 +189,31 @@ class TestResourceFileAPI(MockIRODSTestCaseMixin,
 
         # delete resources to clean up
         hydroshare.delete_resource(self.res.short_id)
+
+    def test_audit(self):
+        """ the audit reports the same differences as check_irods_files """
+        hydroshare.add_resource_files(self.res.short_id, self.test_file_1, folder='foo')
+        result = audit_resource(self.res.short_id)
+        self.assertEqual(result['errors'], [])
+
+        resfile = self.res.files.all()[0]
+        resfile.set_short_path("fuzz.txt")
+        result = audit_resource(self.res.short_id)
+        self.assertEqual(result['resource_type'], 'GenericResource')
+        self.assertEqual(result['errors'],
+                         [{'type': 'missing_in_irods', 'path': 'data/contents/fuzz.txt'},
+                          {'type': 'missing_in_django',
+                           'path': 'data/contents/foo/file1.txt'}])
+
+        # an interrupted run leaves an incomplete last line, which is not a result
+        audit_path = self.res.short_id + '_audit.json'
+        with open(audit_path, 'w') as audit_file:
+            audit_file.write(json.dumps(result) + '\n')
+            audit_file.write('{"resource_id": "trunc')
+        try:
+            self.assertEqual(read_audit(audit_path), {self.res.short_id: result})
+        finally:
+            os.remove(audit_path)
+
+        # delete resources to clean up
+        hydroshare.delete_resource(self.res.short_id)
@@ -0,0 +1,63 @@
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import TestCase
+
+from hs_core import hydroshare
+from hs_core.hydroshare.users import get_resource_list
+from hs_core.models import Coverage
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestCoverageSearch(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestCoverageSearch, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.box_res = hydroshare.create_resource('GenericResource', self.user, 'Box Resource')
+        self.box_res.metadata.create_element('coverage', type='box',
+                                             value={'northlimit': 42, 'eastlimit': -110,
+                                                    'southlimit': 40, 'westlimit': -112,
+                                                    'units': 'Decimal degrees'})
+        self.point_res = hydroshare.create_resource('GenericResource', self.user,
+                                                    'Point Resource')
+        self.point_res.metadata.create_element('coverage', type='point',
+                                               value={'east': -80, 'north': 35,
+                                                      'units': 'Decimal degrees'})
+
+    def search(self, north, south, east, west):
+        return set(res.short_id for res in
+                   get_resource_list(type=['GenericResource'], coverage_type='box',
+                                     north=north, south=south, east=east, west=west))
+
+    def test_geometry_is_maintained(self):
+        cov = self.box_res.metadata.coverages.get(type='box')
+        self.assertEqual(cov.geometry.extent, (-112, 40, -110, 42))
+        self.box_res.metadata.update_element('coverage', cov.id, type='box',
+                                             value={'northlimit': 10, 'eastlimit': 12,
+                                                    'southlimit': 8, 'westlimit': 10,
+                                                    'units': 'Decimal degrees'})
+        cov = Coverage.objects.get(id=cov.id)
+        self.assertEqual(cov.geometry.extent, (10, 8, 12, 10))
+
+    def test_box_and_point_search(self):
+        self.assertEqual(self.search(north=41, south=39, east=-109, west=-111),
+                         {self.box_res.short_id})
+        self.assertEqual(self.search(north=36, south=34, east=-79, west=-81),
+                         {self.point_res.short_id})
+        self.assertEqual(self.search(north=50, south=30, east=-70, west=-120),
+                         {self.box_res.short_id, self.point_res.short_id})
+        self.assertEqual(self.search(north=-10, south=-20, east=10, west=0), set())
+
+    def test_backfill(self):
+        Coverage.objects.update(geometry=None)
+        self.assertEqual(self.search(north=50, south=30, east=-70, west=-120), set())
+        call_command('index_coverage_geometry')
+        self.assertEqual(self.search(north=50, south=30, east=-70, west=-120),
+                         {self.box_res.short_id, self.point_res.short_id})
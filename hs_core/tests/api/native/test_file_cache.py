@@ -0,0 +1,81 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.test import TransactionTestCase, override_settings
+
+from hs_core import hydroshare
+from hs_core.hydroshare.file_cache import get_file_cache
+from hs_core.hydroshare.utils import get_file_from_irods
+from hs_core.testing import MockIRODSTestCaseMixin, TestCaseCommonUtilities
+
+CACHE_DIR = os.path.join(settings.TEMP_FILE_DIR, 'test_irods_file_cache')
+
+
+@override_settings(IRODS_FILE_CACHE_DIR=CACHE_DIR, IRODS_FILE_CACHE_SIZE=1024)
+class TestFileCache(MockIRODSTestCaseMixin, TestCaseCommonUtilities, TransactionTestCase):
+    def setUp(self):
+        super(TestFileCache, self).setUp()
+        self.hydroshare_author_group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.res = hydroshare.create_resource(
+            'CompositeResource',
+            self.user,
+            'My Test Resource'
+        )
+        self.test_file_name = 'file1.txt'
+        with open(self.test_file_name, 'w') as test_file:
+            test_file.write("Test text file in file1.txt")
+        self.test_file = open(self.test_file_name, 'r')
+        self.copies = []
+
+    def tearDown(self):
+        super(TestFileCache, self).tearDown()
+        self.test_file.close()
+        os.remove(self.test_file.name)
+        for copy in self.copies:
+            shutil.rmtree(os.path.dirname(copy))
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        hydroshare.delete_resource(self.res.short_id)
+
+    def get_copy(self, res_file):
+        copy = get_file_from_irods(res_file)
+        self.copies.append(copy)
+        with open(copy) as copied_file:
+            return copied_file.read()
+
+    def test_unchanged_file_is_read_from_cache(self):
+        hydroshare.add_resource_files(self.res.short_id, self.test_file)
+        res_file = self.res.files.first()
+        file_cache = get_file_cache()
+        hits, misses = file_cache.hits, file_cache.misses
+
+        self.assertEqual(self.get_copy(res_file), "Test text file in file1.txt")
+        self.assertEqual((file_cache.hits, file_cache.misses), (hits, misses + 1))
+        self.assertEqual(file_cache.stats()['files'], 1)
+
+        # callers get a copy of their own, which they may change
+        with open(self.copies[0], 'w') as copied_file:
+            copied_file.write("changed by the caller")
+        self.assertEqual(self.get_copy(res_file), "Test text file in file1.txt")
+        self.assertEqual((file_cache.hits, file_cache.misses), (hits + 1, misses + 1))
+
+    def test_cache_size_is_bounded(self):
+        file_cache = get_file_cache()
+        for i in range(3):
+            path = os.path.join(CACHE_DIR, 'cached_{}'.format(i))
+            with open(path, 'w') as cached_file:
+                cached_file.write('x' * 400)
+            os.utime(path, (i, i))
+        file_cache._evict()
+        # the least recently used file is evicted first
+        self.assertEqual(sorted(os.listdir(CACHE_DIR)), ['cached_1', 'cached_2'])
+        self.assertEqual(file_cache.stats()['size'], 800)
@@ -0,0 +1,80 @@
+import os
+
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth.models import Group
+
+from hs_core import hydroshare
+from hs_core.hydroshare.folder_listing import get_folder_listing
+from hs_core.testing import MockIRODSTestCaseMixin, TestCaseCommonUtilities
+from hs_core.views.utils import create_folder, move_or_rename_file_or_folder
+
+
+@override_settings(FOLDER_LISTING_CACHE_TIMEOUT=600)
+class TestFolderListing(MockIRODSTestCaseMixin, TestCaseCommonUtilities, TransactionTestCase):
+    def setUp(self):
+        super(TestFolderListing, self).setUp()
+        self.hydroshare_author_group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.res = hydroshare.create_resource(
+            'CompositeResource',
+            self.user,
+            'My Test Resource'
+        )
+        self.test_file_name = 'file1.txt'
+        with open(self.test_file_name, 'w') as test_file:
+            test_file.write("Test text file in file1.txt")
+        self.test_file = open(self.test_file_name, 'r')
+
+    def tearDown(self):
+        super(TestFolderListing, self).tearDown()
+        self.test_file.close()
+        os.remove(self.test_file.name)
+        hydroshare.delete_resource(self.res.short_id)
+
+    def test_listing_is_invalidated_by_file_operations(self):
+        listing = get_folder_listing(self.res, 'data/contents')
+        self.assertEqual(listing['files'], [])
+        self.assertEqual(listing['folders'], [])
+
+        # adding a file must refresh the cached listing
+        hydroshare.add_resource_files(self.res.short_id, self.test_file)
+        listing = get_folder_listing(self.res, 'data/contents')
+        self.assertEqual([f['name'] for f in listing['files']], [self.test_file_name])
+        res_file = self.res.files.first()
+        self.assertEqual(listing['files'][0]['pk'], res_file.pk)
+        self.assertEqual(listing['files'][0]['logical_type'], 'GenericLogicalFile')
+
+        # creating a folder must refresh the cached listing
+        create_folder(self.res.short_id, 'data/contents/sub')
+        listing = get_folder_listing(self.res, 'data/contents')
+        self.assertEqual([d['name'] for d in listing['folders']], ['sub'])
+        self.assertEqual(listing['folders'][0]['folder_short_path'], 'sub')
+
+        # moving the file must refresh the listings of both folders
+        move_or_rename_file_or_folder(self.user, self.res.short_id,
+                                      'data/contents/' + self.test_file_name,
+                                      'data/contents/sub/' + self.test_file_name)
+        self.assertEqual(get_folder_listing(self.res, 'data/contents')['files'], [])
+        listing = get_folder_listing(self.res, 'data/contents/sub')
+        self.assertEqual([f['name'] for f in listing['files']], [self.test_file_name])
+
+        # deleting the file must refresh the cached listing
+        hydroshare.delete_resource_file(self.res.short_id, res_file.id, self.user)
+        self.assertEqual(get_folder_listing(self.res, 'data/contents/sub')['files'], [])
+
+    def test_listing_is_invalidated_by_aggregation_removal(self):
+        hydroshare.add_resource_files(self.res.short_id, self.test_file)
+        listing = get_folder_listing(self.res, 'data/contents')
+        self.assertEqual(listing['files'][0]['logical_type'], 'GenericLogicalFile')
+
+        # removing the aggregation of the file must refresh the cached listing
+        self.res.files.first().logical_file.remove_aggregation()
+        listing = get_folder_listing(self.res, 'data/contents')
+        self.assertEqual(listing['files'][0]['logical_type'], '')
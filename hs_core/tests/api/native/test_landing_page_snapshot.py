@@ -0,0 +1,61 @@
+from django.contrib.auth.models import Group, AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+from mock import patch
+
+from hs_core import hydroshare
+from hs_core.models import BaseResource
+from hs_core.page_processors import get_landing_page_snapshot
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestLandingPageSnapshot(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestLandingPageSnapshot, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.res = hydroshare.create_resource(
+            'GenericResource',
+            self.user,
+            'Test Resource'
+        )
+        self.res.raccess.public = True
+        self.res.raccess.discoverable = True
+        self.res.raccess.save()
+        cache.clear()
+
+    def anonymous_request(self):
+        request = RequestFactory().get('/resource/{}/'.format(self.res.short_id))
+        request.user = AnonymousUser()
+        return request
+
+    def test_anonymous_snapshot_is_cached(self):
+        readme = {'content': 'readme', 'file_name': 'readme.txt'}
+        with patch.object(BaseResource, 'get_readme_file_content',
+                          return_value=readme) as get_readme, \
+                patch.object(BaseResource, 'get_quota_holder') as get_quota_holder:
+            request = self.anonymous_request()
+            snapshot = get_landing_page_snapshot(self.res, request.user, request=request)
+            self.assertEqual(snapshot.readme, readme)
+            self.assertTrue(snapshot.show_content_files)
+            self.assertFalse(snapshot.resource_is_mine)
+            self.assertIsNone(snapshot.quota_holder)
+            # the snapshot is computed once per request
+            self.assertIs(get_landing_page_snapshot(self.res, request.user, request=request),
+                          snapshot)
+
+            # the rendered readme is shared by requests until the resource is modified
+            request = self.anonymous_request()
+            get_landing_page_snapshot(self.res, request.user, request=request)
+            self.assertEqual(get_readme.call_count, 1)
+            self.res.save()
+            get_landing_page_snapshot(self.res, request.user, request=self.anonymous_request())
+            self.assertEqual(get_readme.call_count, 2)
+            self.assertEqual(get_quota_holder.call_count, 0)
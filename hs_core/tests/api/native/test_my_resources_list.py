@@ -0,0 +1,71 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from hs_access_control.models import PrivilegeCodes
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+from hs_core.views.utils import get_my_resources_list, get_my_resources_page
+
+
+class TestMyResourcesList(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestMyResourcesList, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.other_user = hydroshare.create_account(
+            'other@usu.edu',
+            username='other',
+            first_name='Other_FirstName',
+            last_name='Other_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.owned_res = hydroshare.create_resource('CompositeResource', self.user,
+                                                    'Owned Resource')
+        self.shared_res = hydroshare.create_resource('CompositeResource', self.other_user,
+                                                     'Shared Resource')
+        self.other_user.uaccess.share_resource_with_user(self.shared_res, self.user,
+                                                         PrivilegeCodes.CHANGE)
+        self.discovered_res = hydroshare.create_resource('CompositeResource', self.other_user,
+                                                         'Discovered Resource')
+        self.discovered_res.raccess.public = True
+        self.discovered_res.raccess.save()
+        self.user.ulabels.claim_resource(self.discovered_res)
+        self.user.ulabels.favorite_resource(self.owned_res)
+        self.user.ulabels.label_resource(self.shared_res, 'label')
+        # not listed
+        hydroshare.create_resource('CompositeResource', self.other_user, 'Other Resource')
+
+    def test_flags(self):
+        flags = {res.short_id: (bool(res.owned), bool(res.editable), bool(res.viewable),
+                                bool(res.discovered), bool(res.is_favorite),
+                                bool(res.has_labels))
+                 for res in get_my_resources_list(self.user)}
+        self.assertEqual(flags, {
+            self.owned_res.short_id: (True, False, False, False, True, False),
+            self.shared_res.short_id: (False, True, False, False, False, True),
+            self.discovered_res.short_id: (False, False, False, True, False, False)})
+
+    def test_keyset_pages(self):
+        pages = []
+        after = None
+        while True:
+            resources, after = get_my_resources_page(self.user, after=after, page_size=2)
+            pages.append([res.short_id for res in resources])
+            if after is None:
+                break
+        self.assertEqual(pages, [[self.discovered_res.short_id, self.shared_res.short_id],
+                                 [self.owned_res.short_id]])
+        # metadata shown in the listing is prefetched
+        resources, _ = get_my_resources_page(self.user, page_size=3)
+        with self.assertNumQueries(0):
+            for res in resources:
+                list(res.metadata.creators.all())
+                list(res.metadata.subjects.all())
@@ -1,13 +1,47 @@
 
 import unittest
 
+import requests
 from django.contrib.auth.models import Group
 from django.test import TestCase
+from django.utils import timezone
 
 from hs_core import hydroshare
+from hs_core.hydroshare.crossref import CrossRefClient
+from hs_core.hydroshare.resource import get_resource_doi
+from hs_core.tasks import reconcile_published_dois
 from hs_core.testing import MockIRODSTestCaseMixin
 
 
+class CrossRefStandIn(object):
+    """Transport standing in for CrossRef; fails the first request of each resource."""
+
+    RESULT = '<doi_batch_diagnostic><batch_data><record_count>{}</record_count>' \
+             '<failure_count>0</failure_count></batch_data></doi_batch_diagnostic>'
+
+    def __init__(self, processed):
+        self.processed = processed
+        self.requests = []
+
+    def _respond(self, batch_id, status_code, content=''):
+        self.requests.append(batch_id)
+        if self.requests.count(batch_id) == 1:
+            raise requests.ConnectionError("connection reset")
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = content
+        return response
+
+    def get(self, url, params=None, timeout=None):
+        batch_id = params['doi_batch_id']
+        records = 1 if batch_id in self.processed else 0
+        return self._respond(batch_id, 200, self.RESULT.format(records))
+
+    def post(self, url, data=None, files=None, timeout=None):
+        batch_id = files['file'][0].split('_')[0]
+        return self._respond(batch_id, 200)
+
+
 class TestPublishResource(MockIRODSTestCaseMixin, TestCase):
     def setUp(self):
         super(TestPublishResource, self).setUp()
@@ -76,3 +110,53 @@ class TestPublishResource(MockIRODSTestCaseMixin, TestCase):
 
         # there should now published date type metadata element
         self.assertTrue(self.pub_res.metadata.dates.filter(type='published').exists())
+
+
+class TestReconcilePublishedDois(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestReconcilePublishedDois, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.failed = self.create_published_resource('Failed Resource', 'failure')
+        self.activated = self.create_published_resource('Activated Resource', 'pending')
+        self.pending = self.create_published_resource('Pending Resource', 'pending')
+        self.undated = self.create_published_resource('Undated Resource', 'pending',
+                                                      published_date=False)
+
+    def create_published_resource(self, title, flag, published_date=True):
+        res = hydroshare.create_resource('GenericResource', self.user, title)
+        res.raccess.published = True
+        res.raccess.save()
+        res.doi = get_resource_doi(res.short_id, flag)
+        res.save()
+        if published_date:
+            res.metadata.create_element('date', type='published', start_date=timezone.now())
+        return res
+
+    def test_reconcile_published_dois(self):
+        transport = CrossRefStandIn(processed=[self.activated.short_id])
+        client = CrossRefClient(transport=transport, main_url='http://crossref.local/',
+                                backoff=0)
+        msg_lst = reconcile_published_dois(client=client, workers=3)
+
+        # every request was retried once after the stand-in dropped the connection
+        self.assertEqual(sorted(transport.requests),
+                         sorted([self.failed.short_id, self.activated.short_id,
+                                 self.pending.short_id] * 2))
+        self.failed.refresh_from_db()
+        self.assertIn('pending', self.failed.doi)
+        self.activated.refresh_from_db()
+        self.assertEqual(self.activated.doi, get_resource_doi(self.activated.short_id))
+        self.pending.refresh_from_db()
+        self.assertIn('pending', self.pending.doi)
+
+        self.assertEqual(len(msg_lst), 2)
+        self.assertIn(self.undated.short_id, msg_lst[0])
+        self.assertIn(self.pending.short_id, msg_lst[1])
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+
+from hs_core import hydroshare
+from hs_core.hydroshare.resource import add_resource_files, delete_resource_file, \
+    record_quota_usage
+from hs_core.hydroshare.utils import QuotaException, validate_user_quota
+from hs_core.tasks import update_quota_usage_task
+from hs_core.testing import MockIRODSTestCaseMixin
+from theme.models import QuotaMessage, QuotaUsageDelta
+
+
+class TestQuotaLedger(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestQuotaLedger, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.res = hydroshare.create_resource('CompositeResource', self.user, 'Test Resource')
+        QuotaUsageDelta.objects.all().delete()
+        self.uquota = self.user.quotas.first()
+        self.uquota.unit = 'KB'
+        self.uquota.allocated_value = 10
+        self.uquota.used_value = 0
+        self.uquota.save()
+
+    def test_file_changes_are_recorded(self):
+        content = 'x' * 2048
+        add_resource_files(self.res.short_id, SimpleUploadedFile('test.txt', content))
+        self.assertEqual(self.uquota.pending_usage, 2048)
+        self.assertEqual(self.uquota.current_used_value, 2)
+        self.assertEqual(self.uquota.used_percent, 20)
+
+        # the pending usage is read once per instance
+        record_quota_usage(1024, user=self.user)
+        self.assertEqual(self.uquota.pending_usage, 2048)
+
+        delete_resource_file(self.res.short_id, 'test.txt', self.user)
+        self.uquota.refresh_from_db()
+        self.assertEqual(self.uquota.pending_usage, 1024)
+        self.assertEqual(QuotaUsageDelta.objects.filter(user=self.user).count(), 3)
+
+    def test_quota_is_validated_against_ledger(self):
+        if not QuotaMessage.objects.exists():
+            QuotaMessage.objects.create()
+        qmsg = QuotaMessage.objects.first()
+        qmsg.enforce_quota = True
+        qmsg.save()
+
+        validate_user_quota(self.user, 1024)
+        # usage recorded in the ledger counts before iRODS reports it
+        record_quota_usage(13 * 1024, user=self.user)
+        with self.assertRaises(QuotaException):
+            validate_user_quota(self.user, 1024)
+
+    @patch('hs_core.tasks.IrodsStorage')
+    def test_reconciliation_removes_settled_changes(self, irods_storage):
+        record_quota_usage(1024, user=self.user)
+        QuotaUsageDelta.objects.update(timestamp=timezone.now() - timedelta(hours=1))
+        record_quota_usage(2048, user=self.user)
+        # iRODS reports the settled change only
+        irods_storage.return_value.getAVU.side_effect = ['1024', None]
+
+        self.assertTrue(update_quota_usage_task(self.user.username))
+        self.uquota.refresh_from_db()
+        self.assertEqual(self.uquota.used_value, 1)
+        self.assertEqual(self.uquota.pending_usage, 2048)
+        self.assertEqual(self.uquota.current_used_value, 3)
@@ -0,0 +1,95 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+
+from hs_core import hydroshare
+from hs_core.counters import flush_counters, get_flusher
+from hs_core.models import BaseResource
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestResourceCounters(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestResourceCounters, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.res = hydroshare.create_resource(
+            'GenericResource',
+            self.user,
+            'Test Resource'
+        )
+        cache.clear()
+        self.saved = []
+        post_save.connect(self.on_save)
+
+    def tearDown(self):
+        post_save.disconnect(self.on_save)
+        flusher = get_flusher()
+        if flusher._timer is not None:
+            flusher._timer.cancel()
+            flusher._timer = None
+        super(TestResourceCounters, self).tearDown()
+
+    def on_save(self, sender, instance, **kwargs):
+        self.saved.append(instance)
+
+    def stored_counts(self):
+        return BaseResource.objects.filter(pk=self.res.pk) \
+            .values_list('view_count', 'download_count')[0]
+
+    def test_counters_do_not_save_resource(self):
+        self.res.update_view_count(None)
+        self.res.update_download_count()
+        self.res.update_download_count()
+        self.assertEqual(self.saved, [])
+        self.assertEqual(self.stored_counts(), (1, 2))
+        self.assertEqual((self.res.get_view_count(), self.res.get_download_count()), (1, 2))
+
+    def test_save_keeps_concurrent_increments(self):
+        # another request increments the counters of its own instance of the resource
+        other = BaseResource.objects.get(pk=self.res.pk)
+        other.update_view_count(None)
+        other.update_download_count()
+        # a full save of the stale instance does not write its counters back
+        self.res.title = 'Changed Title'
+        self.res.save()
+        self.assertEqual(self.stored_counts(), (1, 1))
+        self.assertEqual(BaseResource.objects.get(pk=self.res.pk).title, 'Changed Title')
+
+        # counters named in update_fields are still written
+        self.res.refresh_from_db()
+        self.res.view_count = 0
+        self.res.save(update_fields=['view_count'])
+        self.assertEqual(self.stored_counts(), (0, 1))
+
+    @override_settings(RESOURCE_COUNTER_BUFFER_ENABLED=True,
+                       RESOURCE_COUNTER_FLUSH_INTERVAL=3600)
+    def test_buffered_counters(self):
+        for _ in range(3):
+            self.res.update_view_count(None)
+        self.res.update_download_count()
+        self.assertEqual(self.saved, [])
+        # buffered increments are read, but not yet written
+        self.assertEqual(self.stored_counts(), (0, 0))
+        self.assertEqual((self.res.get_view_count(), self.res.get_download_count()), (3, 1))
+
+        self.assertEqual(get_flusher().flush(), 2)
+        self.assertEqual(self.stored_counts(), (3, 1))
+        self.assertEqual(self.saved, [])
+
+        # the flush of all resources finds what no flusher of this process knows about
+        self.res.refresh_from_db()
+        cache.incr('resource_counter:view_count:{}'.format(self.res.pk), 2)
+        self.assertEqual(self.res.get_view_count(), 5)
+        self.assertEqual(flush_counters(), 1)
+        self.assertEqual(self.stored_counts(), (5, 1))
+        self.res.refresh_from_db()
+        self.assertEqual(self.res.get_view_count(), 5)
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from hs_core import hydroshare
+from hs_core.models import BaseResource
+from hs_core.search_indexes import BaseResourceIndex, prepare_index_snapshots
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestSearchIndexSnapshot(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestSearchIndexSnapshot, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.resources = []
+        for title in ('First Resource', 'Second Resource'):
+            res = hydroshare.create_resource('CompositeResource', self.user, title,
+                                             keywords=['kw1', 'kw2'])
+            res.metadata.create_element('creator', name='Second Creator', order=2,
+                                        email='second@usu.edu')
+            res.metadata.create_element('coverage', type='period',
+                                        value={'name': 'Period', 'start': '01/01/2000',
+                                               'end': '12/12/2010'})
+            self.resources.append(res)
+        self.index = BaseResourceIndex()
+
+    def _prepared(self, obj):
+        return {'title': self.index.prepare_title(obj),
+                'author': self.index.prepare_author(obj),
+                'creator': sorted(self.index.prepare_creator(obj)),
+                'creator_email': sorted(self.index.prepare_creator_email(obj)),
+                'subject': sorted(self.index.prepare_subject(obj)),
+                'start_date': self.index.prepare_start_date(obj),
+                'owner_login': self.index.prepare_owner_login(obj),
+                'owners_count': self.index.prepare_owners_count(obj),
+                'resource_type': self.index.prepare_resource_type(obj),
+                'replaced': self.index.prepare_replaced(obj)}
+
+    def test_bulk_snapshots_match_single_snapshots(self):
+        ids = [res.id for res in self.resources]
+        single = [self._prepared(BaseResource.objects.get(pk=pk)) for pk in ids]
+        resources = list(BaseResource.objects.filter(pk__in=ids).order_by('pk'))
+        prepare_index_snapshots(resources)
+        with self.assertNumQueries(0):
+            bulk = [self._prepared(res) for res in resources]
+        self.assertEqual(single, bulk)
+        self.assertEqual(bulk[0]['title'], 'First Resource')
+        self.assertEqual(bulk[0]['owner_login'], ['creator'])
+        self.assertEqual(bulk[0]['subject'], ['kw1', 'kw2'])
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import Group
+from django.db.models import F
+from django.test import TestCase
+from mock import MagicMock, patch
+
+from hs_core import hydroshare
+from hs_core.models import SolrQueueEntry
+from hs_core.search_indexes import BaseResourceIndex
+from hs_core.solr_queue import process_solr_queue, queue_solr_update, solr_queue_lag
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestSolrQueue(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestSolrQueue, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.private_res = hydroshare.create_resource('CompositeResource', self.user,
+                                                      'Private Resource')
+        self.public_res = hydroshare.create_resource('CompositeResource', self.user,
+                                                     'Public Resource')
+        self.public_res.raccess.public = True
+        self.public_res.raccess.save()
+        SolrQueueEntry.objects.all().delete()
+
+        self.backend = MagicMock()
+        connections = MagicMock()
+        connections.__getitem__.return_value.get_backend.return_value = self.backend
+        connections.__getitem__.return_value.get_unified_index.return_value.get_index \
+            .return_value = BaseResourceIndex()
+        for target, value in (('connections', connections),
+                              ('connection_router', MagicMock(**{
+                                  'for_write.return_value': ['default']}))):
+            patcher = patch('hs_core.solr_queue.' + target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_repeated_updates_are_merged(self):
+        queue_solr_update(self.public_res.pk)
+        queued = SolrQueueEntry.objects.get(resource_id=self.public_res.pk).queued
+        queue_solr_update(self.public_res.pk)
+        queue_solr_update(self.public_res.pk)
+        self.assertEqual(SolrQueueEntry.objects.count(), 1)
+        entry = SolrQueueEntry.objects.get(resource_id=self.public_res.pk)
+        self.assertEqual(entry.queued, queued)
+        self.assertGreaterEqual(entry.updated, queued)
+        self.assertGreaterEqual(solr_queue_lag(), 0)
+
+    def test_queue_is_sent_in_one_batch(self):
+        queue_solr_update(self.public_res.pk)
+        queue_solr_update(self.private_res.pk)
+        self.assertEqual(process_solr_queue(), 2)
+
+        self.assertEqual(SolrQueueEntry.objects.count(), 0)
+        self.assertEqual(solr_queue_lag(), 0)
+        # the private resource is removed from the index, the public one is added
+        self.backend.remove.assert_called_once_with(
+            u'hs_core.baseresource.{}'.format(self.private_res.pk), commit=False)
+        self.assertEqual(self.backend.update.call_count, 1)
+        indexed = self.backend.update.call_args[0][1]
+        self.assertEqual([res.pk for res in indexed], [self.public_res.pk])
+
+    def test_entries_stay_queued_when_solr_fails(self):
+        queue_solr_update(self.public_res.pk)
+        self.backend.update.side_effect = IOError('SOLR is down')
+        with self.assertRaises(IOError):
+            process_solr_queue()
+        self.assertEqual(SolrQueueEntry.objects.count(), 1)
+
+    def test_entry_changed_while_sent_stays_queued(self):
+        queue_solr_update(self.public_res.pk)
+
+        def changed_during_update(index, resources):
+            # re-queued by a web server whose clock is behind the clock of the worker
+            SolrQueueEntry.objects.filter(resource_id=self.public_res.pk) \
+                .update(updated=F('updated') - timedelta(minutes=5))
+
+        self.backend.update.side_effect = changed_during_update
+        self.assertEqual(process_solr_queue(), 1)
+        self.assertEqual(SolrQueueEntry.objects.count(), 1)
+
+        self.backend.update.side_effect = None
+        self.assertEqual(process_solr_queue(), 1)
+        self.assertEqual(SolrQueueEntry.objects.count(), 0)
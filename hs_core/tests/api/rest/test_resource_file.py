@@ -7,6 +7,7 @@ import shutil
 from rest_framework import status
 
 from hs_core.hydroshare import resource
+from hs_core.models import ResourceFile
 from hs_core.tests.api.utils import MyTemporaryUploadedFile
 from .base import HSRESTTestCase
 
@@ -43,6 +44,7 @@ class TestResourceFile(HSRESTTestCase):
                                        'My Test resource',
                                        files=(payload,),
                                        unpack_file=True)
+        self.res = res
         self.pid = res.short_id
         self.resources_to_delete.append(self.pid)
 
@@ -73,6 +75,18 @@ class TestResourceFile(HSRESTTestCase):
         self.assertIn(self.txt_file_name, content_list)
         self.assertIn(self.raster_file_name, content_list)
 
+    def test_resource_file_manifest(self):
+        # sizes that have not been calculated are filled from iRODS
+        ResourceFile.objects.filter(object_id=self.res.id).update(_size=-1)
+        response = self.client.get("/hsapi/resource/{pid}/file_manifest/".format(pid=self.pid))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = json.loads(''.join(response.streaming_content))
+        self.assertEqual(content['resource_id'], self.pid)
+        sizes = {f['file_name']: f['size'] for f in content['files']}
+        self.assertEqual(sizes[self.txt_file_name], len("Hello World\n"))
+        self.assertEqual(sizes[self.raster_file_name], os.stat(self.raster_file_path).st_size)
+        self.assertFalse(ResourceFile.objects.filter(object_id=self.res.id, _size__lt=0).exists())
+
     def test_get_resource_file(self):
         files = (MyTemporaryUploadedFile(file=open(self.txt_file_path, 'r'), name=self.txt_file_path))
         resource.add_resource_files(self.pid, files)
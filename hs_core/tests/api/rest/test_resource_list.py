@@ -4,6 +4,7 @@ import os
 from rest_framework import status
 
 from hs_core.hydroshare import resource
+from hs_core.hydroshare.utils import resource_modified
 from .base import HSRESTTestCase
 
 
@@ -340,3 +341,39 @@ class TestResourceList(HSRESTTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         content = json.loads(response.content)
         self.assertEqual(content['count'], 0)
+
+    def test_resource_list_pages(self):
+        pids = []
+        for i in range(3):
+            res = resource.create_resource('GenericResource', self.user,
+                                           'My Test Resource {}'.format(i))
+            pids.append(res.short_id)
+            self.resources_to_delete.append(res.short_id)
+
+        response = self.client.get('/hsapi/resource/', {'count': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = json.loads(response.content)
+        self.assertEqual(content['count'], 3)
+        self.assertEqual([r['resource_id'] for r in content['results']], pids[:2])
+        self.assertEqual(len(content['results'][0]['authors']), 1)
+
+        response = self.client.get(content['next'], format='json')
+        content = json.loads(response.content)
+        self.assertEqual([r['resource_id'] for r in content['results']], pids[2:])
+
+    def test_resource_list_item_follows_modification(self):
+        res = resource.create_resource('GenericResource', self.user, 'My Test Resource')
+        self.resources_to_delete.append(res.short_id)
+
+        response = self.client.get('/hsapi/resource/', format='json')
+        content = json.loads(response.content)
+        self.assertEqual(content['results'][0]['resource_title'], 'My Test Resource')
+
+        res.metadata.update_element('title', res.metadata.title.id, value='New Title')
+        resource_modified(res, self.user, overwrite_bag=False)
+        res.raccess.public = True
+        res.raccess.save()
+        response = self.client.get('/hsapi/resource/', format='json')
+        content = json.loads(response.content)
+        self.assertEqual(content['results'][0]['resource_title'], 'New Title')
+        self.assertTrue(content['results'][0]['public'])
@@ -17,6 +17,7 @@ from django.core.exceptions import ValidationError, PermissionDenied, ObjectDoes
 from django.http import HttpResponseRedirect, HttpResponse, JsonResponse, \
     HttpResponseBadRequest, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, render, redirect
+from django.template.loader import render_to_string
 from django.core import signing
 from django.db import Error, IntegrityError
 from django import forms
@@ -39,7 +40,7 @@ from django_irods.icommands import SessionException
 from hs_core import hydroshare
 from hs_core.hydroshare.utils import get_resource_by_shortkey, resource_modified, resolve_request
 from .utils import authorize, upload_from_irods, ACTION_TO_AUTHORIZE, run_script_to_update_hyrax_input_files, \
-    get_my_resources_list, send_action_to_take_email, get_coverage_data_dict
+    get_my_resources_page, send_action_to_take_email, get_coverage_data_dict
 
 from hs_core.models import GenericResource, resource_processor, CoreMetaData, Subject
 from hs_core.hydroshare.resource import METADATA_STATUS_SUFFICIENT, METADATA_STATUS_INSUFFICIENT, \
@@ -1827,9 +1828,37 @@ class MyResourcesView(TemplateView):
 
     def get_context_data(self, **kwargs):
         u = User.objects.get(pk=self.request.user.id)
-        
-        resource_collection = get_my_resources_list(u)
+
+        # the first page is rendered with the page, the others are loaded by my_resources_page
+        resource_collection, next_after = get_my_resources_page(u)
 
         return {
-            'collection': resource_collection
+            'collection': resource_collection,
+            'next_page_url': _my_resources_page_url(next_after)
         }
+
+
+def _my_resources_page_url(after):
+    if after is None:
+        return None
+    return "{}?after={}".format(reverse('my_resources_page'), after)
+
+
+@login_required
+def my_resources_page(request):
+    """
+    Return the table rows of the next page of the My Resources listing as json.
+
+    The page is selected by the query parameter 'after', the id of the last resource of
+    the previous page. 'next' in the response is the url of the following page, or null.
+    """
+    try:
+        after = int(request.GET['after'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("Missing or invalid parameter 'after'")
+
+    resource_collection, next_after = get_my_resources_page(request.user, after=after)
+    rows = render_to_string('includes/my-resources-rows.html',
+                            {'collection': resource_collection, 'user': request.user},
+                            request=request)
+    return JsonResponse({'rows': rows, 'next': _my_resources_page_url(next_after)})
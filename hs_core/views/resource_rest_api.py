@@ -6,12 +6,15 @@ import shutil
 import logging
 import json
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ObjectDoesNotExist, SuspiciousFileOperation
 from django.core.exceptions import ValidationError as CoreValidationError
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.contrib.sites.models import Site
+from django.db.models import prefetch_related_objects
 
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.views import APIView
@@ -39,51 +42,120 @@ logger = logging.getLogger(__name__)
 
 
 # Mixins
+REST_LIST_ITEM_CACHE_TIMEOUT = getattr(settings, 'REST_LIST_ITEM_CACHE_TIMEOUT', 60 * 10)
+FILE_MANIFEST_BATCH_SIZE = getattr(settings, 'FILE_MANIFEST_BATCH_SIZE', 1000)
+
+
+def _list_item_cache_key(r):
+    # resource_modified() sets updated, so a modified resource is looked up under a new key
+    return 'resource_list_item:{}:{}'.format(r.short_id, r.updated)
+
+
+def _first(related):
+    """ first object of a prefetched relation, without a query """
+    objects = list(related.all())
+    return objects[0] if objects else None
+
+
 class ResourceToListItemMixin(object):
     def resourceToResourceListItem(self, r):
+        return self.resourcesToResourceListItems([r])[0]
+
+    def resourcesToResourceListItems(self, resources):
+        """
+        Build list items for a page of resources.
+
+        The metadata of resources that are not in the cache is prefetched in bulk. Access
+        flags are always read from raccess, so they are never cached.
+        """
         # URLs in metadata should be fully qualified.
         # ALWAYS qualify them with www.hydroshare.org, rather than the local server name.
         site_url = hydroshare.utils.current_site_url()
-        bag_url = site_url + r.bag_url
-        science_metadata_url = site_url + reverse('get_update_science_metadata', args=[r.short_id])
-        resource_map_url = site_url + reverse('get_resource_map', args=[r.short_id])
-        resource_url = site_url + r.get_absolute_url()
-        coverages = [{"type": v['type'], "value": json.loads(v['_value'])}
-                     for v in r.metadata.coverages.values()]
-        authors = []
-        for c in r.metadata.creators.all():
-            authors.append(c.name)
-        doi = None
-        if r.raccess.published:
-            doi = "10.4211/hs.{}".format(r.short_id)
-        resource_list_item = serializers.ResourceListItem(resource_type=r.resource_type,
-                                                          resource_id=r.short_id,
-                                                          resource_title=r.metadata.title.value,
-                                                          abstract=r.metadata.description,
-                                                          authors=authors,
-                                                          creator=r.first_creator.name,
-                                                          doi=doi,
-                                                          public=r.raccess.public,
-                                                          discoverable=r.raccess.discoverable,
-                                                          shareable=r.raccess.shareable,
-                                                          immutable=r.raccess.immutable,
-                                                          published=r.raccess.published,
-                                                          date_created=r.created,
-                                                          date_last_updated=r.last_updated,
-                                                          bag_url=bag_url,
-                                                          coverages=coverages,
-                                                          science_metadata_url=science_metadata_url,
-                                                          resource_map_url=resource_map_url,
-                                                          resource_url=resource_url,
-                                                          content_types=r.aggregation_types)
-        return resource_list_item
+        keys = {r.short_id: _list_item_cache_key(r) for r in resources}
+        details = cache.get_many(keys.values())
+        missing = [r for r in resources if keys[r.short_id] not in details]
+        if missing:
+            self._prefetch_list_item_metadata(missing)
+            fresh = {keys[r.short_id]: self._resourceListItemDetails(r) for r in missing}
+            cache.set_many(fresh, REST_LIST_ITEM_CACHE_TIMEOUT)
+            details.update(fresh)
+
+        items = []
+        for r in resources:
+            d = details[keys[r.short_id]]
+            doi = None
+            if r.raccess.published:
+                doi = "10.4211/hs.{}".format(r.short_id)
+            items.append(serializers.ResourceListItem(
+                resource_type=r.resource_type,
+                resource_id=r.short_id,
+                resource_title=d['resource_title'],
+                abstract=d['abstract'],
+                authors=d['authors'],
+                creator=d['creator'],
+                doi=doi,
+                public=r.raccess.public,
+                discoverable=r.raccess.discoverable,
+                shareable=r.raccess.shareable,
+                immutable=r.raccess.immutable,
+                published=r.raccess.published,
+                date_created=r.created,
+                date_last_updated=d['date_last_updated'],
+                bag_url=site_url + d['bag_path'],
+                coverages=d['coverages'],
+                science_metadata_url=site_url + d['science_metadata_path'],
+                resource_map_url=site_url + d['resource_map_path'],
+                resource_url=site_url + d['resource_path'],
+                content_types=d['content_types']))
+        return items
+
+    @staticmethod
+    def _prefetch_list_item_metadata(resources):
+        # metadata classes differ between resource types
+        resources_by_type = {}
+        for r in resources:
+            resources_by_type.setdefault(r.content_type_id, []).append(r)
+        for res_list in resources_by_type.values():
+            prefetch_related_objects(res_list,
+                                     'content_object___title',
+                                     'content_object___description',
+                                     'content_object__creators',
+                                     'content_object__coverages',
+                                     'content_object__dates',
+                                     'files__logical_file_content_object')
+
+    @staticmethod
+    def _resourceListItemDetails(r):
+        """ cacheable part of the list item of a resource, with site-relative URLs """
+        metadata = r.metadata
+        title = _first(metadata._title)
+        description = _first(metadata._description)
+        creators = list(metadata.creators.all())
+        first_creator = next((c for c in creators if c.order == 1), None)
+        modified = [d for d in metadata.dates.all() if d.type == 'modified']
+        return {
+            'resource_title': title.value if title is not None else None,
+            'abstract': description.abstract if description is not None else None,
+            'authors': [c.name for c in creators],
+            'creator': first_creator.name if first_creator is not None else None,
+            'date_last_updated': modified[0].start_date if modified else None,
+            'coverages': [{"type": c.type, "value": c.value}
+                          for c in metadata.coverages.all()],
+            'bag_path': r.bag_url,
+            'science_metadata_path': reverse('get_update_science_metadata',
+                                             args=[r.short_id]),
+            'resource_map_path': reverse('get_resource_map', args=[r.short_id]),
+            'resource_path': r.get_absolute_url(),
+            'content_types': r.aggregation_types,
+        }
 
 
 class ResourceFileToListItemMixin(object):
-    def resourceFileToListItem(self, f):
+    def resourceFileToListItem(self, f, site_url=None):
         # URLs in metadata should be fully qualified.
         # ALWAYS qualify them with www.hydroshare.org, rather than the local server name.
-        site_url = hydroshare.utils.current_site_url()
+        if site_url is None:
+            site_url = hydroshare.utils.current_site_url()
         url = site_url + f.url
         fsize = f.size
         logical_file_type = f.logical_file_type_name
@@ -101,6 +173,21 @@ class ResourceFileToListItemMixin(object):
                                                                logical_file_type=logical_file_type)
         return resource_file_info_item
 
+    def resourceFilesToListItems(self, resource, files):
+        """
+        Build list items for files of one resource.
+
+        Logical files are prefetched and sizes that have not been calculated yet are filled
+        from one iRODS listing, instead of queries and iRODS calls for every file.
+        """
+        files = list(files)
+        for f in files:
+            f.content_object = resource
+        prefetch_related_objects(files, 'logical_file_content_object')
+        hydroshare.utils.fill_missing_file_sizes(resource, files)
+        site_url = hydroshare.utils.current_site_url()
+        return [self.resourceFileToListItem(f, site_url) for f in files]
+
 
 class ResourceTypes(generics.ListAPIView):
     # We don't need pagination for a list of resource types
@@ -295,13 +382,15 @@ class ResourceListCreate(ResourceToListItemMixin, generics.ListCreateAPIView):
             filter_parms['type'] = list(filter_parms['type'])
 
         filter_parms['public'] = not self.request.user.is_authenticated()
-        filtered_res_list = []
 
-        for r in hydroshare.get_resource_list(**filter_parms):
-            resource_list_item = self.resourceToResourceListItem(r)
-            filtered_res_list.append(resource_list_item)
+        # evaluated by the paginator, one page at a time
+        return hydroshare.get_resource_list(**filter_parms).select_related('raccess')
 
-        return filtered_res_list
+    def paginate_queryset(self, queryset):
+        page = super(ResourceListCreate, self).paginate_queryset(queryset)
+        if page is None:
+            return None
+        return self.resourcesToResourceListItems(page)
 
     # covers serialization of output from GET request
     def get_serializer_class(self):
@@ -789,10 +878,15 @@ class ResourceFileListCreate(ResourceFileToListItemMixin, generics.ListCreateAPI
     def get_queryset(self):
         resource, _, _ = view_utils.authorize(self.request, self.kwargs['pk'],
                                               needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE)
-        resource_file_info_list = []
-        for f in resource.files.all():
-            resource_file_info_list.append(self.resourceFileToListItem(f))
-        return resource_file_info_list
+        self.resource = resource
+        # evaluated by the paginator, one page at a time
+        return resource.files.all().order_by('pk')
+
+    def paginate_queryset(self, queryset):
+        page = super(ResourceFileListCreate, self).paginate_queryset(queryset)
+        if page is None:
+            return None
+        return self.resourceFilesToListItems(self.resource, page)
 
     def get_serializer_class(self):
         return serializers.ResourceFileSerializer
@@ -851,6 +945,55 @@ class ResourceFileListCreate(ResourceFileToListItemMixin, generics.ListCreateAPI
         return Response(data=response_data, status=status.HTTP_201_CREATED)
 
 
+class ResourceFileManifest(ResourceFileToListItemMixin, APIView):
+    """
+    Stream a listing of all files of a resource
+
+    REST URL: hsapi/resource/{pk}/file_manifest/
+    HTTP method: GET
+
+    :type pk: str
+    :param pk: resource id
+    :return: JSON of the form {"resource_id": pk, "files": [...]}, where files are listed in
+    the same form as by hsapi/resource/{pk}/files/
+
+    Unlike hsapi/resource/{pk}/files/, the listing is not paginated. It is written while files
+    are read from the database, FILE_MANIFEST_BATCH_SIZE files at a time, so the response
+    starts immediately and memory use does not depend on the number of files.
+
+    :raises:
+    NotFound: return json format: {'detail': 'No resource was found for resource id':pk}
+    PermissionDenied: return json format: {'detail': 'You do not have permission to perform
+    this action.'}
+    """
+    allowed_methods = ('GET',)
+
+    @swagger_auto_schema(operation_description="Stream a listing of all files of a resource",
+                         responses={200: serializers.ResourceFileSerializer(many=True)})
+    def get(self, request, pk):
+        resource, _, _ = view_utils.authorize(request, pk,
+                                              needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE)
+        # one iRODS listing for all files whose size has not been recorded yet
+        hydroshare.utils.fill_missing_file_sizes(resource)
+        return StreamingHttpResponse(self._iter_manifest(resource),
+                                     content_type='application/json')
+
+    def _iter_manifest(self, resource):
+        yield '{{"resource_id": {}, "files": ['.format(json.dumps(resource.short_id))
+        separator = ''
+        last_pk = 0
+        while True:
+            batch = list(resource.files.filter(pk__gt=last_pk)
+                                       .order_by('pk')[:FILE_MANIFEST_BATCH_SIZE])
+            if not batch:
+                break
+            for item in self.resourceFilesToListItems(resource, batch):
+                yield separator + json.dumps(serializers.ResourceFileSerializer(item).data)
+                separator = ', '
+            last_pk = batch[-1].pk
+        yield ']}'
+
+
 def _validate_metadata(metadata_list):
     """
     Make sure the metadata_list does not have data for the following
@@ -21,7 +21,7 @@ from django.core.exceptions import SuspiciousFileOperation
 from django.core.files.base import File
 from django.core.urlresolvers import reverse
 from django.core.validators import URLValidator
-from django.db.models import When, Case, Value, BooleanField, Prefetch
+from django.db.models import Exists, OuterRef, Prefetch, Q
 from django.db.models.query import prefetch_related_objects
 from django.http import HttpResponse, QueryDict
 from django.utils.http import int_to_base36
@@ -37,6 +37,7 @@ from hs_access_control.models import PrivilegeCodes
 from hs_core import hydroshare
 from hs_core.hydroshare import add_resource_files
 from hs_core.hydroshare import check_resource_type, delete_resource_file
+from hs_core.hydroshare.folder_listing import invalidate_folder_listing
 from hs_core.hydroshare.utils import check_aggregations
 from hs_core.hydroshare.utils import get_file_mime_type
 from hs_core.models import AbstractMetaDataElement, BaseResource, GenericResource, Relation, \
@@ -553,86 +554,103 @@ def get_metadata_contenttypes():
 def get_my_resources_list(user):
     """
     Gets a QuerySet object for listing resources that belong to a given user.
+
+    The resources are narrowed to the candidates with one IN subquery per kind of access, and
+    the flags (owned, editable, viewable, discovered, is_favorite, has_labels) of these
+    resources only are computed in the same query with one EXISTS subquery per flag; the access
+    querysets are not joined with each other. Use get_my_resources_page to list the resources
+    one page at a time. The queryset loads only the fields shown in listings; use
+    prefetch_listing_metadata to load their metadata.
     :param user: an instance of User - user who wants to see his/her resources
     :return: an instance of QuerySet of resources
     """
 
-    # get a list of resources with effective OWNER privilege
-    owned_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.OWNER)
-    # remove obsoleted resources from the owned_resources
-    owned_resources = owned_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
+    def flag(queryset):
+        return Exists(queryset.filter(pk=OuterRef('pk')))
 
-    # get a list of resources with effective CHANGE privilege (should include resources that the
-    # user has access to via group
+    # obsoleted resources are only listed if the user added them to his/her resources
+    obsoleted = Relation.objects.filter(type='isReplacedBy').values('object_id')
+    # resources with effective OWNER privilege
+    owned_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.OWNER)
+    # resources with effective CHANGE/VIEW privilege, including access via group
     editable_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.CHANGE,
                                                                          via_group=True)
-    # remove obsoleted resources from the editable_resources
-    editable_resources = editable_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
-
-    # get a list of resources with effective VIEW privilege (should include resources that the
-    # user has access via group
     viewable_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.VIEW,
                                                                          via_group=True)
-    # remove obsoleted resources from the viewable_resources
-    viewable_resources = viewable_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
-
-    labeled_resources = user.ulabels.labeled_resources
-    favorite_resources = user.ulabels.favorited_resources
-    discovered_resources = user.ulabels.my_resources
-
-    # join all queryset objects
-    resource_collection = owned_resources.distinct() | \
-        editable_resources.distinct() | \
-        viewable_resources.distinct() | \
-        discovered_resources.distinct()
 
-    resource_collection = resource_collection.annotate(
-        owned=Case(When(short_id__in=owned_resources.values_list('short_id', flat=True),
-                        then=Value(True, BooleanField()))))
+    # narrow the resources to those the user has access to or added to his/her resources
+    # before computing the flags, rather than computing the flags of all resources; the
+    # subqueries keep this in the same SQL statement as the page query
+    candidates = Q()
+    for resources in (owned_resources, editable_resources, viewable_resources,
+                      user.ulabels.my_resources):
+        candidates |= Q(pk__in=resources.order_by().values('pk'))
+
+    resource_collection = BaseResource.objects.filter(candidates).annotate(
+        owned=flag(owned_resources.exclude(object_id__in=obsoleted)),
+        editable=flag(editable_resources.exclude(object_id__in=obsoleted)),
+        viewable=flag(viewable_resources.exclude(object_id__in=obsoleted)),
+        discovered=flag(user.ulabels.my_resources),
+        is_favorite=flag(user.ulabels.favorited_resources),
+        # The annotated field 'has_labels' would allow us to query the DB for labels only if
+        # the resource has labels - that means we won't hit the DB for each resource listed on
+        # the page to get the list of labels for a resource
+        has_labels=flag(user.ulabels.labeled_resources),
+    ).filter(Q(owned=True) | Q(editable=True) | Q(viewable=True) | Q(discovered=True))
+
+    # only the columns that the listing shows; content_type and object_id locate the metadata
+    resource_collection = resource_collection.only('short_id', 'title', 'resource_type',
+                                                   'created', 'slug', 'content_model',
+                                                   'content_type', 'object_id')
 
-    resource_collection = resource_collection.annotate(
-        editable=Case(When(short_id__in=editable_resources.values_list('short_id', flat=True),
-                      then=Value(True, BooleanField()))))
-
-    resource_collection = resource_collection.annotate(
-        viewable=Case(When(short_id__in=viewable_resources.values_list('short_id', flat=True),
-                           then=Value(True, BooleanField()))))
-
-    resource_collection = resource_collection.annotate(
-        discovered=Case(When(short_id__in=discovered_resources.values_list('short_id', flat=True),
-                        then=Value(True, BooleanField()))))
-
-    resource_collection = resource_collection.annotate(
-        is_favorite=Case(When(short_id__in=favorite_resources.values_list('short_id', flat=True),
-                              then=Value(True, BooleanField()))))
+    # we won't hit the DB for each resource to know if it's status is public/private/discoverable
+    # etc
+    return resource_collection.select_related('raccess')
 
-    # The annotated field 'has_labels' would allow us to query the DB for labels only if the
-    # resource has labels - that means we won't hit the DB for each resource listed on the page
-    # to get the list of labels for a resource
-    resource_collection = resource_collection.annotate(has_labels=Case(
-        When(short_id__in=labeled_resources.values_list('short_id', flat=True),
-             then=Value(True, BooleanField()))))
 
-    resource_collection = resource_collection.only('short_id', 'title', 'resource_type', 'created')
+def prefetch_listing_metadata(resources):
+    """
+    Prefetch the metadata shown in resource listings - creators, keywords(subjects), dates and
+    title - for a list of resources.
 
-    # we won't hit the DB for each resource to know if it's status is public/private/discoverable
-    # etc
-    resource_collection = resource_collection.select_related('raccess')
-    # prefetch metadata items - creators, keywords(subjects), dates and title
-    meta_contenttypes = get_metadata_contenttypes()
-    for ct in meta_contenttypes:
-        # get a list of resources having metadata that is an instance of a specific
-        # metadata class (e.g., CoreMetaData)
-        res_list = [res for res in resource_collection if res.content_type == ct]
+    Metadata classes differ between resource types, so metadata is prefetched separately for
+    the resources of each metadata content type.
+    """
+    resources_by_type = {}
+    for res in resources:
+        resources_by_type.setdefault(res.content_type_id, []).append(res)
+    for res_list in resources_by_type.values():
         prefetch_related_objects(res_list,
                                  Prefetch('content_object__creators'),
                                  Prefetch('content_object__subjects'),
                                  Prefetch('content_object___title'),
                                  Prefetch('content_object__dates'))
-    return resource_collection
+
+
+def get_my_resources_page(user, after=None, page_size=None):
+    """
+    Gets one page of the resources that belong to a given user, newest first.
+
+    Pages are selected by key (resource id) rather than offset, so that each page costs the
+    same no matter how many resources the user has.
+    :param user: an instance of User - user who wants to see his/her resources
+    :param after: id of the last resource of the previous page; None for the first page
+    :param page_size: number of resources per page (default MY_RESOURCES_PAGE_SIZE)
+    :return: tuple of a list of resources with prefetched metadata and the id to pass as
+        `after` to get the next page, which is None for the last page
+    """
+    if page_size is None:
+        page_size = getattr(settings, 'MY_RESOURCES_PAGE_SIZE', 1000)
+    resource_collection = get_my_resources_list(user).order_by('-pk')
+    if after is not None:
+        resource_collection = resource_collection.filter(pk__lt=after)
+    resources = list(resource_collection[:page_size + 1])
+    next_after = None
+    if len(resources) > page_size:
+        resources = resources[:page_size]
+        next_after = resources[-1].pk
+    prefetch_listing_metadata(resources)
+    return resources, next_after
 
 
 def send_action_to_take_email(request, user, action_type, **kwargs):
@@ -828,6 +846,8 @@ def rename_irods_file_or_folder_in_django(resource, src_name, tgt_name):
             new_path = src_path.replace(src_name, tgt_name, 1)
             fobj.set_storage_path(new_path)
 
+    invalidate_folder_listing(resource)
+
 
 def remove_irods_folder_in_django(resource, istorage, folderpath, user):
     """
@@ -870,6 +890,8 @@ def remove_irods_folder_in_django(resource, istorage, folderpath, user):
                 if fileset.folder.startswith(rel_folder_path):
                     fileset.logical_delete(user, delete_res_files=True)
 
+        invalidate_folder_listing(resource)
+
         # send the post-delete signal
         post_delete_file_from_resource.send(sender=resource.__class__, resource=resource)
 
@@ -1078,6 +1100,7 @@ def create_folder(res_id, folder_path):
     if istorage.exists(coll_path):
         raise ValidationError("Folder already exists")
     istorage.session.run("imkdir", None, '-p', coll_path)
+    invalidate_folder_listing(resource)
 
 
 def remove_folder(user, res_id, folder_path):
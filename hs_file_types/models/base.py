@@ -27,6 +27,7 @@ from hs_core.hydroshare.utils import current_site_url, get_resource_file_by_id,
     set_dirty_bag_flag, add_file_to_resource, resource_modified
 from hs_core.models import ResourceFile, AbstractMetaDataElement, Coverage, CoreMetaData
 from hs_core.hydroshare.resource import delete_resource_file
+from hs_core.hydroshare.folder_listing import invalidate_folder_listing
 from hs_core.signals import post_remove_file_aggregation
 
 
@@ -1079,6 +1080,8 @@ class AbstractLogicalFile(models.Model):
 
         res_file.logical_file_content_object = self
         res_file.save()
+        # the aggregation of the file is shown in folder listings
+        invalidate_folder_listing(res_file.resource)
 
     def add_files_to_resource(self, resource, files_to_add, upload_folder):
         """A helper for adding any new files to resource as part of creating an aggregation
@@ -1216,12 +1219,14 @@ class AbstractLogicalFile(models.Model):
         # delete logical file first then delete the associated metadata file object
         # deleting the logical file object will not automatically delete the associated
         # metadata file object
+        resource = self.resource
         metadata = self.metadata if self.has_metadata else None
         super(AbstractLogicalFile, self).delete()
         if metadata is not None:
             # this should also delete on all metadata elements that have generic relations with
             # the metadata object
             metadata.delete()
+        invalidate_folder_listing(resource)
 
     def remove_aggregation(self):
         """Deletes the aggregation object (logical file) *self* and the associated metadata
@@ -1267,6 +1272,7 @@ class AbstractLogicalFile(models.Model):
             resource=self.resource,
             res_files=self.files.all()
         )
+        invalidate_folder_listing(self.resource)
 
     def get_parent(self):
         """Find the parent fileset aggregation of this aggregation
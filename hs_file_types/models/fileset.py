@@ -3,6 +3,7 @@ import logging
 
 from django.db import models
 
+from hs_core.hydroshare.folder_listing import invalidate_folder_listing
 from hs_core.models import ResourceFile
 from base import AbstractLogicalFile
 from generic import GenericFileMetaDataMixin
@@ -99,6 +100,8 @@ class FileSetLogicalFile(AbstractLogicalFile):
         logical_file.save()
         # make all the files in the selected folder as part of the aggregation
         logical_file.add_resource_files_in_folder(resource, folder_path)
+        # the folder is shown as a fileset aggregation even if it has no files
+        invalidate_folder_listing(resource)
         logical_file.create_aggregation_xml_documents()
         log.info("Fie set aggregation was created for folder:{}.".format(folder_path))
 
@@ -9,6 +9,7 @@ from dominate.tags import div, form, button, hr, i
 
 from hs_core.forms import CoverageTemporalForm, CoverageSpatialForm
 from hs_core.hydroshare import utils
+from hs_core.hydroshare.folder_listing import invalidate_folder_listing
 from hs_core.signals import post_add_generic_aggregation
 
 from base import AbstractFileMetaData, AbstractLogicalFile
@@ -251,6 +252,7 @@ class GenericLogicalFile(AbstractLogicalFile):
         logical_file.save()
         res_file.logical_file_content_object = logical_file
         res_file.save()
+        invalidate_folder_listing(resource)
         logical_file.create_aggregation_xml_documents()
         log.info("Generic aggregation was created for file:{}.".format(res_file.storage_path))
         post_add_generic_aggregation.send(
@@ -1,12 +1,15 @@
 import os
 import logging
 import shutil
+import struct
 import zipfile
+from uuid import uuid4
 import xmltodict
 from lxml import etree
 
 from osgeo import ogr, osr
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.utils.html import strip_tags
@@ -27,6 +30,20 @@ from base import AbstractFileMetaData, AbstractLogicalFile
 
 UNKNOWN_STR = "unknown"
 
+# sizes of the shapefile headers read by parse_shp_headers
+SHP_HEADER_LENGTH = 100
+DBF_HEADER_PREFIX_LENGTH = 32
+DBF_FIELD_DESCRIPTOR_LENGTH = 32
+
+# OGR geometry names of the shape types in the .shp header; with Z and M values the geometry
+# names are the same
+SHAPE_TYPE_GEOMETRY_NAMES = {
+    1: 'POINT', 3: 'LINESTRING', 5: 'POLYGON', 8: 'MULTIPOINT',
+    11: 'POINT', 13: 'LINESTRING', 15: 'POLYGON', 18: 'MULTIPOINT',
+    21: 'POINT', 23: 'LINESTRING', 25: 'POLYGON', 28: 'MULTIPOINT',
+    31: 'GEOMETRYCOLLECTION'
+}
+
 
 class GeoFeatureFileMetaData(GeographicFeatureMetaDataMixin, AbstractFileMetaData):
     # the metadata element models are from the geographic feature resource type app
@@ -255,22 +272,33 @@ class GeoFeatureLogicalFile(AbstractLogicalFile):
         log = logging.getLogger()
         res_file, folder_path = cls._validate_set_file_type_inputs(resource, file_id, folder_path)
 
+        # with header extraction the .shp and .dbf files are not copied from iRODS; the field
+        # information is refined from the full files in a celery task
+        from_headers = res_file.extension.lower() == '.shp' and \
+            getattr(settings, 'GEOFEATURE_HEADER_EXTRACTION', False)
         try:
-            meta_dict, shape_files, shp_res_files = extract_metadata_and_files(resource, res_file)
+            if from_headers:
+                meta_dict, temp_dir, xml_file, shp_res_files = extract_metadata_from_headers(
+                    resource, res_file)
+                shape_files = []
+            else:
+                meta_dict, shape_files, shp_res_files = extract_metadata_and_files(resource,
+                                                                                   res_file)
         except ValidationError as ex:
             log.exception(ex.message)
             raise ex
 
-        # hold on to temp dir for final clean up
-        temp_dir = os.path.dirname(shape_files[0])
+        if not from_headers:
+            # hold on to temp dir for final clean up
+            temp_dir = os.path.dirname(shape_files[0])
+            xml_file = ''
+            for f in shape_files:
+                if f.lower().endswith('.shp.xml'):
+                    xml_file = f
+                    break
         file_name = res_file.file_name
         # file name without the extension
         base_file_name = file_name[:-len(res_file.extension)]
-        xml_file = ''
-        for f in shape_files:
-            if f.lower().endswith('.shp.xml'):
-                xml_file = f
-                break
 
         file_folder = res_file.file_folder
         file_type_success = False
@@ -279,7 +307,7 @@ class GeoFeatureLogicalFile(AbstractLogicalFile):
         aggregation_folder_created = False
         create_new_folder = cls._check_create_aggregation_folder(
             selected_res_file=res_file, selected_folder=folder_path,
-            aggregation_file_count=len(shape_files))
+            aggregation_file_count=len(shp_res_files if from_headers else shape_files))
 
         msg = "GeoFeature aggregation. Error when creating aggregation. Error:{}"
         with transaction.atomic():
@@ -369,6 +397,12 @@ class GeoFeatureLogicalFile(AbstractLogicalFile):
                                                        file_folder, aggregation_from_folder)
             raise ValidationError(msg)
 
+        if from_headers:
+            # tasks of this app import the models
+            from hs_file_types.tasks import update_geofeature_field_information
+            transaction.on_commit(lambda: update_geofeature_field_information.apply_async(
+                (resource.short_id, logical_file.id)))
+
     @classmethod
     def _validate_set_file_type_inputs(cls, resource, file_id=None, folder_path=None):
         res_file, folder_path = super(GeoFeatureLogicalFile, cls)._validate_set_file_type_inputs(
@@ -518,25 +552,11 @@ def get_all_related_shp_files(resource, selected_resource_file, file_type):
      resource file objects
     """
 
-    def collect_shape_resource_files(res_file):
-        # compare without the file extension (-4)
-        if res_file.short_path.lower().endswith('.shp.xml'):
-            if selected_resource_file.short_path[:-4] == res_file.short_path[:-8]:
-                shape_res_files.append(f)
-        elif selected_resource_file.short_path[:-4] == res_file.short_path[:-4]:
-            shape_res_files.append(res_file)
-
     shape_temp_files = []
     shape_res_files = []
     temp_dir = ''
     if selected_resource_file.extension.lower() == '.shp':
-        for f in resource.files.all():
-            if f.file_folder == selected_resource_file.file_folder:
-                if f.extension.lower() == '.xml' and not f.file_name.lower().endswith('.shp.xml'):
-                    continue
-                if f.extension.lower() in GeoFeatureLogicalFile.get_allowed_storage_file_types():
-                    collect_shape_resource_files(f)
-
+        shape_res_files = get_related_shp_res_files(resource, selected_resource_file)
         for f in shape_res_files:
             temp_file = utils.get_file_from_irods(f)
             if not temp_dir:
@@ -572,6 +592,78 @@ def get_all_related_shp_files(resource, selected_resource_file, file_type):
     return shape_temp_files, shape_res_files
 
 
+def get_related_shp_res_files(resource, selected_resource_file):
+    """
+    returns the resource files that are component files of the shapefile of which
+    *selected_resource_file* is the .shp file
+    """
+
+    def collect_shape_resource_files(res_file):
+        # compare without the file extension (-4)
+        if res_file.short_path.lower().endswith('.shp.xml'):
+            if selected_resource_file.short_path[:-4] == res_file.short_path[:-8]:
+                shape_res_files.append(res_file)
+        elif selected_resource_file.short_path[:-4] == res_file.short_path[:-4]:
+            shape_res_files.append(res_file)
+
+    shape_res_files = []
+    for f in resource.files.all():
+        if f.file_folder == selected_resource_file.file_folder:
+            if f.extension.lower() == '.xml' and not f.file_name.lower().endswith('.shp.xml'):
+                continue
+            if f.extension.lower() in GeoFeatureLogicalFile.get_allowed_storage_file_types():
+                collect_shape_resource_files(f)
+    return shape_res_files
+
+
+def extract_metadata_from_headers(resource, res_file):
+    """
+    validates shape files and extracts metadata from the headers of the .shp and .dbf files,
+    which are read from iRODS without copying the files. Only the .prj and .shp.xml files are
+    copied to a temp directory.
+
+    :param resource: an instance of BaseResource
+    :param res_file: an instance of ResourceFile of the .shp file
+    :return: a dict of extracted metadata, the temp directory, the temp path of the .shp.xml
+    file (empty string if there is none), a list of the shape resource files
+    """
+    shp_res_files = get_related_shp_res_files(resource, res_file)
+    if not _check_if_shape_files(shp_res_files, temp_files=False):
+        err_msg = "There was a problem parsing the component files associated with " \
+                  "{folder_path} as a geographic shapefile. This may be because a component " \
+                  "file is corrupt or missing. The .shp, .shx, and .dbf shapefile component " \
+                  "files are required. Other shapefile component files  " \
+                  "(.cpg, .prj, .sbn, .sbx, .xml, .fbn, .fbx, .ain, .aih, .atx, .ixs, .mxs) " \
+                  "should also be added where available."
+        raise ValidationError(err_msg.format(folder_path=res_file.short_path))
+
+    istorage = resource.get_irods_storage()
+    temp_dir = os.path.join(settings.TEMP_FILE_DIR, uuid4().hex)
+    os.makedirs(temp_dir)
+    xml_file = ''
+    prj_text = None
+    try:
+        dbf_file = [f for f in shp_res_files if f.extension.lower() == '.dbf'][0]
+        shp_header = istorage.read_header(res_file.storage_path, SHP_HEADER_LENGTH)
+        dbf_header = istorage.read_header(dbf_file.storage_path, DBF_HEADER_PREFIX_LENGTH)
+        # the full header length is in the header prefix
+        dbf_header_length = struct.unpack('<H', dbf_header[8:10])[0]
+        dbf_header = istorage.read_header(dbf_file.storage_path, dbf_header_length)
+        for f in shp_res_files:
+            if f.extension.lower() == '.prj':
+                with open(utils.get_file_from_irods(f, temp_dir)) as prj_file:
+                    prj_text = prj_file.read()
+            elif f.file_name.lower().endswith('.shp.xml'):
+                xml_file = utils.get_file_from_irods(f, temp_dir)
+        parsed_md_dict = parse_shp_headers(shp_header, dbf_header, prj_text)
+        meta_dict = extract_metadata(res_file.storage_path, parsed_md_dict)
+    except Exception as ex:
+        shutil.rmtree(temp_dir)
+        msg = "GeoFeature file type. Error when setting file type. Error:{}"
+        raise ValidationError(msg.format(ex.message))
+    return meta_dict, temp_dir, xml_file, shp_res_files
+
+
 def _check_if_shape_files(files, temp_files=True):
     """
     checks if the list of file temp paths in *files* are part of shape files
@@ -653,10 +745,12 @@ def _check_if_shape_files(files, temp_files=True):
     return True
 
 
-def extract_metadata(shp_file_full_path):
+def extract_metadata(shp_file_full_path, parsed_md_dict=None):
     """
     Collects metadata from a .shp file specified by *shp_file_full_path*
     :param shp_file_full_path:
+    :param parsed_md_dict: metadata already parsed by parse_shp_headers, in which case the .shp
+    file is not opened
     :return: returns a dict of collected metadata
     """
 
@@ -664,7 +758,8 @@ def extract_metadata(shp_file_full_path):
         metadata_dict = {}
 
         # wgs84 extent
-        parsed_md_dict = parse_shp(shp_file_full_path)
+        if parsed_md_dict is None:
+            parsed_md_dict = parse_shp(shp_file_full_path)
         if parsed_md_dict["wgs84_extent_dict"]["westlimit"] != UNKNOWN_STR:
             wgs84_dict = parsed_md_dict["wgs84_extent_dict"]
             # if extent is a point, create point type coverage
@@ -766,21 +861,6 @@ def parse_shp(shp_file_path):
     # get spatialRef from layer
     spatialRef_from_layer = layer.GetSpatialRef()
 
-    if spatialRef_from_layer is not None:
-        shp_metadata_dict["origin_projection_string"] = str(spatialRef_from_layer)
-        prj_name = spatialRef_from_layer.GetAttrValue('projcs')
-        if prj_name is None:
-            prj_name = spatialRef_from_layer.GetAttrValue('geogcs')
-        shp_metadata_dict["origin_projection_name"] = prj_name
-
-        shp_metadata_dict["origin_datum"] = spatialRef_from_layer.GetAttrValue('datum')
-        shp_metadata_dict["origin_unit"] = spatialRef_from_layer.GetAttrValue('unit')
-    else:
-        shp_metadata_dict["origin_projection_string"] = UNKNOWN_STR
-        shp_metadata_dict["origin_projection_name"] = UNKNOWN_STR
-        shp_metadata_dict["origin_datum"] = UNKNOWN_STR
-        shp_metadata_dict["origin_unit"] = UNKNOWN_STR
-
     field_list = []
     filed_attr_dic = {}
     field_meta_dict = {"field_list": field_list, "field_attr_dict": filed_attr_dic}
@@ -819,9 +899,35 @@ def parse_shp(shp_file_path):
     # get geometry name
     shp_metadata_dict["geometry_type"] = geom.GetGeometryName()
 
+    _add_projection_and_extent(shp_metadata_dict, spatialRef_from_layer, layer_extent)
+    return shp_metadata_dict
+
+
+def _add_projection_and_extent(shp_metadata_dict, spatial_ref, layer_extent):
+    """
+    adds the original projection, original extent and WGS84 extent to *shp_metadata_dict*
+    :param shp_metadata_dict: dict in the format returned by parse_shp
+    :param spatial_ref: osr.SpatialReference of the shapefile, or None if unknown
+    :param layer_extent: (west, east, south, north) as returned by OGR layer.GetExtent()
+    """
+    if spatial_ref is not None:
+        shp_metadata_dict["origin_projection_string"] = str(spatial_ref)
+        prj_name = spatial_ref.GetAttrValue('projcs')
+        if prj_name is None:
+            prj_name = spatial_ref.GetAttrValue('geogcs')
+        shp_metadata_dict["origin_projection_name"] = prj_name
+
+        shp_metadata_dict["origin_datum"] = spatial_ref.GetAttrValue('datum')
+        shp_metadata_dict["origin_unit"] = spatial_ref.GetAttrValue('unit')
+    else:
+        shp_metadata_dict["origin_projection_string"] = UNKNOWN_STR
+        shp_metadata_dict["origin_projection_name"] = UNKNOWN_STR
+        shp_metadata_dict["origin_datum"] = UNKNOWN_STR
+        shp_metadata_dict["origin_unit"] = UNKNOWN_STR
+
     # reproject layer extent
     # source SpatialReference
-    source = spatialRef_from_layer
+    source = spatial_ref
     # target SpatialReference
     target = osr.SpatialReference()
     target.ImportFromEPSG(4326)
@@ -862,6 +968,63 @@ def parse_shp(shp_file_path):
         shp_metadata_dict["wgs84_extent_dict"]["projection"] = UNKNOWN_STR
         shp_metadata_dict["wgs84_extent_dict"]["units"] = UNKNOWN_STR
 
+
+def parse_shp_headers(shp_header, dbf_header, prj_text=None):
+    """
+    collects the same metadata as parse_shp from the headers of the .shp and .dbf files only,
+    without reading any features
+    :param shp_header: the first SHP_HEADER_LENGTH bytes of the .shp file
+    :param dbf_header: the header of the .dbf file, including the field descriptors
+    :param prj_text: content of the .prj file, or None if there is none
+    :return: dict in the format returned by parse_shp; field types are derived from the dbf
+    field descriptors the way OGR derives them
+    """
+    if len(shp_header) < SHP_HEADER_LENGTH or struct.unpack('>i', shp_header[:4])[0] != 9994:
+        raise ValidationError("Not a valid .shp file header.")
+    shape_type = struct.unpack('<i', shp_header[32:36])[0]
+    x_min, y_min, x_max, y_max = struct.unpack('<4d', shp_header[36:68])
+
+    shp_metadata_dict = {}
+    field_list = []
+    field_meta_dict = {"field_list": field_list, "field_attr_dict": {}}
+    shp_metadata_dict["field_meta_dict"] = field_meta_dict
+    record_count, header_length = struct.unpack('<IH', dbf_header[4:10])
+    for offset in range(DBF_HEADER_PREFIX_LENGTH, header_length - 1, DBF_FIELD_DESCRIPTOR_LENGTH):
+        descriptor = dbf_header[offset:offset + DBF_FIELD_DESCRIPTOR_LENGTH]
+        if len(descriptor) < DBF_FIELD_DESCRIPTOR_LENGTH or descriptor[0] == '\r':
+            break
+        field_name = descriptor[:11].split('\x00')[0].decode('utf-8', 'replace')
+        dbf_type = descriptor[11].upper()
+        field_width = ord(descriptor[16])
+        field_precision = ord(descriptor[17])
+        if dbf_type in ('N', 'F') and field_precision == 0 and field_width < 10:
+            field_type_code = ogr.OFTInteger
+        elif dbf_type in ('N', 'F') and field_precision == 0 and field_width < 19:
+            field_type_code = ogr.OFTInteger64
+        elif dbf_type in ('N', 'F'):
+            field_type_code = ogr.OFTReal
+        elif dbf_type == 'D':
+            field_type_code = ogr.OFTDate
+        else:
+            field_type_code = ogr.OFTString
+        field_list.append(field_name)
+        field_meta_dict["field_attr_dict"][field_name] = {
+            "fieldName": field_name,
+            "fieldTypeCode": field_type_code,
+            "fieldType": ogr.GetFieldTypeName(field_type_code),
+            "fieldWidth": field_width,
+            "fieldPrecision": field_precision
+        }
+
+    shp_metadata_dict["feature_count"] = record_count
+    shp_metadata_dict["geometry_type"] = SHAPE_TYPE_GEOMETRY_NAMES.get(shape_type, UNKNOWN_STR)
+
+    spatial_ref = None
+    if prj_text:
+        spatial_ref = osr.SpatialReference()
+        if spatial_ref.ImportFromESRI([prj_text]) != 0:
+            spatial_ref = None
+    _add_projection_and_extent(shp_metadata_dict, spatial_ref, (x_min, x_max, y_min, y_max))
     return shp_metadata_dict
 
 
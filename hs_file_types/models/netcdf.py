@@ -413,7 +413,8 @@ class NetCDFLogicalFile(AbstractLogicalFile):
             msg = "NetCDF aggregation. Error when creating aggregation. Error:{}"
             file_type_success = False
             # extract the metadata from netcdf file
-            res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(temp_file)
+            res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(
+                temp_file, checksum=utils.get_resource_file_checksum(res_file))
             # populate resource_metadata and file_type_metadata lists with extracted metadata
             add_metadata_to_list(resource_metadata, res_dublin_core_meta,
                                  res_type_specific_meta, file_type_metadata, resource)
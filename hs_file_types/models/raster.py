@@ -12,6 +12,7 @@ from gdalconst import GA_ReadOnly
 
 from functools import partial, wraps
 
+from django.conf import settings
 from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.forms.models import formset_factory
@@ -418,6 +419,7 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
                         resource=resource,
                         file=logical_file
                     )
+                    schedule_exact_band_statistics(resource, logical_file)
                 except Exception as ex:
                     msg = msg.format(ex.message)
                     log.exception(msg)
@@ -614,7 +616,10 @@ def raster_file_validation(raster_file, resource, raster_folder=None):
 
 def extract_metadata(temp_vrt_file_path):
     metadata = []
-    res_md_dict = raster_meta_extract.get_raster_meta_dict(temp_vrt_file_path)
+    # band statistics from overviews or sampled blocks if settings.RASTER_APPROXIMATE_STATISTICS
+    res_md_dict = raster_meta_extract.get_raster_meta_dict(
+        temp_vrt_file_path,
+        approximate=getattr(settings, 'RASTER_APPROXIMATE_STATISTICS', False))
     wgs_cov_info = res_md_dict['spatial_coverage_info']['wgs84_coverage_info']
     # add core metadata coverage - box
     if wgs_cov_info:
@@ -640,6 +645,25 @@ def extract_metadata(temp_vrt_file_path):
     return metadata
 
 
+def schedule_exact_band_statistics(resource, logical_file=None):
+    """ Schedules a celery task replacing approximate band statistics with exact ones, once the
+    current transaction is committed
+
+    :param  resource: the raster resource, or the composite resource of the aggregation
+    :param  logical_file: the GeoRasterLogicalFile of the aggregation, or None for a raster
+    resource
+    """
+    if not getattr(settings, 'RASTER_APPROXIMATE_STATISTICS', False) or \
+            not getattr(settings, 'RASTER_EXACT_STATISTICS_TASK', True):
+        return
+
+    # tasks of this app import the models
+    from hs_file_types.tasks import update_raster_band_statistics
+    logical_file_id = logical_file.id if logical_file is not None else None
+    transaction.on_commit(lambda: update_raster_band_statistics.apply_async(
+        (resource.short_id, logical_file_id)))
+
+
 def create_vrt_file(tif_file):
     """ tif_file exists in temp directory - retrieved from irods """
 
@@ -4,9 +4,14 @@ import logging
 import sqlite3
 from lxml import etree
 import csv
+import warnings
+from datetime import datetime
+from itertools import islice
 from dateutil import parser
 import tempfile
 
+import numpy
+
 from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import UploadedFile
@@ -27,6 +32,14 @@ from hs_app_timeseries.forms import SiteValidationForm, VariableValidationForm,
 from base import AbstractFileMetaData, AbstractLogicalFile
 
 
+# number of data rows of a timeseries csv file that are validated together
+CSV_VALIDATION_CHUNK_SIZE = 10000
+
+# date formats other than ISO 8601 that are validated without dateutil
+CSV_DATE_FORMATS = ('%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y', '%Y/%m/%d %H:%M',
+                    '%Y/%m/%d %H:%M:%S', '%Y/%m/%d')
+
+
 class CVVariableType(AbstractCVLookupTable):
     metadata = models.ForeignKey('TimeSeriesFileMetaData', related_name="cv_variable_types")
 
@@ -851,47 +864,117 @@ def validate_csv_file(csv_file_path):
             log.error(err_message)
             return err_message
 
-        # process data rows
-        date_data_error = False
+        # process data rows in chunks - memory use is bounded by the chunk size
         data_row_count = 0
-        for row in csv_reader:
-            # check that data row has the same number of columns as the header
-            if len(row) != len(header):
-                err_message += " Number of columns in the header is not same as the data columns."
+        while True:
+            rows = list(islice(csv_reader, CSV_VALIDATION_CHUNK_SIZE))
+            if not rows:
+                break
+            invalid_row = _validate_csv_rows(rows, len(header))
+            if invalid_row is not None:
+                row_index, row_err_message = invalid_row
+                # the header is row 1 of the file
+                err_message += " {} Error in row {}.".format(row_err_message,
+                                                               data_row_count + row_index + 2)
                 log.error(err_message)
                 return err_message
-            # check that the first column data is of type datetime
+            data_row_count += len(rows)
+
+        if data_row_count < 2:
+            err_message += " There needs to be at least two rows of data."
+            log.error(err_message)
+            return err_message
+
+    return None
+
+
+def _is_csv_date(value):
+    """checks a value of the first column of a timeseries csv file one by one"""
+    # some numeric values (e.g., 20080101, 1.602652223413681) are recognized by the
+    # the parser as valid date value - we don't allow any such value as valid date
+    try:
+        float(value)
+        return False
+    except ValueError:
+        pass
+    try:
+        parser.parse(value)
+        return True
+    except (ValueError, OverflowError):
+        return False
+
+
+def _csv_dates_are_valid(dates):
+    """checks the first column of a chunk of timeseries csv rows all at once
+
+    ISO 8601 dates are converted by numpy, other dates with the format of the first date
+    if it is one of CSV_DATE_FORMATS. Returns False if the dates need to be checked one by one.
+    """
+    date_array = numpy.array(dates)
+    # the dash after the year also rules out numeric values and 'NaT'
+    if (numpy.char.find(date_array, '-') == 4).all():
+        with warnings.catch_warnings():
+            # numpy warns about timezone offsets, which are valid
+            warnings.simplefilter('ignore')
             try:
-                # some numeric values (e.g., 20080101, 1.602652223413681) are recognized by the
-                # the parser as valid date value - we don't allow any such value as valid date
-                float(row[0])
-                date_data_error = True
-            except ValueError:
-                try:
-                    parser.parse(row[0])
-                except ValueError:
-                    date_data_error = True
+                date_array.astype('datetime64')
+                return True
+            except (ValueError, TypeError):
+                return False
+
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            datetime.strptime(dates[0], date_format)
+        except ValueError:
+            continue
+        try:
+            for date in dates:
+                datetime.strptime(date, date_format)
+            return True
+        except ValueError:
+            return False
+    return False
+
+
+def _csv_values_are_valid(rows):
+    """checks the data values (2nd column onwards) of a chunk of timeseries csv rows at once"""
+    try:
+        numpy.array([row[1:] for row in rows]).astype(numpy.float64)
+        return True
+    except ValueError:
+        return False
 
-            if date_data_error:
-                err_message += " Data for the first column must be a date value."
-                log.error(err_message)
-                return err_message
 
-            # check that the data values (2nd column onwards) are of numeric
+def _validate_csv_rows(rows, column_count):
+    """validates a chunk of data rows of a timeseries csv file
+
+    :param rows: list of data rows as read by csv.reader
+    :param column_count: number of columns in the header
+    :return: None if all rows are valid, otherwise a tuple of the index of the first invalid row
+    in the chunk and the error message
+    """
+    dates_valid = values_valid = False
+    if all(len(row) == column_count for row in rows):
+        dates_valid = _csv_dates_are_valid([row[0] for row in rows])
+        values_valid = _csv_values_are_valid(rows)
+        if dates_valid and values_valid:
+            return None
+
+    # find the first invalid row of the chunk
+    for index, row in enumerate(rows):
+        # check that data row has the same number of columns as the header
+        if len(row) != column_count:
+            return index, "Number of columns in the header is not same as the data columns."
+        # check that the first column data is of type datetime
+        if not dates_valid and not _is_csv_date(row[0]):
+            return index, "Data for the first column must be a date value."
+        # check that the data values (2nd column onwards) are of numeric
+        if not values_valid:
             for data_value in row[1:]:
                 try:
                     float(data_value)
                 except ValueError:
-                    err_message += " Data values must be numeric."
-                    log.error(err_message)
-                    return err_message
-            data_row_count += 1
-
-        if data_row_count < 2:
-            err_message += " There needs to be at least two rows of data."
-            log.error(err_message)
-            return err_message
-
+                    return index, "Data values must be numeric."
     return None
 
 
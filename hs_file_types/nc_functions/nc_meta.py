@@ -22,10 +22,15 @@ import osr
 import netCDF4
 from pyproj import Proj, transform
 
+from django.core.cache import cache
+
 from nc_utils import get_nc_dataset, get_nc_grid_mapping_projection_import_string_dict,\
     get_nc_variables_coordinate_type_mapping, get_nc_grid_mapping_crs_name, \
     get_nc_variable_coordinate_meta
 
+# seconds the metadata extracted from a file is cached by the checksum of the file
+NC_META_CACHE_TIMEOUT = 24 * 60 * 60
+
 
 def get_nc_meta_json(nc_file_name):
     """
@@ -39,13 +44,22 @@ def get_nc_meta_json(nc_file_name):
     return nc_meta_json
 
 
-def get_nc_meta_dict(nc_file_name):
+def get_nc_meta_dict(nc_file_name, checksum=None):
     """
-    (string)-> dict
+    (string, string)-> dict
 
     Return: the netCDF Dublincore and Type specific Metadata
+            If the checksum of the file is given, the metadata is cached by the checksum.
     """
 
+    if checksum:
+        cache_key = 'nc_meta:{}'.format(checksum)
+        nc_meta = cache.get(cache_key)
+        if nc_meta is not None:
+            if isinstance(nc_file_name, netCDF4.Dataset):
+                nc_file_name.close()
+            return nc_meta
+
     if isinstance(nc_file_name, netCDF4.Dataset):
         nc_dataset = nc_file_name
     else:
@@ -62,6 +76,9 @@ def get_nc_meta_dict(nc_file_name):
         res_dublin_core_meta = {}
         res_type_specific_meta = {}
 
+    if checksum:
+        cache.set(cache_key, (res_dublin_core_meta, res_type_specific_meta),
+                  NC_META_CACHE_TIMEOUT)
     return res_dublin_core_meta, res_type_specific_meta
 
 
@@ -410,7 +427,8 @@ def get_limit_meta_by_coor_type(nc_dataset, coor_type, coor_type_mapping):
         if coor_type_name in coor_type_list:
             index = coor_type_list.index(coor_type_name)
             var_name = var_name_list[index]
-            var_coor_meta = get_nc_variable_coordinate_meta(nc_dataset, var_name)
+            var_coor_meta = get_nc_variable_coordinate_meta(nc_dataset, var_name,
+                                                            coor_type_mapping)
 
             if var_coor_meta.get('coordinate_start') is not None:
                 coor_start.append(var_coor_meta.get('coordinate_start'))
@@ -16,6 +16,12 @@ import osr
 import netCDF4
 import numpy
 
+# number of elements sampled to check that a coordinate variable is monotonic
+NC_MONOTONIC_SAMPLE_SIZE = 1000
+
+# number of elements read at a time when the limits of a variable are found by a full scan
+NC_LIMITS_BLOCK_SIZE = 1000000
+
 
 # Functions for General Purpose
 def get_nc_dataset(nc_file_name):
@@ -142,26 +148,25 @@ def get_nc_variable_coordinate_type(nc_variable):
     return 'Unknown'
 
 
-def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name):
+def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name,
+                                    nc_variables_coordinate_type_mapping=None):
     """
-    (object)-> dict
+    (object, string, dict)-> dict
 
     Return: coordinate meta data if the variable is related to a coordinate type:
             coordinate or auxiliary coordinate variable or bounds variable
     """
-    nc_variables_coordinate_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    if nc_variables_coordinate_type_mapping is None:
+        nc_variables_coordinate_type_mapping = \
+            get_nc_variables_coordinate_type_mapping(nc_dataset)
     nc_variable_coordinate_meta = {}
     if nc_variable_name in nc_variables_coordinate_type_mapping.keys():
         nc_variable = nc_dataset.variables[nc_variable_name]
-        nc_variable_data = nc_variable[:]
         nc_variable_coordinate_type = nc_variables_coordinate_type_mapping[nc_variable_name]
-        coordinate_max = None
-        coordinate_min = None
-        if nc_variable_data.size:
-            coordinate_min = nc_variable_data[numpy.unravel_index(nc_variable_data.argmin(),
-                                                                  nc_variable_data.shape)]
-            coordinate_max = nc_variable_data[numpy.unravel_index(nc_variable_data.argmax(),
-                                                                  nc_variable_data.shape)]
+        # coordinate variables and their bounds are monotonic, auxiliary ones need not be
+        coordinate_min, coordinate_max = get_nc_variable_limits(
+            nc_variable, monotonic=nc_variable_coordinate_type.split('_')[0].endswith('C'))
+        if coordinate_min is not None:
             coordinate_units = nc_variable.units if hasattr(nc_variable, 'units') else ''
 
             if nc_variable_coordinate_type in ['TC', 'TA', 'TC_bnd', 'TA_bnd']:
@@ -192,6 +197,75 @@ def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name):
     return nc_variable_coordinate_meta
 
 
+def get_nc_variable_limits(nc_variable, monotonic=False):
+    """
+    (object, bool)-> tuple
+
+    Return: the (min, max) values of a coordinate related variable, or (None, None) if it has
+            no valid data. If the variable is a monotonic 1-D coordinate or its (n, 2) bounds,
+            only the first and last elements are read, after checking monotonicity on a
+            strided sample. Otherwise the data is read in blocks along the first dimension.
+    """
+    if not nc_variable.size:
+        return None, None
+    if nc_variable.ndim == 0:
+        value = numpy.ma.ravel(nc_variable[...])
+        return (None, None) if numpy.ma.is_masked(value) else (value[0], value[0])
+
+    if monotonic and (nc_variable.ndim == 1 or nc_variable.shape[1:] == (2,)):
+        ends = numpy.ma.concatenate([numpy.ma.ravel(nc_variable[0]),
+                                     numpy.ma.ravel(nc_variable[-1])])
+        if not numpy.ma.is_masked(ends) and is_nc_variable_monotonic(nc_variable):
+            return ends.min(), ends.max()
+
+    return get_nc_variable_limits_by_blocks(nc_variable)
+
+
+def is_nc_variable_monotonic(nc_variable):
+    """
+    (object)-> bool
+
+    Return: whether a 1-D coordinate variable (or the first column of its (n, 2) bounds) is
+            strictly monotonic at up to NC_MONOTONIC_SAMPLE_SIZE evenly spaced elements
+    """
+    length = nc_variable.shape[0]
+    step = max(1, (length - 1) // NC_MONOTONIC_SAMPLE_SIZE)
+    sample = nc_variable[::step]
+    if (length - 1) % step:
+        sample = numpy.ma.concatenate([sample, nc_variable[-1:]])
+    if nc_variable.ndim == 2:
+        sample = sample[:, 0]
+    if numpy.ma.is_masked(sample):
+        return False
+    diff = numpy.diff(sample)
+    return bool((diff > 0).all() or (diff < 0).all())
+
+
+def get_nc_variable_limits_by_blocks(nc_variable):
+    """
+    (object)-> tuple
+
+    Return: the (min, max) values of a variable, reading at most about NC_LIMITS_BLOCK_SIZE
+            elements at a time, or (None, None) if the variable has no valid data
+    """
+    length = nc_variable.shape[0]
+    block_length = max(1, NC_LIMITS_BLOCK_SIZE // max(1, nc_variable.size // length))
+    coordinate_min = None
+    coordinate_max = None
+    for start in range(0, length, block_length):
+        block = nc_variable[start:start + block_length]
+        if not numpy.ma.count(block):
+            continue
+        block_min = block.min()
+        block_max = block.max()
+        if coordinate_min is None or block_min < coordinate_min:
+            coordinate_min = block_min
+        if coordinate_max is None or block_max > coordinate_max:
+            coordinate_max = block_max
+
+    return coordinate_min, coordinate_max
+
+
 # Functions for Coordinate Variable
 # coordinate variable has the following attributes:
 # 1) it has 1 dimension
@@ -21,19 +21,24 @@ import re
 import logging
 import pycrs
 import numpy
+from billiard import Pool
 
 
-def get_raster_meta_dict(raster_file_name):
+def get_raster_meta_dict(raster_file_name, approximate=False):
     """
-    (string)-> dict
+    (string, bool)-> dict
 
     Return: the raster science metadata extracted from the raster file
+            If approximate is True, band statistics are computed from overviews or sampled
+            blocks of the raster
     """
 
-    # get the metadata info from raster files
-    spatial_coverage_info = get_spatial_coverage_info(raster_file_name)
-    cell_info = get_cell_info(raster_file_name)
-    band_info = get_band_info(raster_file_name)
+    # get the metadata info from raster files - opening the (vrt) raster only once
+    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    spatial_coverage_info = get_spatial_coverage_info(raster_file_name, raster_dataset)
+    cell_info = get_cell_info(raster_file_name, raster_dataset)
+    band_info = get_band_info(raster_file_name, raster_dataset, approximate)
+    raster_dataset = None
 
     # write meta as dictionary
     raster_meta_dict = {
@@ -45,14 +50,15 @@ def get_raster_meta_dict(raster_file_name):
     return raster_meta_dict
 
 
-def get_spatial_coverage_info(raster_file_name):
+def get_spatial_coverage_info(raster_file_name, raster_dataset=None):
     """
-    (string) --> dict
+    (string, object) --> dict
 
     Return: meta of spatial extent and projection of raster includes both original info
     and wgs84 info
     """
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    if raster_dataset is None:
+        raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
     original_coverage_info = get_original_coverage_info(raster_dataset)
     wgs84_coverage_info = get_wgs84_coverage_info(raster_dataset)
     spatial_coverage_info = {
@@ -235,14 +241,15 @@ def get_wgs84_coverage_info(raster_dataset):
     return wgs84_coverage_info
 
 
-def get_cell_info(raster_file_name):
+def get_cell_info(raster_file_name, raster_dataset=None):
     """
-    (object) --> dict
+    (string, object) --> dict
 
     Return: meta info of cells in raster
     """
 
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    if raster_dataset is None:
+        raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
 
     # get cell size info
     if raster_dataset:
@@ -274,9 +281,16 @@ def get_cell_info(raster_file_name):
     return cell_info
 
 
-def get_band_info(raster_file_name):
+def get_band_info(raster_file_name, raster_dataset=None, approximate=False):
+    """
+    (string, object, bool) --> dict
 
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    Return: meta info of bands in raster. If approximate is True, the minimum and maximum values
+    are computed from overviews or sampled blocks instead of all cells.
+    """
+
+    if raster_dataset is None:
+        raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
 
     import os
     ori_dir = os.getcwd()
@@ -289,7 +303,7 @@ def get_band_info(raster_file_name):
 
         for i in range(0, band_count):
             band = raster_dataset.GetRasterBand(i+1)
-            minimum, maximum, _, _ = band.ComputeStatistics(False)
+            minimum, maximum, _, _ = band.ComputeStatistics(approximate)
             no_data = band.GetNoDataValue()
             new_no_data = None
 
@@ -300,7 +314,7 @@ def get_band_info(raster_file_name):
 
             if new_no_data is not None:
                 band.SetNoDataValue(new_no_data)
-                minimum, maximum, _, _ = band.ComputeStatistics(False)
+                minimum, maximum, _, _ = band.ComputeStatistics(approximate)
 
             band_info[i+1] = {
                 'name': 'Band_'+str(i+1),
@@ -323,3 +337,75 @@ def get_band_info(raster_file_name):
     raster_dataset = None
     os.chdir(ori_dir)
     return band_info
+
+
+# number of cells read at a time by each worker when computing exact band statistics
+STATISTICS_WINDOW_CELLS = 4 * 1024 * 1024
+
+# datasets opened by a worker process, so that the vrt is opened once per worker
+_worker_datasets = {}
+
+
+def _get_window_statistics(args):
+    """
+    (tuple) --> list
+
+    Return: (minimum, maximum) of each band in a window of rows of the raster, ignoring
+    cells with the nodata value, or None for bands without valid cells in the window
+    """
+    raster_file_name, y_offset, y_size = args
+    raster_dataset = _worker_datasets.get(raster_file_name)
+    if raster_dataset is None:
+        raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+        _worker_datasets[raster_file_name] = raster_dataset
+
+    window_statistics = []
+    for i in range(0, raster_dataset.RasterCount):
+        band = raster_dataset.GetRasterBand(i+1)
+        data = band.ReadAsArray(0, y_offset, raster_dataset.RasterXSize, y_size)
+        valid = ~numpy.isnan(data) if data.dtype.kind == 'f' else numpy.ones(data.shape, bool)
+        no_data = band.GetNoDataValue()
+        if no_data is not None:
+            valid &= ~numpy.isclose(data, no_data)
+        data = data[valid]
+        window_statistics.append((float(data.min()), float(data.max())) if data.size else None)
+
+    return window_statistics
+
+
+def get_band_statistics(raster_file_name, workers=4):
+    """
+    (string, int) --> dict
+
+    Return: exact (minimum, maximum) of each band by band number, or (None, None) for bands
+    without valid cells. Windows of rows of the raster are read in parallel by a pool of
+    worker processes, each of which opens the raster (vrt) once.
+    """
+
+    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    rows = raster_dataset.RasterYSize
+    band_count = raster_dataset.RasterCount
+    window_rows = max(1, STATISTICS_WINDOW_CELLS // max(1, raster_dataset.RasterXSize))
+    raster_dataset = None
+    windows = [(raster_file_name, y_offset, min(window_rows, rows - y_offset))
+               for y_offset in range(0, rows, window_rows)]
+
+    # billiard pools can be started from celery worker processes, multiprocessing pools cannot
+    pool = Pool(processes=workers)
+    try:
+        results = pool.map(_get_window_statistics, windows)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    band_statistics = {}
+    for i in range(0, band_count):
+        band_windows = [window[i] for window in results if window[i] is not None]
+        if band_windows:
+            band_statistics[i+1] = (min(w[0] for w in band_windows),
+                                    max(w[1] for w in band_windows))
+        else:
+            band_statistics[i+1] = (None, None)
+
+    return band_statistics
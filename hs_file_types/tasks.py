@@ -0,0 +1,117 @@
+"""Define celery tasks for hs_file_types app."""
+
+from __future__ import absolute_import
+
+import logging
+import os
+import shutil
+from uuid import uuid4
+
+from celery import shared_task
+from django.conf import settings
+
+from hs_core.hydroshare import utils
+from hs_core.models import BaseResource
+from hs_file_types import raster_meta_extract
+from hs_file_types.models import GeoFeatureLogicalFile, GeoRasterLogicalFile
+from hs_file_types.models.geofeature import extract_metadata
+
+# Pass 'django' into getLogger instead of __name__
+# for celery tasks (as this seems to be the
+# only way to successfully log in code executed
+# by celery, despite our catch-all handler).
+logger = logging.getLogger('django')
+
+
+@shared_task
+def update_raster_band_statistics(resource_id, logical_file_id=None):
+    """Replace approximate band statistics of a raster aggregation, or of a raster resource if
+    logical_file_id is None, with exact statistics computed from all cells of the raster."""
+    try:
+        resource = utils.get_resource_by_shortkey(resource_id, or_404=False)
+        if logical_file_id is not None:
+            logical_file = GeoRasterLogicalFile.objects.get(id=logical_file_id)
+            metadata = logical_file.metadata
+            res_files = list(logical_file.files.all())
+        else:
+            metadata = resource.metadata
+            res_files = list(resource.files.all())
+    except (BaseResource.DoesNotExist, GeoRasterLogicalFile.DoesNotExist):
+        logger.warning("Raster {} of resource {} was deleted before its band statistics "
+                       "were computed.".format(logical_file_id, resource_id))
+        return
+
+    raster_files = [f for f in res_files if f.extension.lower() in ('.vrt', '.tif', '.tiff')]
+    vrt_files = [f for f in raster_files if f.extension.lower() == '.vrt']
+    if not vrt_files:
+        return
+
+    # the vrt created or validated at ingest is used as is; it refers to the tif files by name
+    temp_dir = os.path.join(settings.TEMP_FILE_DIR, uuid4().hex)
+    os.makedirs(temp_dir)
+    try:
+        for res_file in raster_files:
+            utils.get_file_from_irods(res_file, temp_dir)
+        band_statistics = raster_meta_extract.get_band_statistics(
+            os.path.join(temp_dir, vrt_files[0].file_name),
+            workers=getattr(settings, 'RASTER_STATISTICS_WORKERS', 4))
+    finally:
+        shutil.rmtree(temp_dir)
+
+    # band information elements were created in the order of the band numbers
+    band_elements = metadata.bandInformations.order_by('id')
+    for band_number, band_element in enumerate(band_elements, start=1):
+        minimum, maximum = band_statistics.get(band_number, (None, None))
+        if minimum is None:
+            continue
+        band_element.minimumValue = minimum
+        band_element.maximumValue = maximum
+        band_element.save()
+
+    if logical_file_id is not None:
+        metadata.is_dirty = True
+        metadata.save()
+    utils.set_dirty_bag_flag(resource)
+    logger.info("Exact band statistics of raster {} of resource {} were saved.".format(
+        logical_file_id, resource_id))
+
+
+@shared_task
+def update_geofeature_field_information(resource_id, logical_file_id):
+    """Replace the field and geometry information of a geographic feature aggregation, which was
+    read from the headers of its .shp and .dbf files, with the information read by OGR."""
+    try:
+        resource = utils.get_resource_by_shortkey(resource_id, or_404=False)
+        logical_file = GeoFeatureLogicalFile.objects.get(id=logical_file_id)
+        res_files = list(logical_file.files.all())
+    except (BaseResource.DoesNotExist, GeoFeatureLogicalFile.DoesNotExist):
+        logger.warning("Geographic feature aggregation {} of resource {} was deleted before its "
+                       "field information was read.".format(logical_file_id, resource_id))
+        return
+
+    shp_files = [f for f in res_files if f.extension.lower() == '.shp']
+    if not shp_files:
+        return
+
+    temp_dir = os.path.join(settings.TEMP_FILE_DIR, uuid4().hex)
+    os.makedirs(temp_dir)
+    try:
+        for res_file in res_files:
+            utils.get_file_from_irods(res_file, temp_dir)
+        meta_dict = extract_metadata(os.path.join(temp_dir, shp_files[0].file_name))
+    finally:
+        shutil.rmtree(temp_dir)
+
+    metadata = logical_file.metadata
+    metadata.fieldinformations.all().delete()
+    for field_info in meta_dict["field_info_array"]:
+        metadata.create_element('fieldinformation', **field_info["fieldinformation"])
+    geometry_information = metadata.geometryinformation
+    if geometry_information is not None:
+        metadata.update_element('geometryinformation', geometry_information.id,
+                                **meta_dict["geometryinformation"])
+    metadata.is_dirty = True
+    metadata.save()
+    utils.set_dirty_bag_flag(resource)
+    logger.info("Field information of geographic feature aggregation {} of resource {} was "
+                "saved.".format(logical_file_id, resource_id))
@@ -1,5 +1,6 @@
 import os
 
+from django.core.exceptions import ObjectDoesNotExist
 from django.test import TransactionTestCase
 from django.contrib.auth.models import Group
 
@@ -1294,6 +1295,38 @@ class FileSetFileTypeTest(MockIRODSTestCaseMixin, TransactionTestCase,
         # set folder to fileset logical file type (aggregation)
         FileSetLogicalFile.set_file_type(self.composite_resource, self.user, folder_path=new_folder)
 
+    def test_aggregation_lookup_by_name(self):
+        """Test that aggregations are found by their names, and that the nearest fileset
+        aggregation in a path is found with one query"""
+
+        self._create_nested_fileset_aggregations()
+        parent_fs_folder = 'parent_fileset_folder'
+        child_fs_folder = '{}/child_fileset_folder'.format(parent_fs_folder)
+        self.add_files_to_resource(files_to_add=[self.raster_file], upload_folder=child_fs_folder)
+        raster_aggr_path = os.path.join(child_fs_folder, self.raster_file_name[:-4])
+        # a single file aggregation at the root
+        res_file = self.add_file_to_resource(file_to_add=self.generic_file)
+        GenericLogicalFile.set_file_type(self.composite_resource, self.user, res_file.id)
+
+        child_fs_aggr = self.composite_resource.get_aggregation_by_name(child_fs_folder)
+        self.assertTrue(child_fs_aggr.is_fileset)
+        raster_aggr = self.composite_resource.get_aggregation_by_name(raster_aggr_path)
+        self.assertTrue(isinstance(raster_aggr, GeoRasterLogicalFile))
+        generic_aggr = self.composite_resource.get_aggregation_by_name(self.generic_file_name)
+        self.assertTrue(isinstance(generic_aggr, GenericLogicalFile))
+        for name in ('', 'no_such_folder', child_fs_folder + '/', self.generic_file_name[:-4]):
+            with self.assertRaises(ObjectDoesNotExist):
+                self.composite_resource.get_aggregation_by_name(name)
+
+        with self.assertNumQueries(1):
+            fs_aggr = self.composite_resource.get_fileset_aggregation_in_path(raster_aggr_path)
+        self.assertEqual(fs_aggr, child_fs_aggr)
+        self.assertEqual(raster_aggr.get_parent(), child_fs_aggr)
+        self.assertEqual(child_fs_aggr.get_parent().folder, parent_fs_folder)
+        self.assertEqual(self.composite_resource.get_fileset_aggregation_in_path('other'), None)
+
+        self.composite_resource.delete()
+
     def _create_nested_fileset_aggregations(self):
         self.create_composite_resource()
         parent_fs_folder = 'parent_fileset_folder'
@@ -1,6 +1,6 @@
 import os
 
-from django.test import TransactionTestCase
+from django.test import TransactionTestCase, override_settings
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
 
@@ -17,6 +17,7 @@ from hs_geographic_feature_resource.models import FieldInformation, GeometryInfo
 from utils import assert_geofeature_file_type_metadata, CompositeResourceTestMixin
 from hs_file_types.models import GeoFeatureLogicalFile, GenericLogicalFile, GenericFileMetaData,\
     GeoFeatureFileMetaData
+from hs_file_types.models.geofeature import parse_shp, parse_shp_headers, SHP_HEADER_LENGTH
 
 
 class GeoFeatureFileTypeTest(MockIRODSTestCaseMixin, TransactionTestCase,
@@ -285,6 +286,51 @@ class GeoFeatureFileTypeTest(MockIRODSTestCaseMixin, TransactionTestCase,
         # there should be no GenericFileMetaData object at this point
         self.assertEqual(GeoFeatureFileMetaData.objects.count(), 0)
 
+    def test_parse_shp_headers(self):
+        # metadata read from the headers of the .shp and .dbf files matches the metadata read
+        # by OGR, except for the geometry type, which is not distinguished from its multi type
+        with open(self.states_shp_file, 'rb') as shp_file:
+            shp_header = shp_file.read(SHP_HEADER_LENGTH)
+        with open(self.states_dbf_file, 'rb') as dbf_file:
+            dbf_header = dbf_file.read()
+        with open(self.states_prj_file) as prj_file:
+            prj_text = prj_file.read()
+        header_meta = parse_shp_headers(shp_header, dbf_header, prj_text)
+        ogr_meta = parse_shp(self.states_shp_file)
+
+        self.assertEqual(header_meta['feature_count'], 51)
+        self.assertEqual(header_meta['geometry_type'], 'POLYGON')
+        self.assertEqual(header_meta['field_meta_dict'], ogr_meta['field_meta_dict'])
+        for key in ('westlimit', 'northlimit', 'eastlimit', 'southlimit'):
+            self.assertAlmostEqual(header_meta['origin_extent_dict'][key],
+                                   ogr_meta['origin_extent_dict'][key])
+
+        with self.assertRaises(ValidationError):
+            parse_shp_headers(dbf_header[:SHP_HEADER_LENGTH], dbf_header)
+
+    @override_settings(GEOFEATURE_HEADER_EXTRACTION=True)
+    def test_create_aggregation_from_shp_file_headers(self):
+        # here the metadata is extracted from the headers of the .shp and .dbf files
+
+        self.create_composite_resource()
+        for file_to_add in (self.states_shp_file, self.states_shx_file, self.states_dbf_file,
+                            self.states_prj_file):
+            self.add_file_to_resource(file_to_add=file_to_add)
+
+        shp_res_file = [f for f in self.composite_resource.files.all() if f.extension == '.shp'][0]
+        GeoFeatureLogicalFile.set_file_type(self.composite_resource, self.user, shp_res_file.id)
+
+        self.assertEqual(GeoFeatureLogicalFile.objects.count(), 1)
+        logical_file = GeoFeatureLogicalFile.objects.first()
+        self.assertEqual(logical_file.files.count(), 4)
+        self.assertEqual(logical_file.metadata.geometryinformation.featureCount, 51)
+        self.assertEqual(logical_file.metadata.fieldinformations.count(), 5)
+        self.assertAlmostEqual(logical_file.metadata.originalcoverage.westlimit,
+                               -178.217598362366)
+        self.assertNotEqual(logical_file.metadata.originalcoverage.projection_name, 'unknown')
+
+        self.composite_resource.delete()
+
     def test_create_aggregation_from_shp_file_required_2(self):
         # here we are using a shp file that exists in a folder
         # for setting it to Geo Feature file type which includes metadata extraction
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+
+import netCDF4
+import numpy
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from hs_file_types.nc_functions import nc_meta
+from hs_file_types.nc_functions.nc_utils import get_nc_dataset, get_nc_variable_limits
+
+
+class NetCDFCoverageExtractionTest(SimpleTestCase):
+    def setUp(self):
+        super(NetCDFCoverageExtractionTest, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.nc_file_path = os.path.join(self.tmp_dir, 'coverage.nc')
+        dataset = netCDF4.Dataset(self.nc_file_path, 'w')
+        dataset.createDimension('time', 1000)
+        dataset.createDimension('lat', 20)
+        dataset.createDimension('lon', 30)
+        dataset.createDimension('nv', 2)
+        time = dataset.createVariable('time', 'f8', ('time',))
+        time.units = 'days since 2000-01-01 00:00:00'
+        time.bounds = 'time_bnds'
+        time[:] = numpy.arange(1000) + 0.5
+        time_bnds = dataset.createVariable('time_bnds', 'f8', ('time', 'nv'))
+        time_bnds[:] = numpy.column_stack([numpy.arange(1000), numpy.arange(1, 1001)])
+        lat = dataset.createVariable('lat', 'f4', ('lat',))
+        lat.units = 'degrees_north'
+        # decreasing coordinate axis
+        lat[:] = numpy.linspace(45, 26, 20)
+        lon = dataset.createVariable('lon', 'f4', ('lon',))
+        lon.units = 'degrees_east'
+        lon[:] = numpy.linspace(-110, -81, 30)
+        # not monotonic, so its first and last values are not its limits
+        station = dataset.createVariable('station', 'f4', ('lon',))
+        station[:] = [0] + [100] + [50] * 28
+        dataset.close()
+        cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super(NetCDFCoverageExtractionTest, self).tearDown()
+
+    def test_variable_limits(self):
+        dataset = get_nc_dataset(self.nc_file_path)
+        self.assertEqual(get_nc_variable_limits(dataset.variables['lat'], monotonic=True),
+                         (26, 45))
+        self.assertEqual(get_nc_variable_limits(dataset.variables['time_bnds'], monotonic=True),
+                         (0, 1000))
+        # a variable that is not monotonic is scanned, even if it is said to be
+        self.assertEqual(get_nc_variable_limits(dataset.variables['station'], monotonic=True),
+                         (0, 100))
+        dataset.close()
+
+    def test_coverage_is_cached_by_checksum(self):
+        dublin_core_meta, _ = nc_meta.get_nc_meta_dict(self.nc_file_path, checksum='abc')
+        self.assertEqual(dublin_core_meta['period']['start'], '2000-01-01 00:00:00')
+        self.assertEqual(dublin_core_meta['period']['end'], '2002-09-27 00:00:00')
+        self.assertEqual(float(dublin_core_meta['original-box']['northlimit']), 45)
+        self.assertEqual(float(dublin_core_meta['original-box']['westlimit']), -110)
+
+        # the metadata of a file with the same checksum is not extracted again
+        os.remove(self.nc_file_path)
+        cached_meta, _ = nc_meta.get_nc_meta_dict(self.nc_file_path, checksum='abc')
+        self.assertEqual(cached_meta, dublin_core_meta)
@@ -1,6 +1,6 @@
 import os
 
-from django.test import TransactionTestCase
+from django.test import TransactionTestCase, override_settings
 from django.db import IntegrityError
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
@@ -13,6 +13,7 @@ from hs_core.models import Coverage, ResourceFile
 from hs_core.views.utils import remove_folder, move_or_rename_file_or_folder
 
 from hs_file_types.models import GeoRasterLogicalFile, GeoRasterFileMetaData, GenericLogicalFile
+from hs_file_types.tasks import update_raster_band_statistics
 from utils import assert_raster_file_type_metadata, CompositeResourceTestMixin
 from hs_geo_raster_resource.models import OriginalCoverage, CellInformation, BandInformation
 
@@ -85,6 +86,30 @@ class RasterFileTypeTest(MockIRODSTestCaseMixin, TransactionTestCase,
 
         self.composite_resource.delete()
 
+    @override_settings(RASTER_APPROXIMATE_STATISTICS=True)
+    def test_create_aggregation_with_approximate_statistics(self):
+        # here we are creating the aggregation with approximate band statistics and then
+        # replacing them with the exact statistics as the scheduled celery task does
+
+        self.create_composite_resource()
+        self.add_file_to_resource(file_to_add=self.raster_file)
+        res_file = self.composite_resource.files.first()
+        GeoRasterLogicalFile.set_file_type(self.composite_resource, self.user, res_file.id)
+        logical_file = GeoRasterLogicalFile.objects.first()
+        band_info = logical_file.metadata.bandInformations.first()
+        band_info.maximumValue = '0'
+        band_info.minimumValue = '0'
+        band_info.save()
+
+        update_raster_band_statistics(self.composite_resource.short_id, logical_file.id)
+
+        band_info = logical_file.metadata.bandInformations.first()
+        self.assertEqual(band_info.maximumValue, '2880.00708008')
+        self.assertEqual(band_info.minimumValue, '1870.63659668')
+        self.assertTrue(GeoRasterFileMetaData.objects.get(id=logical_file.metadata.id).is_dirty)
+
+        self.composite_resource.delete()
+
     def test_create_aggregation_from_tif_file_2(self):
         # here we are using a valid raster tif file that exists in a folder
         # for setting it to Geo Raster file type - no new
@@ -1,4 +1,7 @@
 import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
 
 from django.test import TransactionTestCase
 from django.contrib.auth.models import Group
@@ -16,6 +19,7 @@ from hs_file_types.models import TimeSeriesLogicalFile, TimeSeriesFileMetaData
 from hs_file_types.models.timeseries import CVVariableType, CVVariableName, CVSpeciation, \
     CVSiteType, CVElevationDatum, CVMethodType, CVMedium, CVUnitsType, CVStatus, \
     CVAggregationStatistic
+from hs_file_types.models.timeseries import CSV_VALIDATION_CHUNK_SIZE, validate_csv_file
 from utils import assert_time_series_file_type_metadata, CompositeResourceTestMixin
 
 
@@ -334,6 +338,41 @@ class TimeSeriesFileTypeTest(MockIRODSTestCaseMixin, TransactionTestCase,
         invalid_csv_file_name = 'Invalid_One_Data_Row.csv'
         self._test_invalid_csv_file(invalid_csv_file_name)
 
+    def test_validate_csv_file_in_chunks(self):
+        # test that rows are validated across chunks and that the first invalid row is reported
+        tmp_dir = tempfile.mkdtemp()
+        csv_file_path = os.path.join(tmp_dir, 'large.csv')
+        row_count = CSV_VALIDATION_CHUNK_SIZE + 10
+
+        def write_csv(bad_rows=None):
+            bad_rows = bad_rows or {}
+            with open(csv_file_path, 'w') as csv_file:
+                csv_file.write("ValueDateTime,Temp_DegC_Mendon,Temp_DegC_Paradise\n")
+                start = datetime(2008, 1, 1)
+                for i in range(row_count):
+                    row = "{},{},-9999".format(start + timedelta(minutes=30 * i), i * 0.5)
+                    csv_file.write(bad_rows.get(i, row) + "\n")
+
+        try:
+            write_csv()
+            self.assertEqual(validate_csv_file(csv_file_path), None)
+
+            # a bad value in the second chunk; the header is row 1 of the file
+            write_csv({CSV_VALIDATION_CHUNK_SIZE + 5: "2008-12-01 00:00:00,0.5AX,-9999"})
+            err_message = validate_csv_file(csv_file_path)
+            self.assertIn("Data values must be numeric.", err_message)
+            self.assertIn("Error in row {}.".format(CSV_VALIDATION_CHUNK_SIZE + 7), err_message)
+
+            # numeric dates are not allowed, dates other than ISO 8601 are
+            write_csv({3: "20080101,0.5,-9999", 7: "1/15/2008 10:30,0.5,-9999"})
+            err_message = validate_csv_file(csv_file_path)
+            self.assertIn("Data for the first column must be a date value.", err_message)
+            self.assertIn("Error in row 5.", err_message)
+            write_csv({7: "1/15/2008 10:30,0.5,-9999"})
+            self.assertEqual(validate_csv_file(csv_file_path), None)
+        finally:
+            shutil.rmtree(tmp_dir)
+
     def test_aggregation_sqlite_metadata_update(self):
         # here we are using a valid sqlite file for setting it
         # to TimeSeries file type which includes metadata extraction
@@ -145,6 +145,7 @@ def _process_uploaded_file(resource, validate_files_dict):
             log_msg = "Geo raster resource (ID:{}) - extracted metadata was saved to DB"
             log_msg = log_msg.format(resource.short_id)
             log.info(log_msg)
+            raster.schedule_exact_band_statistics(resource)
         else:
             # delete all the files in the resource
             for res_file in resource.files.all():
@@ -112,6 +112,10 @@ urlpatterns = [
         core_views.resource_rest_api.ResourceFileListCreate.as_view(),
         name='list_create_resource_file'),
 
+    url(r'^resource/(?P<pk>[0-9a-f-]+)/file_manifest/$',
+        core_views.resource_rest_api.ResourceFileManifest.as_view(),
+        name='get_resource_file_manifest'),
+
     url(r'^resource/data-store-add-reference/$',
         data_store_add_reference_public),
 
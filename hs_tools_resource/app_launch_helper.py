@@ -1,50 +1,157 @@
-from hs_core.models import get_user, BaseResource
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from hs_core.models import BaseResource
 from hs_core.views.utils import authorize, ACTION_TO_AUTHORIZE
-from hs_tools_resource.models import SupportedResTypeChoices, ToolResource
+from hs_labels.models import FlagCodes, UserResourceFlags
+from hs_tools_resource.models import ToolResource
 from hs_tools_resource.utils import parse_app_url_template
 from hs_tools_resource.app_keys import tool_app_key
 
+logger = logging.getLogger(__name__)
+
+APP_TOOL_REGISTRY_KEY = 'app_tool_registry'
+
+
+def get_app_tool_registry():
+    """
+    Return the registry of web app tools, building it if it is not cached.
+
+    The registry is a dict with the keys:
+
+    * 'tools': the launch information of each web app tool resource by id, see _get_tool_entry
+    * 'by_res_type': ids of the tools by supported resource type, in lower case
+    * 'by_appkey': ids of the tools by the value of their 'appkey' extended metadata
+
+    It is cached for settings.APP_TOOL_REGISTRY_TIMEOUT seconds and deleted from the cache when
+    the metadata of a web app tool changes, see hs_tools_resource.receivers. Permissions of the
+    requesting user are not part of the registry.
+    """
+    registry = cache.get(APP_TOOL_REGISTRY_KEY)
+    if registry is None:
+        registry = build_app_tool_registry()
+        cache.set(APP_TOOL_REGISTRY_KEY, registry,
+                  getattr(settings, 'APP_TOOL_REGISTRY_TIMEOUT', 300))
+    return registry
+
+
+def invalidate_app_tool_registry():
+    cache.delete(APP_TOOL_REGISTRY_KEY)
+
+
+def build_app_tool_registry():
+    tools = {}
+    by_res_type = {}
+    by_appkey = {}
+    for tool_res_obj in ToolResource.objects.order_by('id'):
+        try:
+            tools[tool_res_obj.id] = _get_tool_entry(tool_res_obj)
+        except Exception as ex:
+            # a web app with broken metadata must not keep the other apps from being offered
+            logger.error("web app {} is left out of the app tool registry: {}".format(
+                tool_res_obj.short_id, str(ex)))
+            continue
+
+        appkey_value = (tool_res_obj.extra_metadata or {}).get(tool_app_key)
+        if appkey_value is not None:
+            by_appkey.setdefault(appkey_value, []).append(tool_res_obj.id)
+
+        supported_res_types = tool_res_obj.metadata.supported_resource_types
+        if supported_res_types is not None:
+            for res_type in supported_res_types.supported_res_types.all():
+                tool_ids = by_res_type.setdefault(res_type.description.lower(), [])
+                if tool_res_obj.id not in tool_ids:
+                    tool_ids.append(tool_res_obj.id)
+
+    return {'tools': tools, 'by_res_type': by_res_type, 'by_appkey': by_appkey}
+
+
+def _get_tool_entry(tool_res_obj):
+    """
+    get the launch information of a web app tool resource that is the same for all users and
+    resources
+    """
+    metadata = tool_res_obj.metadata
+    agg_types = ""
+    file_extensions = ""
+    if metadata._supported_agg_types.first():
+        agg_types = metadata._supported_agg_types.first().get_supported_agg_types_str()
+    if metadata.supported_file_extensions:
+        file_extensions = metadata.supported_file_extensions.value
+
+    # None means that all sharing status are supported, for backward compatibility with web apps
+    # without supported_sharing_status metadata
+    sharing_status = None
+    if metadata.supported_sharing_status is not None:
+        sharing_status = metadata.supported_sharing_status.get_sharing_status_str().lower()
+
+    return {'id': tool_res_obj.id,
+            'res_id': tool_res_obj.short_id,
+            'title': metadata.title.value,
+            'icon_url': metadata.app_icon.data_url if metadata.app_icon else "raise-img-error",
+            'url_base': metadata.url_base.value if metadata.url_base else None,
+            'url_base_aggregation': metadata.url_base_aggregation.value
+            if metadata.url_base_aggregation else None,
+            'url_base_file': metadata.url_base_file.value if metadata.url_base_file else None,
+            'approved': _check_webapp_is_approved(tool_res_obj),
+            'agg_types': agg_types,
+            'file_extensions': file_extensions,
+            'sharing_status': sharing_status}
+
 
 def resource_level_tool_urls(resource_obj, request_obj):
-    res_type_str = resource_obj.resource_type
+    if not _check_user_can_view_resource(request_obj, resource_obj):
+        return None
+
+    registry = get_app_tool_registry()
+    res_sharing_status = resource_obj.raccess.sharing_status
+
+    # associate resources with app tools using extended metadata name-value pair with 'appkey' key
+    appkey_value = (resource_obj.extra_metadata or {}).get(tool_app_key)
+    appkey_tool_ids = registry['by_appkey'].get(appkey_value, []) \
+        if appkey_value is not None else []
+    res_type_tool_ids = registry['by_res_type'].get(resource_obj.resource_type.lower(), [])
+
+    # tools are matched in memory; the permissions to view them are checked with one query
+    candidate_ids = set(tool_id for tool_id in appkey_tool_ids + res_type_tool_ids
+                        if _check_app_supports_resource_sharing_status(
+                            res_sharing_status, registry['tools'][tool_id]))
+    if not candidate_ids:
+        return None
+    viewable_ids = _get_viewable_app_ids(request_obj, list(candidate_ids))
+    url_key_values = get_app_dict(request_obj.user, resource_obj)
 
     tool_list = []
     tool_res_id_list = []
     resource_level_app_counter = 0
 
-    # associate resources with app tools using extended metadata name-value pair with 'appkey' key
-    filterd_res_obj = BaseResource.objects.filter(short_id=resource_obj.short_id,
-                                                  extra_metadata__has_key=tool_app_key).first()
-    if filterd_res_obj:
-        # check appkey matching with web app tool resources
-        appkey_dict = {tool_app_key: filterd_res_obj.extra_metadata[tool_app_key]}
-        for tool_res_obj in ToolResource.objects.filter(extra_metadata__contains=appkey_dict):
-            # tool_res_obj has the same appkey-value pair so needs to associate with the resource
-            if _check_user_can_view_resource(request_obj, resource_obj) and \
-                    _check_user_can_view_app(request_obj, tool_res_obj) and \
-                    _check_app_supports_resource_sharing_status(resource_obj,
-                                                                tool_res_obj):
-                is_open_with_app, tl = _get_app_tool_info(request_obj, resource_obj,
-                                                          tool_res_obj, open_with=True)
-                if tl:
-                    tool_list.append(tl)
-                    tool_res_id_list.append(tl['res_id'])
-                    if is_open_with_app and tl['url']:
-                        resource_level_app_counter += 1
-
-    for choice_obj in SupportedResTypeChoices.objects.filter(description__iexact=res_type_str):
-        for supported_res_types_obj in choice_obj.associated_with.all():
-            tool_res_obj = ToolResource.objects.get(object_id=supported_res_types_obj.object_id)
-            if tool_res_obj.short_id not in tool_res_id_list and \
-                    _check_user_can_view_resource(request_obj, resource_obj) and \
-                    _check_user_can_view_app(request_obj, tool_res_obj) and \
-                    _check_app_supports_resource_sharing_status(resource_obj, tool_res_obj):
-
-                is_open_with_app, tl = _get_app_tool_info(request_obj, resource_obj, tool_res_obj)
-                if tl:
-                    tool_list.append(tl)
-                    if is_open_with_app and tl['url']:
-                        resource_level_app_counter += 1
+    for tool_id in appkey_tool_ids:
+        if tool_id not in candidate_ids or tool_id not in viewable_ids:
+            continue
+        # the tool has the same appkey-value pair so needs to associate with the resource
+        is_open_with_app, tl = _get_app_tool_info(registry['tools'][tool_id], url_key_values,
+                                                  open_with=True)
+        if tl:
+            tool_list.append(tl)
+            tool_res_id_list.append(tl['res_id'])
+            if is_open_with_app and tl['url']:
+                resource_level_app_counter += 1
+
+    res_type_tools = [registry['tools'][tool_id] for tool_id in res_type_tool_ids
+                      if tool_id in candidate_ids and tool_id in viewable_ids]
+    res_type_tools = [tool for tool in res_type_tools if tool['res_id'] not in tool_res_id_list]
+    open_with_ids = _get_user_open_with_app_ids(
+        request_obj, [tool['id'] for tool in res_type_tools if not tool['approved']])
+    for tool in res_type_tools:
+        is_open_with_app, tl = _get_app_tool_info(
+            tool, url_key_values, open_with=tool['approved'] or tool['id'] in open_with_ids)
+        if tl:
+            tool_list.append(tl)
+            if is_open_with_app and tl['url']:
+                resource_level_app_counter += 1
 
     if len(tool_list) > 0:
         return {"tool_list": tool_list,
@@ -53,61 +160,38 @@ def resource_level_tool_urls(resource_obj, request_obj):
         return None
 
 
-def _get_app_tool_info(request_obj, resource_obj, tool_res_obj, open_with=False):
+def _get_app_tool_info(tool, url_key_values, open_with=False):
     """
     get app tool info.
-    :param request_obj: request object
-    :param resource_obj: resource object
-    :param tool_res_obj: web tool app resource object
-    :param open_with: Default is False, meaning check has to be done to see whether
-                      the web app resource should show on the resource's open with list;
-                      if open_with is True, e.g., appkey extended metadata name-value pair
-                      exists that associated this resource with the web app resource, no check
-                      is needed, and this web app tool resource will show on this resource's
-                      open with list
+    :param tool: launch information of a web tool app resource from the app tool registry
+    :param url_key_values: values of the terms of the app launching url templates,
+                           see get_app_dict
+    :param open_with: whether this web app tool resource shows on the resource's open with list,
+                      e.g., because appkey extended metadata name-value pair exists that
+                      associated this resource with the web app resource, because the web app
+                      is approved, or because the user has put the web app on the open with list
     :return: an info dict of web tool resource
     """
-    tool_url_resource = tool_res_obj.metadata.url_base.value \
-        if tool_res_obj.metadata.url_base else None
-    tool_url_aggregation = tool_res_obj.metadata.url_base_aggregation.value \
-        if tool_res_obj.metadata.url_base_aggregation else None
-    tool_url_file = tool_res_obj.metadata.url_base_file.value \
-        if tool_res_obj.metadata.url_base_file else None
-    tool_icon_url = tool_res_obj.metadata.app_icon.data_url \
-        if tool_res_obj.metadata.app_icon else "raise-img-error"
-
-    url_key_values = get_app_dict(request_obj.user, resource_obj)
-
-    tool_url_resource_new = parse_app_url_template(tool_url_resource, url_key_values)
-    tool_url_agg_new = parse_app_url_template(tool_url_aggregation, url_key_values)
-    tool_url_file_new = parse_app_url_template(tool_url_file, url_key_values)
-
-    is_open_with_app = True if open_with else _check_open_with_app(tool_res_obj, request_obj)
-    is_approved_app = _check_webapp_is_approved(tool_res_obj)
-    agg_types = ""
-    file_extensions = ""
-    if tool_res_obj.metadata._supported_agg_types.first():
-        agg_types = tool_res_obj.metadata._supported_agg_types.first() \
-            .get_supported_agg_types_str()
-    if tool_res_obj.metadata.supported_file_extensions:
-        file_extensions = tool_res_obj.metadata.supported_file_extensions.value
+    tool_url_resource_new = parse_app_url_template(tool['url_base'], url_key_values)
+    tool_url_agg_new = parse_app_url_template(tool['url_base_aggregation'], url_key_values)
+    tool_url_file_new = parse_app_url_template(tool['url_base_file'], url_key_values)
 
     if (tool_url_resource_new is not None) or \
             (tool_url_agg_new is not None) or \
             (tool_url_file_new is not None):
-        tl = {'title': str(tool_res_obj.metadata.title.value),
-              'res_id': tool_res_obj.short_id,
-              'icon_url': tool_icon_url,
+        tl = {'title': tool['title'],
+              'res_id': tool['res_id'],
+              'icon_url': tool['icon_url'],
               'url': tool_url_resource_new,
               'url_aggregation': tool_url_agg_new,
               'url_file': tool_url_file_new,
-              'openwithlist': is_open_with_app,
-              'approved': is_approved_app,
-              'agg_types': agg_types,
-              'file_extensions': file_extensions
+              'openwithlist': open_with,
+              'approved': tool['approved'],
+              'agg_types': tool['agg_types'],
+              'file_extensions': tool['file_extensions']
               }
 
-        return is_open_with_app, tl
+        return open_with, tl
     else:
         return False, {}
 
@@ -124,25 +208,30 @@ def get_app_dict(user, resource):
     return [resource.get_hs_term_dict(), hs_term_dict_user, hs_term_dict_file]
 
 
-def _check_user_can_view_app(request_obj, tool_res_obj):
-    _, user_can_view_app, _ = authorize(
-        request_obj, tool_res_obj.short_id,
-        needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE,
-        raises_exception=False)
-    return user_can_view_app
-
-
-def _check_open_with_app(tool_res_obj, request_obj):
-    return _check_webapp_in_user_open_with_list(tool_res_obj, request_obj) or \
-           _check_webapp_is_approved(tool_res_obj)
+def _get_viewable_app_ids(request_obj, tool_ids):
+    """
+    get the ids of the web app tool resources the requesting user can view, with one query.
+    This is the VIEW_RESOURCE check of hs_core.views.utils.authorize for several resources.
+    """
+    user = request_obj.user
+    tools = BaseResource.objects.filter(id__in=tool_ids)
+    if user.is_authenticated() and user.is_active:
+        if not user.is_superuser:
+            tools = tools.filter(Q(raccess__public=True) |
+                                 Q(id__in=user.uaccess.view_resources.values('id')))
+    else:
+        tools = tools.filter(raccess__public=True)
+    return set(tools.values_list('id', flat=True))
 
 
-def _check_webapp_in_user_open_with_list(tool_res_obj, request_obj):
-    if request_obj.user.is_authenticated():
-        user_obj = get_user(request_obj)
-        return tool_res_obj.rlabels.is_open_with_app(user_obj)
-    else:
-        return False
+def _get_user_open_with_app_ids(request_obj, tool_ids):
+    """get the ids of the web app tool resources on the requesting user's open with list"""
+    if not tool_ids or not request_obj.user.is_authenticated():
+        return set()
+    return set(UserResourceFlags.objects.filter(user=request_obj.user,
+                                                kind=FlagCodes.OPEN_WITH_APP,
+                                                resource_id__in=tool_ids)
+               .values_list('resource_id', flat=True))
 
 
 def _check_webapp_is_approved(tool_res_obj):
@@ -160,21 +249,10 @@ def _check_user_can_view_resource(request_obj, resource_obj):
     return user_can_view_res
 
 
-def _check_app_supports_resource_sharing_status(resource_obj, tool_res_obj):
-    sharing_status_supported = False
-    supported_sharing_status_obj = tool_res_obj.metadata. \
-        supported_sharing_status
-    if supported_sharing_status_obj is not None:
-        supported_sharing_status_str = supported_sharing_status_obj. \
-            get_sharing_status_str()
-        if len(supported_sharing_status_str) > 0:
-            res_sharing_status = resource_obj.raccess.sharing_status
-            if supported_sharing_status_str.lower(). \
-                    find(res_sharing_status.lower()) != -1:
-                sharing_status_supported = True
-    else:
+def _check_app_supports_resource_sharing_status(res_sharing_status, tool):
+    if tool['sharing_status'] is None:
         # backward compatible: webapp without supported_sharing_status metadata
         # is considered to support all sharing status
-        sharing_status_supported = True
-
-    return sharing_status_supported
+        return True
+    return len(tool['sharing_status']) > 0 and \
+        tool['sharing_status'].find(res_sharing_status.lower()) != -1
@@ -1,9 +1,16 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
+from hs_core.models import Title
 from hs_core.signals import pre_metadata_element_create, pre_metadata_element_update, \
                             pre_create_resource
 
-from hs_tools_resource.models import ToolResource
+from hs_tools_resource.app_launch_helper import invalidate_app_tool_registry
+from hs_tools_resource.models import ToolResource, ToolMetaData, RequestUrlBase, \
+                                     RequestUrlBaseAggregation, RequestUrlBaseFile, \
+                                     SupportedResTypes, SupportedAggTypes, \
+                                     SupportedSharingStatus, SupportedFileExtensions, ToolIcon
 from hs_tools_resource.forms import SupportedResTypesValidationForm,  VersionForm, \
                                     UrlValidationForm, \
                                     SupportedSharingStatusValidationForm, RoadmapForm, \
@@ -86,3 +93,32 @@ def validate_form(request, element_name):
         return {'is_valid': True, 'element_data_dict': element_form.cleaned_data}
     else:
         return {'is_valid': False, 'element_data_dict': None, "errors": element_form.errors}
+
+
+# metadata of web app tools that is part of the app tool registry
+APP_TOOL_REGISTRY_SENDERS = (ToolResource, ToolMetaData, RequestUrlBase,
+                             RequestUrlBaseAggregation, RequestUrlBaseFile, SupportedResTypes,
+                             SupportedAggTypes, SupportedSharingStatus, SupportedFileExtensions,
+                             ToolIcon)
+
+
+def app_tool_metadata_changed_handler(sender, **kwargs):
+    invalidate_app_tool_registry()
+
+
+for registry_sender in APP_TOOL_REGISTRY_SENDERS:
+    post_save.connect(app_tool_metadata_changed_handler, sender=registry_sender)
+    post_delete.connect(app_tool_metadata_changed_handler, sender=registry_sender)
+m2m_changed.connect(app_tool_metadata_changed_handler,
+                    sender=SupportedResTypes.supported_res_types.through)
+m2m_changed.connect(app_tool_metadata_changed_handler,
+                    sender=SupportedAggTypes.supported_agg_types.through)
+m2m_changed.connect(app_tool_metadata_changed_handler,
+                    sender=SupportedSharingStatus.sharing_status.through)
+
+
+@receiver(post_save, sender=Title)
+def app_tool_title_changed_handler(sender, instance, **kwargs):
+    # the title element is shared by all resource types; only web app titles are registered
+    if instance.content_type_id == ContentType.objects.get_for_model(ToolMetaData).id:
+        invalidate_app_tool_registry()
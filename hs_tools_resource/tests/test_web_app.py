@@ -16,7 +16,7 @@ from hs_tools_resource.receivers import metadata_element_pre_create_handler, \
     metadata_element_pre_update_handler
 from hs_core.hydroshare import create_empty_resource, copy_resource
 from hs_tools_resource.utils import parse_app_url_template, do_work_when_launching_app_as_needed
-from hs_tools_resource.app_launch_helper import resource_level_tool_urls
+from hs_tools_resource.app_launch_helper import resource_level_tool_urls, get_app_tool_registry
 from hs_core.testing import TestCaseCommonUtilities
 from hs_tools_resource.app_keys import tool_app_key, irods_path_key, irods_resc_key
 from hs_core.hydroshare.utils import resource_file_add_process
@@ -601,3 +601,58 @@ class TestWebAppFeature(TestCaseCommonUtilities, TransactionTestCase):
         # test that added types are copied
         self.assertEqual(2, SupportedResTypes.objects.all().count())
         self.assertEqual(2, SupportedAggTypes.objects.all().count())
+
+    def test_app_tool_registry(self):
+        # a web app that supports composite resources is found in the app tool registry
+        resource.create_metadata_element(self.resWebApp.short_id, 'SupportedResTypes',
+                                         supported_res_types=['CompositeResource'])
+        metadata = [{'requesturlbase': {'value': 'https://www.google.com?res_id=${HS_RES_ID}'}}]
+        self.resWebApp.metadata.update(metadata, self.user)
+        registry = get_app_tool_registry()
+        self.assertEqual(registry['by_res_type']['compositeresource'], [self.resWebApp.id])
+
+        request = self.factory.get('/resource/' + self.resComposite.short_id + '/')
+        request.user = self.user
+        relevant_tools = resource_level_tool_urls(self.resComposite, request)
+        self.assertEqual(relevant_tools['resource_level_app_counter'], 0)
+        tl = relevant_tools['tool_list'][0]
+        self.assertEqual(tl['res_id'], self.resWebApp.short_id)
+        self.assertFalse(tl['approved'])
+        self.assertFalse(tl['openwithlist'])
+
+        # the registry is refreshed when the metadata of the web app changes
+        self.resWebApp.metadata.approved = True
+        self.resWebApp.metadata.save()
+        relevant_tools = resource_level_tool_urls(self.resComposite, request)
+        self.assertEqual(relevant_tools['resource_level_app_counter'], 1)
+        tl = relevant_tools['tool_list'][0]
+        self.assertTrue(tl['approved'])
+        self.assertTrue(tl['openwithlist'])
+
+        # a user who can view the resource but not the web app is not offered the web app
+        self.resComposite.raccess.public = True
+        self.resComposite.raccess.save()
+        other_user = hydroshare.create_account(
+            'other@byu.edu',
+            username='other',
+            first_name='Other',
+            last_name='User',
+            superuser=False,
+            groups=[self.group]
+        )
+        request.user = other_user
+        self.assertIsNone(resource_level_tool_urls(self.resComposite, request))
+        self.resWebApp.raccess.public = True
+        self.resWebApp.raccess.save()
+        relevant_tools = resource_level_tool_urls(self.resComposite, request)
+        self.assertEqual(relevant_tools['tool_list'][0]['res_id'], self.resWebApp.short_id)
+
+    def test_app_tool_registry_with_non_ascii_title(self):
+        metadata = [{'requesturlbase': {'value': 'https://www.google.com?res_id=${HS_RES_ID}'}}]
+        self.resWebApp.metadata.update(metadata, self.user)
+        resource.update_metadata_element(self.resWebApp.short_id, 'title',
+                                         element_id=self.resWebApp.metadata.title.id,
+                                         value=u'Caf\xe9 Web App')
+        # the registry is refreshed when the title of the web app changes
+        registry = get_app_tool_registry()
+        self.assertEqual(registry['tools'][self.resWebApp.id]['title'], u'Caf\xe9 Web App')
@@ -0,0 +1,171 @@
+"""Buffered write path for visit records.
+
+The Tracking middleware records a 'visit' Variable for every successful human request.
+With settings.TRACKING_BUFFER_ENABLED, these records are queued in memory by the worker
+process and written with bulk_create instead of one INSERT per request:
+
+* records are written by a writer thread of the process, never by the request thread;
+* the writer is woken as soon as TRACKING_BUFFER_BATCH_SIZE records are queued, and
+  otherwise writes queued records every TRACKING_BUFFER_FLUSH_INTERVAL seconds;
+* if writing fails, records stay queued, up to TRACKING_BUFFER_MAX_SIZE; beyond that the
+  oldest records are dropped and counted rather than blocking requests. The writer retries
+  after the flush interval, however many records are queued meanwhile;
+* queued records are written when the worker process exits.
+
+Resources are looked up by short id once per batch. Timestamps are set when a batch is
+written, so they can be late by at most the flush interval.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def buffer_enabled():
+    """Return True if the Tracking middleware should queue visit records."""
+    return getattr(settings, 'TRACKING_BUFFER_ENABLED', False)
+
+
+class VariableBuffer(object):
+    """A bounded queue of unsaved Variable records for a single worker process."""
+
+    def __init__(self, batch_size=None, flush_interval=None, max_size=None):
+        self.batch_size = batch_size or getattr(settings, 'TRACKING_BUFFER_BATCH_SIZE', 100)
+        self.flush_interval = flush_interval or \
+            getattr(settings, 'TRACKING_BUFFER_FLUSH_INTERVAL', 5)
+        self.max_size = max_size or getattr(settings, 'TRACKING_BUFFER_MAX_SIZE', 10000)
+        self.dropped = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # set to wake the writer thread before the flush interval is over
+        self._wakeup = threading.Event()
+        self._writer = None
+        self._failed = False
+
+    def __len__(self):
+        return len(self._queue)
+
+    def record(self, session, name, value=None, resource_id=None, rest=False, landing=False):
+        """Queue a record with the same arguments as Variable.record."""
+        from hs_tracking.models import Variable
+
+        variable = Variable(session=session, name=name,
+                            type=Variable.encode_type(value),
+                            value=Variable.encode(value),
+                            last_resource_id=resource_id,
+                            rest=rest,
+                            landing=landing)
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                self._queue.popleft()
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning("tracking buffer full: {} records dropped"
+                                   .format(self.dropped))
+            self._queue.append(variable)
+            full = len(self._queue) >= self.batch_size
+            if self._writer is None:
+                self._writer = self._start_writer()
+        if full:
+            self._wakeup.set()
+
+    def _start_writer(self):
+        """Start and return the writer thread."""
+        writer = threading.Thread(target=self._write_forever, name='tracking-buffer')
+        writer.daemon = True
+        writer.start()
+        return writer
+
+    def _write_forever(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as ex:
+                logger.error("tracking buffer writer failed: {}".format(str(ex)))
+            finally:
+                # the writer thread has its own database connection
+                connection.close()
+            if self._failed:
+                # back off rather than retrying on every record of a full queue
+                time.sleep(self.flush_interval)
+
+    def flush(self):
+        """Write all queued records in batches. Return the number of records written."""
+        from hs_tracking.models import Variable
+
+        written = 0
+        # one writer at a time, so that batches are written in order
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft()
+                             for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    break
+                try:
+                    self._resolve_resources(batch)
+                    Variable.objects.bulk_create(batch)
+                except Exception as ex:
+                    logger.error("failed to write {} tracking records: {}"
+                                 .format(len(batch), str(ex)))
+                    with self._lock:
+                        # put the batch back in front; the size limit applies on next record
+                        self._queue.extendleft(reversed(batch))
+                    self._failed = True
+                    return written
+                written += len(batch)
+        self._failed = False
+        return written
+
+    @staticmethod
+    def _resolve_resources(batch):
+        """Set the resource of each record from its short id, with one query per batch."""
+        from hs_core.models import BaseResource
+
+        short_ids = set(v.last_resource_id for v in batch if v.last_resource_id)
+        if not short_ids:
+            return
+        pks = dict(BaseResource.objects.filter(short_id__in=short_ids)
+                                       .values_list('short_id', 'pk'))
+        for variable in batch:
+            variable.resource_id = pks.get(variable.last_resource_id)
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the visit buffer of this worker process.
+
+    Buffers are keyed by process id so that forked gunicorn workers never write records
+    queued by their parent.
+    """
+    pid = os.getpid()
+    with _buffers_lock:
+        buf = _buffers.get(pid)
+        if buf is None:
+            buf = VariableBuffer()
+            _buffers[pid] = buf
+        return buf
+
+
+@atexit.register
+def flush_on_exit():
+    buf = _buffers.get(os.getpid())
+    if buf is not None and len(buf):
+        try:
+            buf.flush()
+        except Exception as ex:
+            logger.error("failed to flush tracking buffer on exit: {}".format(str(ex)))
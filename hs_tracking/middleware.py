@@ -1,3 +1,4 @@
+from .buffer import buffer_enabled, get_buffer
 from .models import Session
 import utils
 import re
@@ -83,8 +84,12 @@ class Tracking(object):
         rest = get_rest_from_url(request.path)
         landing = get_landing_from_url(request.path)
 
-        # save the activity in the database
-        session.record('visit', value=msg, resource_id=resource_id,
-                       landing=landing, rest=rest)
+        # save the activity in the database, or queue it to be saved in a batch
+        if buffer_enabled():
+            get_buffer().record(session, 'visit', value=msg, resource_id=resource_id,
+                                landing=landing, rest=rest)
+        else:
+            session.record('visit', value=msg, resource_id=resource_id,
+                           landing=landing, rest=rest)
 
         return response
@@ -0,0 +1,60 @@
+from django.test import TestCase
+from mock import patch
+
+from hs_tracking.buffer import VariableBuffer
+from hs_tracking.models import Variable, Session, Visitor
+
+
+class BufferTests(TestCase):
+
+    def setUp(self):
+        self.visitor = Visitor.objects.create()
+        self.session = Session.objects.create(visitor=self.visitor)
+        self.buffer = VariableBuffer(batch_size=3, flush_interval=3600, max_size=5)
+        # the writer thread would not see the records of the test transaction; tests flush
+        # explicitly instead
+        patcher = patch.object(VariableBuffer, '_start_writer')
+        self.start_writer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_batch_wakes_writer(self):
+        self.buffer.record(self.session, 'visit', value='one')
+        self.buffer.record(self.session, 'visit', value='two')
+        self.assertEqual(self.start_writer.call_count, 1)
+        self.assertFalse(self.buffer._wakeup.is_set())
+        self.buffer.record(self.session, 'visit', value='three')
+        self.assertTrue(self.buffer._wakeup.is_set())
+        # the request thread never writes
+        self.assertEqual(len(self.buffer), 3)
+        self.assertEqual(Variable.objects.filter(name='visit').count(), 0)
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(sorted(self.session.getlist('visit')), ['one', 'three', 'two'])
+
+    def test_flush_batches(self):
+        for i in range(7):
+            self.buffer.record(self.session, 'visit', value=i)
+        # oldest records are dropped beyond the size limit
+        self.assertEqual(len(self.buffer), 5)
+        self.assertEqual(self.buffer.dropped, 2)
+
+        with patch.object(Variable.objects, 'bulk_create',
+                          side_effect=Exception('database unavailable')):
+            self.assertEqual(self.buffer.flush(), 0)
+        # failed records stay queued, and the writer backs off
+        self.assertEqual(len(self.buffer), 5)
+        self.assertTrue(self.buffer._failed)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(sorted(self.session.getlist('visit')), [2, 3, 4, 5, 6])
+        self.assertFalse(self.buffer._failed)
+
+    def test_resource_resolved_by_short_id(self):
+        self.buffer.record(self.session, 'visit', value='missing',
+                           resource_id='0' * 32, landing=True)
+        self.buffer.flush()
+        variable = Variable.objects.get(name='visit')
+        self.assertIsNone(variable.resource)
+        self.assertEqual(variable.last_resource_id, '0' * 32)
+        self.assertTrue(variable.landing)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('theme', '0014_comma_semicolon_delimiter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotaUsageDelta',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zone', models.CharField(default=b'hydroshare', max_length=100)),
+                ('size', models.BigIntegerField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='quota_deltas', related_query_name='quota_deltas', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
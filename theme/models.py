@@ -3,8 +3,10 @@ from django.utils import timezone
 
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Sum
 from django.db.models.signals import pre_save
 from django.template import RequestContext, Template, TemplateSyntaxError
+from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 from django.utils.html import strip_tags
 from django.core.exceptions import ValidationError
@@ -218,9 +220,37 @@ class UserQuota(models.Model):
         verbose_name_plural = _("User quotas")
         unique_together = ('user', 'zone')
 
+    @cached_property
+    def pending_usage(self):
+        """
+        Sum in bytes of the usage changes recorded in QuotaUsageDelta since used_value was
+        last read from iRODS.
+
+        The sum is read once per instance; refresh_from_db() and update_used_value() read it
+        again on next use, see reset_pending_usage().
+        """
+        total = self.user.quota_deltas.filter(zone=self.zone).aggregate(total=Sum('size'))
+        return total['total'] or 0
+
+    def reset_pending_usage(self):
+        """forget the pending usage read by this instance, e.g., after changes were recorded"""
+        self.__dict__.pop('pending_usage', None)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super(UserQuota, self).refresh_from_db(*args, **kwargs)
+        self.reset_pending_usage()
+
+    @property
+    def current_used_value(self):
+        """
+        used_value as last read from iRODS plus the usage changes recorded since, in self.unit
+        """
+        from hs_core.hydroshare.utils import convert_file_size_to_unit
+        return self.used_value + convert_file_size_to_unit(self.pending_usage, self.unit)
+
     @property
     def used_percent(self):
-        return self.used_value*100.0/self.allocated_value
+        return self.current_used_value*100.0/self.allocated_value
 
     def update_used_value(self, size):
         """
@@ -231,6 +261,8 @@ class UserQuota(models.Model):
         from hs_core.hydroshare.utils import convert_file_size_to_unit
         self.used_value = convert_file_size_to_unit(size, self.unit)
         self.save()
+        # the changes that used_value now includes are removed from the ledger
+        self.reset_pending_usage()
 
     def add_to_used_value(self, size):
         """
@@ -240,7 +272,26 @@ class UserQuota(models.Model):
         :return: summation of self.used_value and pass in size, converted to the same self.unit
         """
         from hs_core.hydroshare.utils import convert_file_size_to_unit
-        return self.used_value + convert_file_size_to_unit(size, self.unit)
+        return self.current_used_value + convert_file_size_to_unit(size, self.unit)
+
+
+class QuotaUsageDelta(models.Model):
+    """
+    Ledger of quota usage changes in bytes, recorded when files are added to or deleted from
+    resources of a quota holder. The changes are added to UserQuota.used_value until
+    update_quota_usage_task reads the usage from iRODS again, after which the changes the
+    iRODS usage includes are removed from the ledger.
+    """
+    user = models.ForeignKey(User,
+                             editable=False,
+                             null=False,
+                             on_delete=models.CASCADE,
+                             related_name='quota_deltas',
+                             related_query_name='quota_deltas')
+    zone = models.CharField(max_length=100, default="hydroshare")
+    # signed size in bytes: negative for deleted files
+    size = models.BigIntegerField()
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
 
 
 class UserProfile(models.Model):
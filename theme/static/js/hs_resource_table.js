@@ -307,8 +307,39 @@ $(document).ready(function () {
     updateLabelsList();
     updateLabelDropdowns();
     updateLabelCount();
+
+    // Large listings are split into pages; append the remaining pages one at a time
+    var nextPage = $("#item-selectors").attr("data-next-page");
+    if (nextPage) {
+        loadResourcePage(nextPage);
+    }
 });
 
+// Appends a page of rows returned by the server to the resource table and loads the next one
+function loadResourcePage(url) {
+    $.ajax({
+        type: "GET",
+        url: url,
+        success: function (result) {
+            var rows = $($.parseHTML(result.rows)).filter("tr");
+            rows.find(".row-selector").change(refreshToolbarCheckboxState);
+            rows.find(".dropdown-menu label, .list-labels label").click(function (e) {
+                e.stopPropagation();
+            });
+            resourceTable.rows.add(rows).draw();
+            updateLabelDropdowns();
+            updateLabelCount();
+            if (result.next) {
+                loadResourcePage(result.next);
+            }
+        },
+        error: function (XMLHttpRequest, textStatus, errorThrown) {
+            console.log(textStatus, errorThrown);
+            customAlert("Error", 'Failed to load all of your resources.', "error", 10000);
+        }
+    });
+}
+
 function delete_multiple_resources_ajax_submit(indexes) {
     var calls = [];
 